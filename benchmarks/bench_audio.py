@@ -0,0 +1,80 @@
+"""Micro-benchmarks for PCM16 <-> float32 conversion.
+
+Compares the original expression chains with the fused helpers from
+:mod:`rt_echo.common.audio`, reporting time per call and the memory that
+``tracemalloc`` sees allocated per call.
+
+Run with ``python benchmarks/bench_audio.py``.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import timeit
+import tracemalloc
+from typing import Callable, Dict
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rt_echo.common.audio import (
+    Pcm16Converter,
+    float32_to_pcm16,
+    pcm16_to_float32,
+)
+
+UTTERANCE = 3 * 16_000  # three seconds of TTS output at 16 kHz
+
+
+def legacy_float32_to_pcm16(w: np.ndarray) -> bytes:
+    w = np.asarray(w, dtype=np.float32)
+    w = np.clip(w, -1.0, 1.0)
+    return (w * 32767).astype(np.int16).tobytes()
+
+
+def legacy_pcm16_to_float32(b: bytes) -> np.ndarray:
+    return np.frombuffer(b, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def allocated(fn: Callable[[], object]) -> int:
+    """Return the peak memory ``tracemalloc`` sees during one call of ``fn``."""
+    fn()  # warm-up: grows reusable buffers, fills caches
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak - base
+
+
+def run() -> Dict[str, Dict[str, float]]:
+    rng = np.random.default_rng(0)
+    wav = (0.5 * rng.standard_normal(UTTERANCE)).astype(np.float32)
+    pcm = legacy_float32_to_pcm16(wav)
+    converter = Pcm16Converter()
+
+    cases: Dict[str, Callable[[], object]] = {
+        "f32->pcm16 legacy": lambda: legacy_float32_to_pcm16(wav),
+        "f32->pcm16 float32_to_pcm16": lambda: float32_to_pcm16(wav),
+        "f32->pcm16 Pcm16Converter": lambda: converter.to_pcm16(wav),
+        "pcm16->f32 legacy": lambda: legacy_pcm16_to_float32(pcm),
+        "pcm16->f32 pcm16_to_float32": lambda: pcm16_to_float32(pcm),
+        "pcm16->f32 Pcm16Converter": lambda: converter.to_float32(pcm),
+    }
+    results: Dict[str, Dict[str, float]] = {}
+    for name, fn in cases.items():
+        number = 200
+        seconds = min(timeit.repeat(fn, number=number, repeat=5)) / number
+        results[name] = {"us_per_call": seconds * 1e6, "bytes_per_call": allocated(fn)}
+    return results
+
+
+def main() -> None:
+    print(f"{'case':32} {'us/call':>10} {'alloc bytes/call':>18}")
+    for name, row in run().items():
+        print(f"{name:32} {row['us_per_call']:10.1f} {int(row['bytes_per_call']):18d}")
+
+
+if __name__ == "__main__":
+    main()
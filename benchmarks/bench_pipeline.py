@@ -0,0 +1,166 @@
+"""Micro- and macro-benchmarks of the server hot path.
+
+Covers the ring buffer, VAD, stabilizer, TTS post-processing and a full
+:meth:`EchoSession.tick` loop driven by a stub ASR and ``SileroTTS``. No
+network, model download or GPU is needed.
+
+Run with ``python benchmarks/bench_pipeline.py`` or through
+``benchmarks/run.py``, which stores and compares results per commit.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sys
+import timeit
+from types import SimpleNamespace
+from typing import Callable, Dict
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rt_echo.common.audio import resample
+from rt_echo.server.buffer import RingBuffer16k
+from server.session import EchoSession
+from server.stabilizer import Stabilizer
+from server.tts import ensure_pcm16_16k
+from server.tts_silero import SileroTTS
+from server.vad import active_mask
+
+SR = 16_000
+CHUNK = 320  # 20 ms frames, as sent by clients
+TICKS = 50
+WORDS = "раз два три четыре пять шесть семь восемь девять десять".split()
+
+
+def speech_like(seconds: float, seed: int = 0) -> np.ndarray:
+    """Amplitude-modulated tone bursts that webrtcvad classifies as speech."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(SR * seconds)) / SR
+    envelope = (np.sin(2 * np.pi * 3 * t) > 0).astype(np.float32)
+    wave = np.sin(2 * np.pi * 220 * t) + 0.3 * rng.standard_normal(t.size)
+    return (0.2 * envelope * wave * 32767).astype(np.int16)
+
+
+class StubAsr:
+    """Hypotheses growing by one word per call, with an unstable last word."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def transcribe_window(self, _audio: np.ndarray, lang: str = "ru") -> str:
+        self.calls += 1
+        words = [WORDS[i % len(WORDS)] for i in range(self.calls)]
+        return " ".join(words) + (" " if self.calls % 2 else "")
+
+
+class NullWs:
+    async def send(self, _data) -> None:
+        pass
+
+
+class FeedScheduler:
+    """Stand-in for :class:`TickScheduler` that feeds audio instead of sleeping.
+
+    Every :meth:`wait` pushes the next step of audio into the session and
+    returns at once, so the loop measures per-tick work only. After
+    ``ticks`` ticks it cancels the loop.
+    """
+
+    missed = 0
+
+    def __init__(self, session: EchoSession, audio: np.ndarray, ticks: int) -> None:
+        self.session = session
+        self.audio = audio
+        self.ticks = ticks
+        self.n = 0
+        self.step = session.step_samples
+
+    async def wait(self) -> bool:
+        if self.n == self.ticks:
+            raise asyncio.CancelledError
+        start = (self.n * self.step) % (self.audio.size - self.step)
+        block = self.audio[start : start + self.step]
+        for i in range(0, block.size, CHUNK):
+            self.session.push(block[i : i + CHUNK].tobytes())
+        self.n += 1
+        return False
+
+    def record(self, latency: float, load: float = 0.0) -> float:
+        return 0.0
+
+    def wake(self) -> None:
+        pass
+
+
+def tick_loop(audio: np.ndarray, ticks: int = TICKS) -> Callable[[], object]:
+    """Return a callable running ``ticks`` session ticks end to end."""
+    config = SimpleNamespace(asr_sr=SR, window_sec=2.0, step_sec=0.5)
+    tts = SileroTTS()
+
+    def run() -> object:
+        session = EchoSession(config, StubAsr(), tts)
+        session.scheduler = FeedScheduler(session, audio, ticks)  # type: ignore[assignment]
+        asyncio.run(session.tick(NullWs()))
+        return session
+
+    return run
+
+
+def run() -> Dict[str, Dict[str, float]]:
+    logging.disable(logging.INFO)
+    audio = speech_like(10.0)
+    chunk = audio[:CHUNK].tobytes()
+    window = audio[: 2 * SR]
+    f32 = window.astype(np.float32) / 32768.0
+    tts_22k = np.random.default_rng(1).standard_normal(22_050).astype(np.float32) * 0.1
+
+    ring = RingBuffer16k(2 * SR, float_mirror=True)
+    for i in range(0, window.size, CHUNK):
+        ring.push_pcm16(window[i : i + CHUNK].tobytes())
+
+    hyps = [" ".join(WORDS[: 1 + i % len(WORDS)] * 3) for i in range(64)]
+    stab = Stabilizer()
+    it = iter(range(1 << 62))
+
+    def stabilize() -> object:
+        return stab.get_delta(hyps[next(it) % len(hyps)])
+
+    def ring_cycle() -> object:
+        ring.push_pcm16(chunk)
+        ring.step(CHUNK)
+        return ring.window(2 * SR)
+
+    cases: Dict[str, tuple[Callable[[], object], int]] = {
+        "ring push_pcm16 20ms": (lambda: ring.push_pcm16(chunk), 20_000),
+        "ring window 2s": (lambda: ring.window(2 * SR), 20_000),
+        "ring window_f32 2s": (lambda: ring.window_f32(2 * SR), 20_000),
+        "ring push+step+window": (ring_cycle, 20_000),
+        "vad active_mask 2s": (lambda: active_mask(window), 20),
+        "stabilizer get_delta": (stabilize, 20_000),
+        "resample 22.05k->16k 1s": (lambda: resample(tts_22k, 22_050, SR), 200),
+        "ensure_pcm16_16k 16k 2s": (lambda: ensure_pcm16_16k(f32, SR), 500),
+        "ensure_pcm16_16k 22.05k 1s": (lambda: ensure_pcm16_16k(tts_22k, 22_050), 200),
+        f"session tick x{TICKS}": (tick_loop(audio), 3),
+    }
+    results: Dict[str, Dict[str, float]] = {}
+    for name, (fn, number) in cases.items():
+        fn()  # warm-up: caches, lazily built filters
+        seconds = min(timeit.repeat(fn, number=number, repeat=5)) / number
+        results[name] = {"us_per_call": seconds * 1e6}
+    results[f"session tick x{TICKS}"]["us_per_tick"] = (
+        results[f"session tick x{TICKS}"]["us_per_call"] / TICKS
+    )
+    return results
+
+
+def main() -> None:
+    print(f"{'case':32} {'us/call':>12}")
+    for name, row in run().items():
+        print(f"{name:32} {row['us_per_call']:12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Run all benchmark modules, store results per commit and compare.
+
+Every ``benchmarks/bench_*.py`` module exposes ``run()`` returning
+``{case: {"us_per_call": ..., ...}}``. Results are written to
+``benchmarks/results/<commit>.json`` together with the machine and library
+versions, and compared with a baseline: by default the newest stored result
+of a different commit.
+
+Usage::
+
+    python benchmarks/run.py                      # run, store, compare
+    python benchmarks/run.py --only pipeline      # a subset of modules
+    python benchmarks/run.py --baseline abc1234   # compare with that commit
+    python benchmarks/run.py --fail-above 1.25    # exit 1 on >25% slowdown
+
+Without ``--fail-above`` slower cases are only marked in the report.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+HERE = Path(__file__).resolve().parent
+RESULTS = HERE / "results"
+# Ratio at which a case is marked as slower in the report.
+SLOWER = 1.25
+
+
+def git(*args: str) -> str:
+    try:
+        return subprocess.run(
+            ["git", *args], cwd=HERE, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def discover(only: Optional[List[str]] = None) -> List[str]:
+    names = sorted(p.stem for p in HERE.glob("bench_*.py"))
+    if only:
+        names = [n for n in names if any(o in n for o in only)]
+    return names
+
+
+def run_all(modules: List[str]) -> Dict[str, Dict[str, Dict[str, float]]]:
+    sys.path.insert(0, str(HERE))
+    results = {}
+    for name in modules:
+        start = time.perf_counter()
+        results[name] = importlib.import_module(name).run()
+        print(f"{name}: {len(results[name])} cases in {time.perf_counter() - start:.1f} s")
+    return results
+
+
+def metadata() -> dict:
+    return {
+        "commit": git("rev-parse", "--short", "HEAD") or "unknown",
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "subject": git("log", "-1", "--format=%s"),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def find_baseline(commit: str, baseline: Optional[str]) -> Optional[Path]:
+    if baseline:
+        path = Path(baseline)
+        return path if path.is_file() else RESULTS / f"{baseline}.json"
+    others = [p for p in RESULTS.glob("*.json") if p.stem != commit]
+    return max(others, key=lambda p: p.stat().st_mtime, default=None)
+
+
+def compare(current: dict, base: dict, fail_above: float) -> int:
+    """Print per-case ratios; return the number of regressions."""
+    print(f"\nbaseline {base['meta']['commit']} ({base['meta'].get('subject', '')})")
+    print(f"{'case':44} {'base us':>10} {'now us':>10} {'ratio':>7}")
+    regressions = 0
+    for module, cases in current["results"].items():
+        for case, row in cases.items():
+            old = base["results"].get(module, {}).get(case)
+            if old is None:
+                continue
+            ratio = row["us_per_call"] / old["us_per_call"]
+            flag = ""
+            if ratio > fail_above:
+                flag = "  <- slower"
+                regressions += 1
+            print(
+                f"{module + ': ' + case:44} {old['us_per_call']:10.1f} "
+                f"{row['us_per_call']:10.1f} {ratio:7.2f}{flag}"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run and compare benchmarks")
+    parser.add_argument("--only", nargs="*", help="Substrings of module names to run")
+    parser.add_argument("--baseline", help="Commit or JSON file to compare with")
+    parser.add_argument(
+        "--fail-above", type=float, help="Exit 1 if a case is slower than this ratio"
+    )
+    parser.add_argument("--no-save", action="store_true", help="Do not store the results")
+    args = parser.parse_args()
+
+    current = {"meta": metadata(), "results": run_all(discover(args.only))}
+    commit = current["meta"]["commit"]
+    if not args.no_save:
+        RESULTS.mkdir(exist_ok=True)
+        out = RESULTS / f"{commit}.json"
+        if out.is_file():
+            # Partial runs (--only) update the stored modules of this commit.
+            stored = json.loads(out.read_text())["results"]
+            current["results"] = {**stored, **current["results"]}
+        out.write_text(json.dumps(current, indent=2, ensure_ascii=False))
+        print(f"results written to {out}")
+
+    base_path = find_baseline(commit, args.baseline)
+    if base_path is None or not base_path.is_file():
+        print("no baseline to compare with")
+        return
+    threshold = args.fail_above or SLOWER
+    regressions = compare(current, json.loads(base_path.read_text()), threshold)
+    if regressions:
+        print(f"\n{regressions} case(s) slower than {threshold:.2f}x baseline")
+        if args.fail_above is not None:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -33,6 +33,8 @@ async def send_audio(ws: WebSocketClientProtocol, wav_path: Path) -> None:
                 # pad last chunk if necessary
                 data += b"\x00" * (chunk_bytes - len(data))
             await ws.send(data)
+            # the server rejects audio sent faster than real time
+            await asyncio.sleep(frames_per_chunk / SAMPLE_RATE)
         # signal end of stream
         await ws.send(b"")
 
@@ -0,0 +1,367 @@
+"""Load generator replaying many concurrent real-time sessions.
+
+Every session streams a WAV file (16 kHz mono PCM16) in 20 ms chunks on a
+fixed real-time schedule, like ``measure_latency.send_audio``, and records
+what comes back:
+
+* time to first audio: first received byte minus first sent chunk;
+* delta latency: for every pause in the input (speech followed by
+  ``--pause-ms`` of low energy), the time from the end of speech to the next
+  burst of audio from the server, i.e. how long the final words of an
+  utterance take to be spoken back;
+* delta interval: time between consecutive bursts of received audio;
+* late sends: chunks the generator itself sent more than one chunk late.
+  Many of them mean the client machine is the bottleneck.
+
+With ``--metrics`` the server's ``/metrics`` counters are scraped before and
+after the run to report ticks dropped or skipped under load. With
+``--server-pid`` (repeatable) the CPU time those processes and their
+children used is read from ``/proc`` and turned into cores used and
+sessions per core.
+
+Example::
+
+    python load_test.py --ws ws://localhost:8000 --wav ru_test.wav \\
+        --sessions 200 --ramp 10 --metrics http://localhost:8001/metrics \\
+        --server-pid $(pgrep -f server.server | head -1) --out load.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import wave
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+from urllib.parse import urlparse
+
+import numpy as np
+import websockets
+
+CHUNK_SAMPLES = 320  # 20ms @ 16kHz
+SAMPLE_RATE = 16000
+CHANNELS = 1
+SAMPLE_WIDTH = 2  # bytes for PCM16
+CHUNK_DURATION = CHUNK_SAMPLES / SAMPLE_RATE
+
+# Server counters reported as before/after differences.
+SERVER_COUNTERS = (
+    "rt_echo_ticks_total",
+    "rt_echo_ticks_skipped_total",
+    "rt_echo_asr_skipped_total",
+    "rt_echo_deltas_total",
+)
+
+
+def load_chunks(wav_path: Path) -> List[bytes]:
+    """Read ``wav_path`` and split it into 20 ms PCM16 chunks."""
+    with wave.open(str(wav_path), "rb") as wf:
+        if wf.getframerate() != SAMPLE_RATE:
+            raise ValueError(f"Unexpected sample rate: {wf.getframerate()}")
+        if wf.getnchannels() != CHANNELS:
+            raise ValueError(f"Unexpected channel count: {wf.getnchannels()}")
+        if wf.getsampwidth() != SAMPLE_WIDTH:
+            raise ValueError(f"Unexpected sample width: {wf.getsampwidth()}")
+        data = wf.readframes(wf.getnframes())
+    chunk_bytes = CHUNK_SAMPLES * SAMPLE_WIDTH
+    if len(data) % chunk_bytes:
+        data += b"\x00" * (chunk_bytes - len(data) % chunk_bytes)
+    return [data[i : i + chunk_bytes] for i in range(0, len(data), chunk_bytes)]
+
+
+def speech_flags(chunks: Sequence[bytes], floor_dbfs: float = -45.0) -> List[bool]:
+    """Mark chunks whose RMS level is above ``floor_dbfs``."""
+    if not chunks:
+        return []
+    pcm = np.frombuffer(b"".join(chunks), dtype=np.int16).astype(np.float32)
+    power = (pcm.reshape(len(chunks), -1) ** 2).mean(axis=1)
+    floor = (32768.0 * 10.0 ** (floor_dbfs / 20.0)) ** 2
+    return [bool(flag) for flag in power >= floor]
+
+
+def speech_ends(flags: Sequence[bool], pause_chunks: int) -> List[int]:
+    """Return indices of chunks where speech ends with a long enough pause.
+
+    The index is that of the last speech chunk; the pause after it is at
+    least ``pause_chunks`` chunks long or runs to the end of the input.
+    """
+    ends = []
+    i, n = 0, len(flags)
+    while i < n:
+        if flags[i] and (i + 1 == n or not flags[i + 1]):
+            j = i + 1
+            while j < n and not flags[j] and j - i <= pause_chunks:
+                j += 1
+            if j == n or j - i > pause_chunks:
+                ends.append(i)
+            i = j
+        else:
+            i += 1
+    return ends
+
+
+@dataclass
+class SessionResult:
+    """Timeline of one replayed session (``perf_counter`` seconds)."""
+
+    index: int
+    wav: str
+    first_send: Optional[float] = None
+    chunks_sent: int = 0
+    late_sends: int = 0
+    max_send_lag: float = 0.0
+    speech_end_times: List[float] = field(default_factory=list)
+    bursts: List[List[float]] = field(default_factory=list)  # [start, end]
+    bytes_received: int = 0
+    error: Optional[str] = None
+
+    def ttfa(self) -> Optional[float]:
+        if self.first_send is None or not self.bursts:
+            return None
+        return self.bursts[0][0] - self.first_send
+
+    def delta_latencies(self) -> List[float]:
+        """End of speech to the start of the next burst, per pause."""
+        starts = [b[0] for b in self.bursts]
+        out = []
+        for end in self.speech_end_times:
+            later = [s for s in starts if s >= end]
+            if later:
+                out.append(later[0] - end)
+        return out
+
+    def delta_intervals(self) -> List[float]:
+        starts = [b[0] for b in self.bursts]
+        return [b - a for a, b in zip(starts, starts[1:])]
+
+
+async def _send(
+    ws, result: SessionResult, chunks: Sequence[bytes], ends: Iterable[int], loops: int
+) -> None:
+    end_set = set(ends)
+    start = time.perf_counter()
+    result.first_send = start
+    n = 0
+    for _ in range(loops):
+        for i, chunk in enumerate(chunks):
+            # Fixed schedule: a slow send does not shift the following ones.
+            deadline = start + n * CHUNK_DURATION
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lag = time.perf_counter() - deadline
+            if lag > CHUNK_DURATION:
+                result.late_sends += 1
+            result.max_send_lag = max(result.max_send_lag, lag)
+            await ws.send(chunk)
+            n += 1
+            if i in end_set:
+                result.speech_end_times.append(time.perf_counter())
+    result.chunks_sent = n
+    await ws.send(b"")
+
+
+async def _recv(ws, result: SessionResult, burst_gap: float) -> None:
+    async for message in ws:
+        if not isinstance(message, bytes) or not message:
+            continue
+        now = time.perf_counter()
+        result.bytes_received += len(message)
+        if result.bursts and now - result.bursts[-1][1] <= burst_gap:
+            result.bursts[-1][1] = now
+        else:
+            result.bursts.append([now, now])
+
+
+async def run_session(
+    url: str,
+    index: int,
+    wav: Path,
+    chunks: Sequence[bytes],
+    ends: Sequence[int],
+    loops: int = 1,
+    tail: float = 3.0,
+    burst_gap: float = 0.1,
+) -> SessionResult:
+    """Replay ``chunks`` once or ``loops`` times and collect the timeline."""
+    result = SessionResult(index=index, wav=str(wav))
+    try:
+        async with websockets.connect(url, max_size=2**23) as ws:
+            recv_task = asyncio.create_task(_recv(ws, result, burst_gap))
+            try:
+                await _send(ws, result, chunks, ends, loops)
+                # Let the server speak what is left after the input stops.
+                await asyncio.sleep(tail)
+            finally:
+                recv_task.cancel()
+                await asyncio.gather(recv_task, return_exceptions=True)
+    except Exception as exc:  # noqa: BLE001 - every failure is recorded
+        result.error = f"{type(exc).__name__}: {exc}"
+    return result
+
+
+def percentiles(values: Sequence[float]) -> Dict[str, Optional[float]]:
+    """Summarize ``values`` (seconds) as milliseconds."""
+    if not values:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    arr = np.asarray(values, dtype=np.float64) * 1000.0
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {
+        "count": int(arr.size),
+        "p50": round(float(p50), 2),
+        "p95": round(float(p95), 2),
+        "p99": round(float(p99), 2),
+        "mean": round(float(arr.mean()), 2),
+        "max": round(float(arr.max()), 2),
+    }
+
+
+def _children(pid: int) -> List[int]:
+    pids = []
+    for task in Path(f"/proc/{pid}/task").glob("*"):
+        try:
+            pids += [int(p) for p in (task / "children").read_text().split()]
+        except OSError:
+            pass
+    return pids
+
+
+def cpu_seconds(pids: Sequence[int]) -> float:
+    """Return user+system CPU seconds of ``pids`` and their descendants."""
+    tick = os.sysconf("SC_CLK_TCK")
+    seen, stack, total = set(), list(pids), 0
+    while stack:
+        pid = stack.pop()
+        if pid in seen:
+            continue
+        seen.add(pid)
+        try:
+            stat = Path(f"/proc/{pid}/stat").read_text()
+        except OSError:
+            continue
+        fields = stat[stat.rindex(")") + 2 :].split()
+        total += int(fields[11]) + int(fields[12])  # utime, stime
+        stack += _children(pid)
+    return total / tick
+
+
+async def scrape_metrics(url: str) -> Dict[str, float]:
+    """Fetch a Prometheus text endpoint and return unlabeled samples."""
+    parts = urlparse(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    writer.write(f"GET {parts.path or '/'} HTTP/1.1\r\nHost: {parts.hostname}\r\n\r\n".encode())
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    body = raw.split(b"\r\n\r\n", 1)[-1].decode()
+    samples = {}
+    for line in body.splitlines():
+        if line and not line.startswith("#") and "{" not in line:
+            name, _, value = line.partition(" ")
+            try:
+                samples[name] = float(value)
+            except ValueError:
+                pass
+    return samples
+
+
+def summarize(results: Sequence[SessionResult], wall: float) -> dict:
+    ok = [r for r in results if r.error is None]
+    ttfa = [t for r in ok if (t := r.ttfa()) is not None]
+    return {
+        "sessions": len(results),
+        "errors": len(results) - len(ok),
+        "no_audio": sum(1 for r in ok if not r.bursts),
+        "wall_sec": round(wall, 3),
+        "ttfa_ms": percentiles(ttfa),
+        "delta_latency_ms": percentiles([d for r in ok for d in r.delta_latencies()]),
+        "delta_interval_ms": percentiles([d for r in ok for d in r.delta_intervals()]),
+        "late_sends": sum(r.late_sends for r in results),
+        "max_send_lag_ms": round(max((r.max_send_lag for r in results), default=0.0) * 1000, 2),
+        "bytes_received": sum(r.bytes_received for r in results),
+    }
+
+
+async def run_load(args: argparse.Namespace) -> dict:
+    wavs = [Path(p) for p in args.wav]
+    inputs = []
+    for wav in wavs:
+        chunks = load_chunks(wav)
+        flags = speech_flags(chunks, args.floor_dbfs)
+        inputs.append((wav, chunks, speech_ends(flags, int(args.pause_ms / 1000 / CHUNK_DURATION))))
+
+    before = await scrape_metrics(args.metrics) if args.metrics else {}
+    cpu_before = cpu_seconds(args.server_pid) if args.server_pid else 0.0
+    start = time.perf_counter()
+
+    async def staggered(i: int) -> SessionResult:
+        await asyncio.sleep(args.ramp * i / max(args.sessions, 1))
+        wav, chunks, ends = inputs[i % len(inputs)]
+        return await run_session(
+            args.ws, i, wav, chunks, ends, args.loops, args.tail, args.burst_gap_ms / 1000
+        )
+
+    results = await asyncio.gather(*(staggered(i) for i in range(args.sessions)))
+    wall = time.perf_counter() - start
+    report = {
+        "label": args.label,
+        "config": {k: v for k, v in vars(args).items() if k != "out"},
+        "summary": summarize(results, wall),
+    }
+
+    if args.server_pid:
+        cores = (cpu_seconds(args.server_pid) - cpu_before) / wall
+        report["summary"]["server_cpu_cores"] = round(cores, 3)
+        report["summary"]["sessions_per_core"] = round(args.sessions / cores, 2) if cores else None
+    if args.metrics:
+        after = await scrape_metrics(args.metrics)
+        report["summary"]["server"] = {
+            name: after.get(name, 0.0) - before.get(name, 0.0) for name in SERVER_COUNTERS
+        }
+    report["sessions"] = [asdict(r) for r in results]
+    return report
+
+
+def print_report(report: dict) -> None:
+    s = report["summary"]
+    print(f"sessions={s['sessions']} errors={s['errors']} no_audio={s['no_audio']} wall={s['wall_sec']}s")
+    for key in ("ttfa_ms", "delta_latency_ms", "delta_interval_ms"):
+        p = s[key]
+        print(f"{key:18} n={p['count']:<6} p50={p['p50']} p95={p['p95']} p99={p['p99']} max={p['max']}")
+    print(f"late client sends={s['late_sends']} (max lag {s['max_send_lag_ms']} ms)")
+    if "server_cpu_cores" in s:
+        print(f"server cpu cores={s['server_cpu_cores']} sessions/core={s['sessions_per_core']}")
+    if "server" in s:
+        print("server " + " ".join(f"{k}={v:g}" for k, v in s["server"].items()))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Concurrent real-time session load test")
+    parser.add_argument("--ws", required=True, help="Websocket URL, e.g. ws://host:8000")
+    parser.add_argument("--wav", required=True, nargs="+", help="Input WAV files (16kHz mono)")
+    parser.add_argument("--sessions", type=int, default=50, help="Concurrent sessions")
+    parser.add_argument("--ramp", type=float, default=5.0, help="Seconds over which sessions start")
+    parser.add_argument("--loops", type=int, default=1, help="Times each session replays its WAV")
+    parser.add_argument("--tail", type=float, default=3.0, help="Seconds to wait after the input ends")
+    parser.add_argument("--pause-ms", type=float, default=300.0, help="Silence that ends an utterance")
+    parser.add_argument("--floor-dbfs", type=float, default=-45.0, help="Speech energy threshold")
+    parser.add_argument("--burst-gap-ms", type=float, default=100.0, help="Gap separating bursts")
+    parser.add_argument("--metrics", help="Server /metrics URL, e.g. http://host:8001/metrics")
+    parser.add_argument("--server-pid", type=int, action="append", help="Server PID for CPU usage")
+    parser.add_argument("--label", default=os.getenv("APP_PROFILE", ""), help="Run label, e.g. profile")
+    parser.add_argument("--out", help="Write the JSON report here")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load(args))
+    print_report(report)
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+        print(f"report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
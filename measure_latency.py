@@ -1,12 +1,34 @@
+"""Measure end-to-end latency of the echo server.
+
+In raw mode the time from the first sent audio chunk to the first received
+audio is printed. With ``--framed`` the ``rt-echo.v1`` protocol is used:
+every chunk carries its send time, replies echo it, and for every reply the
+mouth-to-ear latency is split into server queueing, ASR, and the rest
+(network both ways and TTS, see ``rt_echo/common/protocol.py``).
+"""
+
 import argparse
 import asyncio
 import time
 import wave
 from pathlib import Path
-from typing import cast
+from typing import Dict, List, Optional, cast
 
+import numpy as np
 import websockets
 from websockets.legacy.client import WebSocketClientProtocol
+from websockets.typing import Subprotocol
+
+from rt_echo.common.protocol import (
+    AUDIO,
+    EOS,
+    FINAL,
+    FIRST,
+    SUBPROTOCOL,
+    FrameEncoder,
+    decode,
+    now_us,
+)
 
 CHUNK_SAMPLES = 320  # 20ms @ 16kHz
 SAMPLE_RATE = 16000
@@ -15,9 +37,12 @@ SAMPLE_WIDTH = 2  # bytes for PCM16
 CHUNK_DURATION = CHUNK_SAMPLES / SAMPLE_RATE
 
 
-async def send_audio(ws: WebSocketClientProtocol, wav_path: Path) -> float:
+async def send_audio(
+    ws: WebSocketClientProtocol, wav_path: Path, frames: Optional[FrameEncoder] = None
+) -> float:
     """Stream audio to the websocket in 20ms chunks.
 
+    With ``frames`` chunks are framed and stamped with their send time.
     Returns the timestamp of when the first chunk was sent.
     """
     t_send_first: float | None = None
@@ -41,9 +66,9 @@ async def send_audio(ws: WebSocketClientProtocol, wav_path: Path) -> float:
             if first:
                 t_send_first = time.perf_counter()
                 first = False
-            await ws.send(data)
+            await ws.send(data if frames is None else frames.audio(data, now_us()))
             await asyncio.sleep(CHUNK_DURATION)
-    await ws.send(b"")
+    await ws.send(b"" if frames is None else frames.frame(EOS))
     if t_send_first is None:
         raise RuntimeError("No audio frames were sent")
     return t_send_first
@@ -57,14 +82,69 @@ async def recv_first(ws: WebSocketClientProtocol) -> float:
     raise RuntimeError("Websocket closed without receiving audio")
 
 
+async def recv_replies(ws: WebSocketClientProtocol) -> List[Dict[str, float]]:
+    """Collect the latency breakdown of every reply until the server closes."""
+    replies: List[Dict[str, float]] = []
+    final: Optional[dict] = None
+    async for message in ws:
+        if not isinstance(message, bytes):
+            continue
+        frame = decode(message)
+        if frame.type == FINAL:
+            final = frame.json()
+        elif frame.type == AUDIO and frame.flags & FIRST:
+            total = (now_us() - frame.ts) / 1000
+            queue_ms = final["queue_ms"] if final else 0.0
+            asr_ms = final["asr_ms"] if final else 0.0
+            replies.append(
+                {
+                    "mouth_to_ear_ms": total,
+                    "queue_ms": queue_ms,
+                    "asr_ms": asr_ms,
+                    "other_ms": total - queue_ms - asr_ms,
+                }
+            )
+        elif frame.type == EOS:
+            break
+    return replies
+
+
+def print_replies(replies: List[Dict[str, float]]) -> None:
+    if not replies:
+        print("No replies received")
+        return
+    keys = list(replies[0])
+    print(" ".join(f"{k:>16}" for k in keys))
+    for reply in replies:
+        print(" ".join(f"{reply[k]:16.1f}" for k in keys))
+    for pct in (50, 95):
+        values = [np.percentile([r[k] for r in replies], pct) for k in keys]
+        print(" ".join(f"{v:16.1f}" for v in values), f"p{pct}")
+
+
 async def main() -> None:
     parser = argparse.ArgumentParser(description="Measure TTS E2E latency")
     parser.add_argument("--ws", required=True, help="Websocket URL, e.g. ws://host:8000")
     parser.add_argument("--wav", required=True, help="Input WAV file (16kHz mono)")
+    parser.add_argument(
+        "--framed", action="store_true", help="Per-reply breakdown via the rt-echo.v1 protocol"
+    )
     args = parser.parse_args()
 
     wav_path = Path(args.wav)
 
+    if args.framed:
+        async with websockets.connect(
+            args.ws, subprotocols=[Subprotocol(SUBPROTOCOL)]
+        ) as ws:
+            ws_proto = cast(WebSocketClientProtocol, ws)
+            if ws.subprotocol != SUBPROTOCOL:
+                raise RuntimeError("server does not support the framed protocol")
+            replies_task = asyncio.create_task(recv_replies(ws_proto))
+            await send_audio(ws_proto, wav_path, FrameEncoder())
+            print_replies(await replies_task)
+        return
+
     async with websockets.connect(args.ws) as ws:
         ws_proto = cast(WebSocketClientProtocol, ws)
         recv_task = asyncio.create_task(recv_first(ws_proto))
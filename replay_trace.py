@@ -0,0 +1,264 @@
+"""Replay a recorded session trace through :class:`EchoSession`.
+
+Traces are written by the server when ``TRACE_DIR`` is set (see
+``server/trace.py``). The replay builds a session with the recorded config,
+feeds it the recorded inbound audio and compares what it says with what the
+original session said.
+
+* ``--engine stub`` (default) answers ASR calls with the recorded
+  hypotheses and synthesizes with the silent ``SileroTTS`` stub: stabilizer,
+  VAD gating and scheduling are reproduced exactly, without models.
+* ``--engine real`` loads the configured ASR and TTS engines and runs them
+  inline, to reproduce or profile inference.
+
+By default ticks follow the recorded tick times on a virtual clock and the
+replay runs as fast as the engines allow. ``--realtime`` instead pushes
+audio at its recorded arrival times and lets the session's own scheduler
+tick, as in production. ``--profile`` writes cProfile statistics.
+
+Example::
+
+    python replay_trace.py traces/20250101-120000-4242-7.rttrace --profile replay.prof
+    python replay_trace.py trace.rttrace --engine real --set asr_model=small --realtime
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import cProfile
+import json
+import logging
+import pstats
+import struct
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from server.session import EchoSession
+from server.trace import AUDIO, DELTA, HYP, TICK, TTS, WORDS, MemoryRecorder, Record, read_trace
+from server.tts_silero import SileroTTS
+
+
+class TraceAsr:
+    """ASR stub returning the recorded hypotheses in order."""
+
+    def __init__(self, records: Sequence[Record]) -> None:
+        self.hyps = [r.payload.decode() for r in records if r.kind == HYP]
+        self.words = [
+            [(w, float(end)) for w, end in json.loads(r.payload)]
+            for r in records
+            if r.kind == WORDS
+        ]
+
+    def transcribe_window(self, _audio: np.ndarray, lang: str = "ru") -> str:
+        return self.hyps.pop(0) if self.hyps else ""
+
+    def transcribe_batch(self, audios, lang: str = "ru") -> List[str]:
+        return [self.transcribe_window(a, lang) for a in audios]
+
+    def transcribe_words(self, _audio: np.ndarray, prompt: str = "", lang: str = "ru"):
+        return self.words.pop(0) if self.words else []
+
+
+class TimedAsr:
+    """Proxy recording the duration of every ASR call."""
+
+    def __init__(self, asr) -> None:
+        self.asr = asr
+        self.seconds: List[float] = []
+
+    def __getattr__(self, name: str):
+        fn = getattr(self.asr, name)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.seconds.append(time.perf_counter() - start)
+
+        return timed
+
+
+class Collector:
+    """Websocket stand-in counting what the session sends."""
+
+    def __init__(self) -> None:
+        self.bytes = 0
+
+    async def send(self, data) -> None:
+        self.bytes += len(data)
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        pass
+
+
+class TraceClock:
+    """Scheduler stand-in ticking on the recorded tick times.
+
+    :meth:`wait` pushes the recorded audio that arrived before the next
+    recorded tick and returns at once; after the last tick it ends the
+    session's loop.
+    """
+
+    missed = 0
+
+    def __init__(self, session: EchoSession, records: Sequence[Record]) -> None:
+        self.session = session
+        self.audio = [r for r in records if r.kind == AUDIO]
+        self.ticks = [r.t for r in records if r.kind == TICK]
+        self.pos = 0
+
+    async def wait(self) -> bool:
+        await asyncio.sleep(0)  # let the sender task drain the outbound queue
+        if not self.ticks:
+            raise asyncio.CancelledError
+        due = self.ticks.pop(0)
+        while self.pos < len(self.audio) and self.audio[self.pos].t <= due:
+            self.session.push(self.audio[self.pos].payload)
+            self.pos += 1
+        return False
+
+    def record(self, latency: float, load: float = 0.0) -> float:
+        return 0.0
+
+    def wake(self) -> None:
+        pass
+
+
+async def _feed_realtime(session: EchoSession, records: Sequence[Record], tail: float) -> None:
+    start = time.perf_counter()
+    for record in records:
+        if record.kind == AUDIO:
+            delay = start + record.t - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            session.push(record.payload)
+    await asyncio.sleep(tail)
+
+
+def build_config(header: dict, overrides: Sequence[str]) -> SimpleNamespace:
+    config = SimpleNamespace(**header["config"])
+    for item in overrides:
+        key, _, value = item.partition("=")
+        current = getattr(config, key, None)
+        if isinstance(current, bool):
+            setattr(config, key, value not in ("0", "false", "no"))
+        elif isinstance(current, (int, float)):
+            setattr(config, key, type(current)(value))
+        else:
+            setattr(config, key, value)
+    return config
+
+
+def load_real_engines(config) -> Tuple[Any, Any]:
+    from server.server import load_engines
+
+    return load_engines(config)
+
+
+async def replay(
+    header: dict,
+    records: Sequence[Record],
+    engine: str = "stub",
+    realtime: bool = False,
+    overrides: Sequence[str] = (),
+) -> dict:
+    """Replay ``records`` and return a report comparing with the recording."""
+    config = build_config(header, overrides)
+    if engine == "stub":
+        asr, tts = TraceAsr(records), SileroTTS()
+    else:
+        asr, tts = load_real_engines(config)
+    timed_asr = TimedAsr(asr)
+    recorder = MemoryRecorder()
+    ws = Collector()
+    session = EchoSession(config, timed_asr, tts, recorder=recorder)  # type: ignore[arg-type]
+
+    start = time.perf_counter()
+    if realtime:
+        task = asyncio.create_task(session.tick(ws))
+        tail = getattr(config, "step_max_sec", 0.0) or 4 * config.step_sec
+        await _feed_realtime(session, records, tail + config.step_sec)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+    else:
+        session.scheduler = TraceClock(session, records)  # type: ignore[assignment]
+        await session.tick(ws)
+    wall = time.perf_counter() - start
+
+    def deltas(rs: Sequence[Record]) -> List[str]:
+        return [r.payload.decode() for r in rs if r.kind == DELTA]
+
+    def tts_bytes(rs: Sequence[Record]) -> int:
+        return sum(struct.unpack("<I", r.payload)[0] for r in rs if r.kind == TTS)
+
+    recorded, replayed = deltas(records), deltas(recorder.records)
+    duration = max((r.t for r in records), default=0.0)
+    asr_ms = np.array(timed_asr.seconds) * 1000
+    return {
+        "engine": engine,
+        "mode": "realtime" if realtime else "max-speed",
+        "trace_seconds": round(duration, 3),
+        "wall_seconds": round(wall, 3),
+        "speed": round(duration / wall, 2) if wall else None,
+        "ticks": {"recorded": sum(r.kind == TICK for r in records), "replayed": session.ticks},
+        "asr_calls": len(asr_ms),
+        "asr_ms": (
+            {
+                "mean": round(float(asr_ms.mean()), 3),
+                "p95": round(float(np.percentile(asr_ms, 95)), 3),
+                "max": round(float(asr_ms.max()), 3),
+            }
+            if len(asr_ms)
+            else {}
+        ),
+        "deltas": {
+            "recorded": len(recorded),
+            "replayed": len(replayed),
+            "same_text": "".join(recorded) == "".join(replayed),
+        },
+        "tts_bytes": {"recorded": tts_bytes(records), "replayed": tts_bytes(recorder.records)},
+        "bytes_sent": ws.bytes,
+    }
+
+
+def print_report(report: Dict) -> None:
+    for key, value in report.items():
+        print(f"{key:14} {value}")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Replay a recorded session trace")
+    parser.add_argument("trace", help="Trace file written with TRACE_DIR")
+    parser.add_argument("--engine", choices=("stub", "real"), default="stub")
+    parser.add_argument("--realtime", action="store_true", help="Push audio at recorded times")
+    parser.add_argument(
+        "--set", action="append", default=[], metavar="KEY=VALUE", help="Override a config value"
+    )
+    parser.add_argument("--profile", help="Write cProfile statistics to this file")
+    parser.add_argument("--out", help="Write the report as JSON")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    header, records = read_trace(args.trace)
+    recs = list(records)
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler is not None:
+        profiler.enable()
+    report = asyncio.run(replay(header, recs, args.engine, args.realtime, args.set))
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+    print_report(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,25 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Optional
+from typing import Optional, Tuple
 
 import numpy as np
 import sounddevice as sd
 
+from ..common.codec import FRAME_SAMPLES, SAMPLE_RATE
+from ..common.protocol import now_us
+
 
 class MicStreamer:
-    """Stream microphone audio blocks using ``sounddevice``."""
+    """Stream microphone audio blocks using ``sounddevice``.
+
+    Blocks are 20 ms (:data:`~rt_echo.common.codec.FRAME_SAMPLES`), one
+    Opus frame each. Every block is stamped with :func:`~rt_echo.common.protocol.now_us` when
+    it is delivered, for the capture timestamps of the framed protocol.
+    """
 
     def __init__(self) -> None:
-        self._queue: asyncio.Queue[bytes] = asyncio.Queue()
+        self._queue: asyncio.Queue[Tuple[bytes, int]] = asyncio.Queue()
         self._stream: Optional[sd.InputStream] = None
 
     def _callback(self, indata: np.ndarray, frames: int, time: sd.CallbackTime, status: sd.CallbackFlags) -> None:
@@ -20,14 +28,14 @@ class MicStreamer:
         if status:
             # For simplicity, ignore status but could log/handle it.
             pass
-        self._queue.put_nowait(indata.tobytes())
+        self._queue.put_nowait((indata.tobytes(), now_us()))
 
     async def __aenter__(self) -> "MicStreamer":
         self._stream = sd.InputStream(
-            samplerate=16000,
+            samplerate=SAMPLE_RATE,
             channels=1,
             dtype="int16",
-            blocksize=320,
+            blocksize=FRAME_SAMPLES,
             callback=self._callback,
         )
         self._stream.start()
@@ -41,4 +49,9 @@ class MicStreamer:
 
     async def read_block(self) -> bytes:
         """Read the next audio block from the microphone."""
+        block, _ = await self._queue.get()
+        return block
+
+    async def read_stamped(self) -> Tuple[bytes, int]:
+        """Read the next audio block and its capture time in microseconds."""
         return await self._queue.get()
@@ -3,16 +3,72 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
+from typing import List, Optional
 
 import websockets
+from websockets.typing import Subprotocol
 
+from ..common.codec import OpusDecoder, OpusEncoder, opus_available
+from ..common.protocol import (
+    AUDIO,
+    FINAL,
+    FIRST,
+    PARTIAL,
+    SUBPROTOCOL,
+    SUBPROTOCOL_OPUS,
+    FrameEncoder,
+    decode,
+    now_us,
+)
 from .audio_io import MicStreamer
 from .player import PcmPlayer
 
 
-async def run(url: str, mic: MicStreamer, player: PcmPlayer) -> None:
+def _subprotocols(framed: bool, opus: bool) -> Optional[List[Subprotocol]]:
+    """Subprotocols to offer, preferred first."""
+    if not framed:
+        return None
+    names = [SUBPROTOCOL_OPUS] if opus and opus_available() else []
+    return [Subprotocol(name) for name in names + [SUBPROTOCOL]]
+
+
+def _on_frame(message: bytes, player: PcmPlayer, decoder: Optional[OpusDecoder]) -> None:
+    """Play or log one message of the framed protocol.
+
+    Malformed frames and corrupt Opus packets are logged and skipped.
+    """
+    try:
+        frame = decode(message)
+        if frame.type == AUDIO and decoder is not None:
+            frame = frame._replace(payload=decoder.decode(frame.payload))
+    except ValueError as exc:
+        logging.warning("Skipping bad frame: %s", exc)
+        return
+    if frame.type == AUDIO:
+        if frame.flags & FIRST:
+            latency = (now_us() - frame.ts) / 1000
+            logging.info(json.dumps({"type": "latency", "mouth_to_ear_ms": latency}))
+        player.play(frame.payload)
+    elif frame.type in (PARTIAL, FINAL):
+        event = {"type": "partial" if frame.type == PARTIAL else "final", **frame.json()}
+        logging.info(json.dumps(event, ensure_ascii=False))
+
+
+async def run(
+    url: str, mic: MicStreamer, player: PcmPlayer, framed: bool = True, opus: bool = True
+) -> None:
     """Connect to a websocket server and stream audio in both directions.
 
+    With ``framed`` the ``rt-echo.v1`` protocol is offered. If the server
+    accepts it, microphone blocks are sent with their capture timestamps,
+    text events are logged and the mouth-to-ear latency of every reply is
+    logged when its first frame arrives; otherwise raw PCM is used.
+
+    With ``opus`` as well (and Opus available locally), ``rt-echo.v1.opus``
+    is offered first: every 20 ms microphone block is sent as one Opus
+    packet and received packets are decoded for the player. Servers
+    without Opus accept the PCM protocol instead.
+
     Automatically reconnects with exponential backoff (starting at 0.5 s,
     doubling each attempt up to a maximum of 5 s) when the connection drops.
     Audio threads are safely shut down on disconnect or cancellation.
@@ -25,28 +81,44 @@ async def run(url: str, mic: MicStreamer, player: PcmPlayer) -> None:
         Microphone streamer providing 20 ms PCM16 blocks.
     player:
         PCM player consuming audio blocks from the server.
+    framed:
+        Offer the framed protocol. Defaults to True.
+    opus:
+        Offer Opus compression in the framed protocol. Defaults to True.
     """
 
     backoff = 0.5
     while True:
         try:
-            async with websockets.connect(url) as ws, mic:
+            subprotocols = _subprotocols(framed, opus)
+            async with websockets.connect(url, subprotocols=subprotocols) as ws, mic:
                 backoff = 0.5  # Reset backoff after successful connection
                 player.start()
+                framed_ws = ws.subprotocol in (SUBPROTOCOL, SUBPROTOCOL_OPUS)
+                frames = FrameEncoder() if framed_ws else None
+                encoder = OpusEncoder() if ws.subprotocol == SUBPROTOCOL_OPUS else None
+                decoder = OpusDecoder() if encoder is not None else None
 
                 async def _sender() -> None:
                     while True:
-                        block = await mic.read_block()
-                        await ws.send(block)
+                        block, captured = await mic.read_stamped()
+                        if frames is None:
+                            await ws.send(block)
+                            continue
+                        packets = [block] if encoder is None else encoder.encode(block)
+                        for payload in packets:
+                            await ws.send(frames.audio(payload, captured))
 
                 async def _receiver() -> None:
                     async for message in ws:
-                        if isinstance(message, bytes):
-                            player.play(message)
-                        else:
+                        if not isinstance(message, bytes):
                             logging.info(
                                 json.dumps({"type": "partial", "text": message})
                             )
+                        elif frames is not None:
+                            _on_frame(message, player, decoder)
+                        else:
+                            player.play(message)
 
                 sender_task = asyncio.create_task(_sender())
                 receiver_task = asyncio.create_task(_receiver())
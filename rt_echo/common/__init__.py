@@ -1,12 +1,28 @@
 """Common utilities for the :mod:`rt_echo` package."""
 
 from .config import AppConfig, load_config
-from .audio import float32_to_pcm16, pcm16_to_float32, resample
+from .audio import (
+    Pcm16Converter,
+    Resampler,
+    ResampleStream,
+    float32_to_pcm16,
+    float32_to_pcm16_into,
+    get_resampler,
+    pcm16_to_float32,
+    pcm16_to_float32_into,
+    resample,
+)
 
 __all__ = [
     "AppConfig",
     "load_config",
     "float32_to_pcm16",
     "pcm16_to_float32",
+    "float32_to_pcm16_into",
+    "pcm16_to_float32_into",
+    "Pcm16Converter",
     "resample",
+    "Resampler",
+    "ResampleStream",
+    "get_resampler",
 ]
@@ -1,28 +1,215 @@
+from functools import lru_cache
 from typing import Tuple, cast  # noqa: F401 (for compatibility, may be unused)
 
 import numpy as np
-from scipy.signal import resample_poly
+from scipy.signal import firwin, resample_poly, upfirdn
+
+
+_ONE = np.float32(1.0)
+_ONE_NEG = np.float32(-1.0)
 
 
 def pcm16_to_float32(b: bytes) -> np.ndarray:
     arr = np.frombuffer(b, dtype=np.int16)
-    return arr.astype(np.float32) / 32768.0
+    return pcm16_to_float32_into(arr, np.empty(arr.size, dtype=np.float32))
 
 
 def float32_to_pcm16(w: np.ndarray) -> bytes:
-    w = np.clip(w, -1.0, 1.0).astype(np.float32)
-    return (w * 32767.0).astype(np.int16).tobytes()
+    w = np.asarray(w)
+    out = np.empty(w.shape, dtype=np.int16)
+    return float32_to_pcm16_into(w, out).tobytes()
+
+
+def pcm16_to_float32_into(pcm: np.ndarray | bytes, out: np.ndarray) -> np.ndarray:
+    """Scale PCM16 samples into the float32 buffer ``out`` in one pass.
+
+    ``out`` must hold at least as many samples as ``pcm``; the filled prefix
+    of ``out`` is returned.
+    """
+    arr = pcm if isinstance(pcm, np.ndarray) else np.frombuffer(pcm, dtype=np.int16)
+    dst = out[: arr.size]
+    np.copyto(dst, arr, casting="unsafe")
+    dst *= np.float32(1.0 / 32768.0)
+    return dst
+
+
+def float32_to_pcm16_into(
+    w: np.ndarray,
+    out: np.ndarray,
+    tmp: np.ndarray | None = None,
+    scale: float = 32767.0,
+) -> memoryview:
+    """Clip, scale and convert ``w`` into the int16 buffer ``out``.
+
+    ``tmp`` is a float32 scratch buffer of at least ``w.size`` samples; when
+    omitted the int16 conversion happens from a single temporary. Returns a
+    memoryview over the filled bytes of ``out``; it aliases ``out``, so a
+    consumer that keeps it while ``out`` is reused must copy it. Results
+    match :func:`float32_to_pcm16`.
+    """
+    n = w.size
+    work = np.empty(n, dtype=np.float32) if tmp is None else tmp[:n]
+    np.clip(w.reshape(-1), _ONE_NEG, _ONE, out=work)
+    work *= np.float32(scale)
+    dst = out.reshape(-1)[:n]
+    np.copyto(dst, work, casting="unsafe")
+    return dst.data.cast("B")
+
+
+class Pcm16Converter:
+    """Reusable scratch buffers for PCM16 <-> float32 conversion.
+
+    Buffers grow to the largest request seen and are reused afterwards, so
+    steady-state conversions allocate nothing. Returned arrays and views
+    alias the internal buffers and are valid until the next call; one
+    converter must not be used by several threads at once.
+    """
+
+    def __init__(self, capacity: int = 0) -> None:
+        self._f32 = np.empty(capacity, dtype=np.float32)
+        self._i16 = np.empty(capacity, dtype=np.int16)
+
+    def _reserve(self, n: int) -> None:
+        if self._f32.size < n:
+            size = max(n, 2 * self._f32.size)
+            self._f32 = np.empty(size, dtype=np.float32)
+            self._i16 = np.empty(size, dtype=np.int16)
+
+    def to_pcm16(self, w: np.ndarray, scale: float = 32767.0) -> memoryview:
+        """Convert float audio to little-endian PCM16 bytes."""
+        w = np.asarray(w)
+        self._reserve(w.size)
+        return float32_to_pcm16_into(w, self._i16, self._f32, scale)
+
+    def to_float32(self, pcm: np.ndarray | bytes) -> np.ndarray:
+        """Convert PCM16 samples or bytes to float32 in ``[-1, 1)``."""
+        n = pcm.size if isinstance(pcm, np.ndarray) else len(pcm) // 2
+        self._reserve(n)
+        return pcm16_to_float32_into(pcm, self._f32)
+
+
+@lru_cache(maxsize=None)
+def _design_taps(up: int, down: int) -> np.ndarray:
+    """Design the anti-aliasing filter ``resample_poly`` would use."""
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    taps = cast(np.ndarray, firwin(2 * half_len + 1, 1.0 / max_rate, window=("kaiser", 5.0)))
+    taps = taps.astype(np.float32)
+    taps.flags.writeable = False
+    return taps
+
+
+class Resampler:
+    """Polyphase resampler between two fixed sample rates.
+
+    The FIR filter is designed once per rate pair and shared by all
+    instances; output is identical to ``scipy.signal.resample_poly`` with its
+    default Kaiser window, computed in float32.
+    """
+
+    def __init__(self, src_sr: int, dst_sr: int) -> None:
+        from math import gcd
+
+        g = gcd(src_sr, dst_sr)
+        self.src_sr = src_sr
+        self.dst_sr = dst_sr
+        self.up, self.down = dst_sr // g, src_sr // g
+        self.taps = _design_taps(self.up, self.down)
+
+    def __call__(self, w: np.ndarray) -> np.ndarray:
+        """Resample a complete signal ``w`` and return float32 samples."""
+        w = np.asarray(w, dtype=np.float32)
+        if self.up == self.down:
+            return w
+        return cast(np.ndarray, resample_poly(w, self.up, self.down, window=self.taps))
+
+    def stream(self) -> "ResampleStream":
+        """Return a stateful resampler for a signal arriving in chunks."""
+        return ResampleStream(self)
+
+
+class ResampleStream:
+    """Chunked resampling without edge artifacts between chunks.
+
+    Concatenating the outputs of successive :meth:`process` calls, the last
+    one with ``final=True``, gives the same samples as resampling the whole
+    signal at once. Input needed by future outputs is kept between calls and
+    results are written into a reusable float32 buffer; the returned array
+    is a view that is only valid until the next call.
+    """
+
+    def __init__(self, resampler: Resampler) -> None:
+        up, down = resampler.up, resampler.down
+        self.up, self.down = up, down
+        half_len = (resampler.taps.size - 1) // 2
+        pre_pad = down - half_len % down
+        # Same filter alignment as ``resample_poly``.
+        self._h = np.concatenate((np.zeros(pre_pad, dtype=np.float32), resampler.taps * up))
+        self._delay = (half_len + pre_pad) // down
+        self._buf = np.zeros(0, dtype=np.float32)
+        self._buf_start = 0  # absolute index of ``_buf[0]``, a multiple of ``down``
+        self._received = 0
+        self._emitted = 0
+        self._out = np.zeros(0, dtype=np.float32)
+
+    def process(self, chunk: np.ndarray, final: bool = False) -> np.ndarray:
+        """Consume ``chunk`` and return the output samples now complete."""
+        chunk = np.asarray(chunk, dtype=np.float32)
+        if self.up == self.down:
+            return chunk
+        if chunk.size:
+            self._buf = np.concatenate((self._buf, chunk))
+            self._received += chunk.size
+
+        up, down, delay, h = self.up, self.down, self._delay, self._h
+        if final:
+            stop = -(-self._received * up // down)
+            segment = np.concatenate((self._buf, np.zeros(h.size // up + 1, dtype=np.float32)))
+        else:
+            # Output ``m`` depends on inputs up to ``(m + delay) * down // up``.
+            stop = max((self._received * up - 1) // down - delay + 1, self._emitted)
+            segment = self._buf
+        count = stop - self._emitted
+        if count <= 0:
+            return self._out[:0]
+
+        first = self._emitted + delay - self._buf_start // down * up
+        full = upfirdn(h, segment, up, down)
+        if self._out.size < count:
+            self._out = np.zeros(count, dtype=np.float32)
+        out = self._out[:count]
+        out[:] = full[first : first + count]
+        self._emitted = stop
+
+        # Drop input that no future output depends on.
+        need = ((self._emitted + delay) * down - h.size) // up + 1
+        keep_from = max(need, 0) // down * down
+        if keep_from > self._buf_start:
+            self._buf = self._buf[keep_from - self._buf_start :]
+            self._buf_start = keep_from
+        return out
+
+
+@lru_cache(maxsize=None)
+def get_resampler(src_sr: int, dst_sr: int) -> Resampler:
+    """Return the shared :class:`Resampler` for a pair of rates."""
+    return Resampler(src_sr, dst_sr)
 
 
 def resample(w: np.ndarray, src_sr: int, dst_sr: int) -> np.ndarray:
     if src_sr == dst_sr:
         return w
-    from math import gcd
-
-    g = gcd(src_sr, dst_sr)
-    up, down = dst_sr // g, src_sr // g
-    return cast(np.ndarray, resample_poly(w, up, down)).astype(np.float32)
-
+    return get_resampler(src_sr, dst_sr)(w)
 
-__all__ = ["pcm16_to_float32", "float32_to_pcm16", "resample"]
 
+__all__ = [
+    "pcm16_to_float32",
+    "float32_to_pcm16",
+    "pcm16_to_float32_into",
+    "float32_to_pcm16_into",
+    "Pcm16Converter",
+    "resample",
+    "Resampler",
+    "ResampleStream",
+    "get_resampler",
+]
@@ -0,0 +1,111 @@
+"""Optional Opus compression of the audio streams.
+
+PCM16 @ 16 kHz is 256 kbit/s per direction; Opus in VoIP mode carries
+speech at 16-32 kbit/s. Compression needs the ``opuslib`` package and the
+``libopus`` shared library. Without them :func:`opus_available` is False
+and the ``rt-echo.v1.opus`` subprotocol is simply never negotiated, so
+both sides fall back to PCM.
+
+Every packet holds one :data:`FRAME_MS` frame, the size of the microphone
+blocks, so one framed websocket message carries one packet.
+"""
+
+from __future__ import annotations
+
+from typing import List
+
+try:
+    import opuslib
+except Exception:  # pragma: no cover - package or libopus missing
+    opuslib = None
+
+FRAME_MS = 20
+SAMPLE_RATE = 16_000
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+
+# Longest Opus packet (120 ms), the decoder's output bound.
+_MAX_PACKET_MS = 120
+
+
+def opus_available() -> bool:
+    """Return True if Opus encoding and decoding can be used."""
+    return opuslib is not None
+
+
+def _require_opus() -> None:
+    if opuslib is None:
+        raise RuntimeError("Opus needs the opuslib package and libopus")
+
+
+class OpusEncoder:
+    """Encode a PCM16 stream into :data:`FRAME_MS` Opus packets.
+
+    Input of any length is accepted; samples short of a whole frame wait
+    for the next call, and :meth:`flush` pads them with silence.
+
+    Parameters
+    ----------
+    bitrate: int, optional
+        Target bits per second. Defaults to 24000.
+    sample_rate: int, optional
+        Sample rate of the PCM. Defaults to 16 kHz.
+    """
+
+    def __init__(self, bitrate: int = 24_000, sample_rate: int = SAMPLE_RATE) -> None:
+        _require_opus()
+        self._encoder = opuslib.Encoder(sample_rate, 1, "voip")
+        self._encoder.bitrate = bitrate
+        self.bitrate = bitrate
+        self.frame_samples = sample_rate * FRAME_MS // 1000
+        self.frame_bytes = 2 * self.frame_samples
+        self._pending = bytearray()
+
+    def encode(self, pcm: bytes | memoryview) -> List[bytes]:
+        """Return the packets completed by ``pcm``."""
+        self._pending += pcm
+        end = len(self._pending) - len(self._pending) % self.frame_bytes
+        packets: List[bytes] = []
+        for i in range(0, end, self.frame_bytes):
+            frame = bytes(self._pending[i : i + self.frame_bytes])
+            packets.append(bytes(self._encoder.encode(frame, self.frame_samples)))
+        del self._pending[:end]
+        return packets
+
+    def flush(self) -> List[bytes]:
+        """Encode the buffered remainder, padded to a whole frame."""
+        if not self._pending:
+            return []
+        self._pending += bytes(self.frame_bytes - len(self._pending))
+        return self.encode(b"")
+
+
+class OpusDecoder:
+    """Decode Opus packets of one stream back to PCM16.
+
+    Parameters
+    ----------
+    sample_rate: int, optional
+        Output sample rate. Defaults to 16 kHz.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE) -> None:
+        _require_opus()
+        self._decoder = opuslib.Decoder(sample_rate, 1)
+        self.max_samples = sample_rate * _MAX_PACKET_MS // 1000
+
+    def decode(self, packet: bytes) -> bytes:
+        """Return the PCM16 of ``packet``; raises ValueError if it is corrupt."""
+        try:
+            return bytes(self._decoder.decode(bytes(packet), self.max_samples))
+        except opuslib.OpusError as exc:
+            raise ValueError(f"bad Opus packet: {exc}") from exc
+
+
+__all__ = [
+    "FRAME_MS",
+    "FRAME_SAMPLES",
+    "SAMPLE_RATE",
+    "opus_available",
+    "OpusEncoder",
+    "OpusDecoder",
+]
@@ -18,6 +18,51 @@ class AppConfig:
     ru_speaker: str = "kseniya_16khz"
     window_sec: float = 2.0
     step_sec: float = 0.5
+    asr_cpu_threads: int = 0
+    infer_executor: str = "thread"
+    infer_workers: int = 0
+    infer_queue: int = 4
+    asr_batch_size: int = 1
+    asr_batch_wait_ms: float = 20.0
+    vad_gate: bool = True
+    vad_mode: int = 2
+    vad_energy_floor_dbfs: float = -55.0
+    tts_frame_ms: int = 40
+    piper_model: str = ""
+    piper_config: str = ""
+    tts_cache_mb: int = 32
+    tts_cache_dir: str = ""
+    tts_cache_dir_mb: int = 512
+    stabilizer_policy: str = "lcp"
+    stabilizer_history: int = 5
+    asr_streaming: bool = False
+    asr_max_buffer_sec: float = 15.0
+    asr_agreement_n: int = 2
+    step_max_sec: float = 0.0
+    vad_end_ms: int = 300
+    workers: int = 1
+    tts_threads: int = 0
+    outbound_max_sec: float = 2.0
+    outbound_policy: str = "drop"
+    inbound_max_rate: float = 1.5
+    inbound_burst_sec: float = 2.0
+    warmup_runs: int = 2
+    onnx_cache_dir: str = ""
+    tts_sessions: int = 1
+    tts_inter_threads: int = 0
+    tts_graph_opt: str = "all"
+    tts_execution_mode: str = "sequential"
+    tts_mem_arena: bool = True
+    tts_io_binding: bool = True
+    tts_batch_phrases: int = 0
+    trace_dir: str = ""
+    profile: bool = False
+    profile_sample_ms: float = 10.0
+    profile_spans: int = 65536
+    profile_dir: str = "profiles"
+    admin_remote: bool = False
+    opus: bool = True
+    opus_bitrate: int = 24000
 
 
 def load_config() -> AppConfig:
@@ -56,4 +101,49 @@ def load_config() -> AppConfig:
         ru_speaker=os.getenv("RU_SPEAKER", "kseniya_16khz"),
         window_sec=float(os.getenv("WINDOW_SEC", str(preset["window_sec"]))),
         step_sec=float(os.getenv("STEP_SEC", str(preset["step_sec"]))),
+        asr_cpu_threads=int(os.getenv("ASR_CPU_THREADS", "0")),
+        infer_executor=os.getenv("INFER_EXECUTOR", "thread"),
+        infer_workers=int(os.getenv("INFER_WORKERS", "0")),
+        infer_queue=int(os.getenv("INFER_QUEUE", "4")),
+        asr_batch_size=int(os.getenv("ASR_BATCH_SIZE", "1")),
+        asr_batch_wait_ms=float(os.getenv("ASR_BATCH_WAIT_MS", "20")),
+        vad_gate=os.getenv("VAD_GATE", "1") not in ("0", "false", "no"),
+        vad_mode=int(os.getenv("VAD_MODE", "2")),
+        vad_energy_floor_dbfs=float(os.getenv("VAD_ENERGY_FLOOR_DBFS", "-55")),
+        tts_frame_ms=int(os.getenv("TTS_FRAME_MS", "40")),
+        piper_model=os.getenv("PIPER_MODEL", ""),
+        piper_config=os.getenv("PIPER_CONFIG", ""),
+        tts_cache_mb=int(os.getenv("TTS_CACHE_MB", "32")),
+        tts_cache_dir=os.getenv("TTS_CACHE_DIR", ""),
+        tts_cache_dir_mb=int(os.getenv("TTS_CACHE_DIR_MB", "512")),
+        stabilizer_policy=os.getenv("STABILIZER_POLICY", "lcp"),
+        stabilizer_history=int(os.getenv("STABILIZER_HISTORY", "5")),
+        asr_streaming=os.getenv("ASR_STREAMING", "0") not in ("0", "false", "no"),
+        asr_max_buffer_sec=float(os.getenv("ASR_MAX_BUFFER_SEC", "15")),
+        asr_agreement_n=int(os.getenv("ASR_AGREEMENT_N", "2")),
+        step_max_sec=float(os.getenv("STEP_MAX_SEC", "0")),
+        vad_end_ms=int(os.getenv("VAD_END_MS", "300")),
+        workers=int(os.getenv("WORKERS", "1")),
+        tts_threads=int(os.getenv("TTS_THREADS", "0")),
+        outbound_max_sec=float(os.getenv("OUTBOUND_MAX_SEC", "2")),
+        outbound_policy=os.getenv("OUTBOUND_POLICY", "drop"),
+        inbound_max_rate=float(os.getenv("INBOUND_MAX_RATE", "1.5")),
+        inbound_burst_sec=float(os.getenv("INBOUND_BURST_SEC", "2")),
+        warmup_runs=int(os.getenv("WARMUP_RUNS", "2")),
+        onnx_cache_dir=os.getenv("ONNX_CACHE_DIR", ""),
+        tts_sessions=int(os.getenv("TTS_SESSIONS", "1")),
+        tts_inter_threads=int(os.getenv("TTS_INTER_THREADS", "0")),
+        tts_graph_opt=os.getenv("TTS_GRAPH_OPT", "all"),
+        tts_execution_mode=os.getenv("TTS_EXECUTION_MODE", "sequential"),
+        tts_mem_arena=os.getenv("TTS_MEM_ARENA", "1") not in ("0", "false", "no"),
+        tts_io_binding=os.getenv("TTS_IO_BINDING", "1") not in ("0", "false", "no"),
+        tts_batch_phrases=int(os.getenv("TTS_BATCH_PHRASES", "0")),
+        trace_dir=os.getenv("TRACE_DIR", ""),
+        profile=os.getenv("PROFILE", "0") not in ("0", "false", "no"),
+        profile_sample_ms=float(os.getenv("PROFILE_SAMPLE_MS", "10")),
+        profile_spans=int(os.getenv("PROFILE_SPANS", "65536")),
+        profile_dir=os.getenv("PROFILE_DIR", "profiles"),
+        admin_remote=os.getenv("ADMIN_REMOTE", "0") not in ("0", "false", "no"),
+        opus=os.getenv("OPUS", "1") not in ("0", "false", "no"),
+        opus_bitrate=int(os.getenv("OPUS_BITRATE", "24000")),
     )
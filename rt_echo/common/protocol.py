@@ -0,0 +1,151 @@
+"""Framed websocket protocol ``rt-echo.v1``.
+
+By default both directions carry raw PCM16 @ 16 kHz in binary messages and
+an empty binary message ends the stream. A client that offers the
+:data:`SUBPROTOCOL` websocket subprotocol, and a server that accepts it,
+switch to framed messages instead: every binary message starts with a
+fixed 14-byte little-endian header followed by the payload.
+
+========= ====== ========================================================
+offset    type   field
+========= ====== ========================================================
+0         u8     frame type, see below
+1         u8     flags
+2         u32    sequence number, per direction, from 0
+6         u64    timestamp in microseconds
+========= ====== ========================================================
+
+Client to server:
+
+``AUDIO``  PCM16 frame; the timestamp is its capture time on the client's
+           clock (any monotonic clock, the server never interprets it).
+``FLUSH``  finish the current utterance now: transcribe what arrived, speak
+           the still unstable text and answer with ``FLUSH``.
+``EOS``    like ``FLUSH``, then the server answers ``EOS`` and closes.
+
+Server to client, timestamps echo the capture time of the newest audio
+frame the producing tick had received:
+
+``AUDIO``    synthesized PCM16; :data:`FIRST` marks the first frame of a
+             reply, so ``now - timestamp`` is the mouth-to-ear latency.
+``PARTIAL``  JSON ``{"text"}``, the not yet stable end of the hypothesis.
+``FINAL``    JSON ``{"text", "queue_ms", "asr_ms"}``, text about to be
+             spoken, with the server time from the arrival of the echoed
+             frame to the start of ASR and the time ASR took.
+``FLUSH``, ``EOS``  acknowledgements, after all audio they cover.
+
+With :data:`SUBPROTOCOL_OPUS` (see :mod:`rt_echo.common.codec`) the framing
+is the same but ``AUDIO`` payloads in both directions are Opus packets of
+20 ms each. Clients offer it before :data:`SUBPROTOCOL` and servers without
+Opus pick the PCM fallback.
+"""
+
+from __future__ import annotations
+
+import json
+import struct
+import time
+from typing import NamedTuple, Optional, Sequence
+
+SUBPROTOCOL = "rt-echo.v1"
+# Same framing; ``AUDIO`` payloads in both directions are 20 ms Opus packets.
+SUBPROTOCOL_OPUS = "rt-echo.v1.opus"
+
+HEADER = struct.Struct("<BBIQ")
+
+AUDIO, PARTIAL, FINAL, FLUSH, EOS = 1, 2, 3, 4, 5
+
+FIRST = 0x01  # first audio frame of a reply
+
+_SEQ_MASK = 0xFFFFFFFF
+
+
+class ProtocolError(ValueError):
+    """Malformed framed message."""
+
+
+class Frame(NamedTuple):
+    type: int
+    flags: int
+    seq: int
+    ts: int
+    payload: bytes
+
+    def json(self) -> dict:
+        """Decode the payload of a text event."""
+        return dict(json.loads(self.payload))
+
+
+def select_subprotocol(
+    _connection: object, offered: Sequence[str], supported: Sequence[str] = (SUBPROTOCOL,)
+) -> Optional[str]:
+    """``select_subprotocol`` hook for ``websockets.serve``.
+
+    Picks the client's first offered protocol that is ``supported`` (bind
+    it with :func:`functools.partial`), so clients list their preference
+    first and a fallback after it. Clients offering nothing connect in raw
+    mode.
+    """
+    for name in offered:
+        if name in supported:
+            return name
+    return None
+
+
+def now_us() -> int:
+    """Monotonic timestamp in microseconds for capture times."""
+    return time.monotonic_ns() // 1000
+
+
+def encode(
+    kind: int, payload: bytes | memoryview = b"", seq: int = 0, ts: int = 0, flags: int = 0
+) -> bytes:
+    """Return one framed message."""
+    return b"".join((HEADER.pack(kind, flags, seq & _SEQ_MASK, ts), payload))
+
+
+def decode(message: bytes) -> Frame:
+    """Split a framed message into header fields and payload."""
+    if len(message) < HEADER.size:
+        raise ProtocolError(f"frame of {len(message)} bytes is shorter than the header")
+    kind, flags, seq, ts = HEADER.unpack_from(message)
+    return Frame(kind, flags, seq, ts, bytes(message[HEADER.size :]))
+
+
+class FrameEncoder:
+    """Numbers outgoing frames of one direction of a connection."""
+
+    def __init__(self) -> None:
+        self.seq = 0
+
+    def frame(
+        self, kind: int, payload: bytes | memoryview = b"", ts: int = 0, flags: int = 0
+    ) -> bytes:
+        seq, self.seq = self.seq, self.seq + 1
+        return encode(kind, payload, seq, ts, flags)
+
+    def audio(self, pcm: bytes | memoryview, ts: int = 0, flags: int = 0) -> bytes:
+        return self.frame(AUDIO, pcm, ts, flags)
+
+    def event(self, kind: int, ts: int = 0, **fields: object) -> bytes:
+        return self.frame(kind, json.dumps(fields, ensure_ascii=False).encode(), ts)
+
+
+__all__ = [
+    "SUBPROTOCOL",
+    "SUBPROTOCOL_OPUS",
+    "HEADER",
+    "AUDIO",
+    "PARTIAL",
+    "FINAL",
+    "FLUSH",
+    "EOS",
+    "FIRST",
+    "ProtocolError",
+    "Frame",
+    "select_subprotocol",
+    "now_us",
+    "encode",
+    "decode",
+    "FrameEncoder",
+]
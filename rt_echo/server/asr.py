@@ -2,6 +2,7 @@
 
 from types import SimpleNamespace
 
+from server.asr import AsrBatcher
 from server.asr import AsrEngine as _AsrEngine
 
 
@@ -16,14 +17,29 @@ class AsrEngine(_AsrEngine):
         Device to run the model on.
     compute_type: str
         Computation type passed to Faster-Whisper.
+    cpu_threads: int, optional
+        ctranslate2 intra-op threads per transcription, ``0`` for default.
+    num_workers: int, optional
+        Number of transcriptions allowed to run in parallel threads.
     """
 
-    def __init__(self, model: str, device: str, compute_type: str):
+    def __init__(
+        self,
+        model: str,
+        device: str,
+        compute_type: str,
+        cpu_threads: int = 0,
+        num_workers: int = 1,
+    ):
         cfg = SimpleNamespace(
-            asr_model=model, asr_device=device, asr_compute_type=compute_type
+            asr_model=model,
+            asr_device=device,
+            asr_compute_type=compute_type,
+            asr_cpu_threads=cpu_threads,
+            asr_num_workers=num_workers,
         )
         super().__init__(cfg)
 
 
-__all__ = ["AsrEngine"]
+__all__ = ["AsrBatcher", "AsrEngine"]
 
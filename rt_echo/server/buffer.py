@@ -1,10 +1,9 @@
 from __future__ import annotations
 
-from collections import deque
-from typing import Deque
-
 import numpy as np
 
+from rt_echo.common.audio import pcm16_to_float32_into
+
 
 class RingBuffer16k:
     """Ring buffer for 16 kHz PCM16 audio samples.
@@ -14,9 +13,20 @@ class RingBuffer16k:
     the window. If the requested window is larger than the amount of data
     available in the buffer, the result is padded with zeros at the
     beginning.
+
+    Samples live in a preallocated array of ``2 * max_samples`` entries where
+    every sample is written twice (at ``i`` and ``i + max_samples``). This
+    mirrored layout makes any window of up to ``max_samples`` newest samples a
+    contiguous slice, so :meth:`window` returns a read-only view without
+    copying, and :meth:`step` only moves a counter.
+
+    With ``float_mirror=True`` a parallel float32 array in ``[-1, 1)`` is kept
+    in the same layout. Only newly pushed samples are scaled into it, so
+    :meth:`window_f32` costs nothing per call and the conversion cost per
+    tick is proportional to the audio received since the previous tick.
     """
 
-    def __init__(self, max_samples: int = 16000 * 2) -> None:
+    def __init__(self, max_samples: int = 16000 * 2, float_mirror: bool = False) -> None:
         """Create a ring buffer.
 
         Parameters
@@ -24,34 +34,110 @@ class RingBuffer16k:
         max_samples:
             Maximum number of samples to keep in the buffer. Defaults to
             two seconds of audio at 16 kHz.
+        float_mirror:
+            Also maintain a float32 copy of the samples for
+            :meth:`window_f32`.
         """
         self.max_samples = max_samples
-        self._buf: Deque[int] = deque(maxlen=max_samples)
+        self._buf = np.zeros(2 * max(max_samples, 1), dtype=np.int16)
+        self._fbuf = (
+            np.zeros(2 * max(max_samples, 1), dtype=np.float32) if float_mirror else None
+        )
+        self._pos = 0  # index of the next write in ``[0, max_samples)``
+        self._count = 0  # number of valid samples currently buffered
+
+    def __len__(self) -> int:
+        return self._count
 
-    def push_pcm16(self, data: bytes) -> None:
+    def push_pcm16(self, data: bytes | bytearray | memoryview) -> None:
         """Append raw PCM16 bytes to the buffer."""
         if not data:
             return
         samples = np.frombuffer(data, dtype=np.int16)
-        self._buf.extend(int(s) for s in samples)
+        self._write(samples)
+
+    def _write(self, samples: np.ndarray) -> None:
+        cap = self.max_samples
+        if cap <= 0:
+            return
+        n = samples.size
+        if n >= cap:
+            # Only the newest ``cap`` samples survive; start a fresh cycle.
+            samples = samples[-cap:]
+            n = cap
+            self._pos = 0
+
+        pos = self._pos
+        first = min(n, cap - pos)
+        rest = n - first
+        self._buf[pos : pos + first] = samples[:first]
+        self._buf[pos + cap : pos + cap + first] = samples[:first]
+        if rest:
+            self._buf[:rest] = samples[first:]
+            self._buf[cap : cap + rest] = samples[first:]
+
+        fbuf = self._fbuf
+        if fbuf is not None:
+            head = pcm16_to_float32_into(samples[:first], fbuf[pos : pos + first])
+            fbuf[pos + cap : pos + cap + first] = head
+            if rest:
+                tail = pcm16_to_float32_into(samples[first:], fbuf[:rest])
+                fbuf[cap : cap + rest] = tail
+
+        self._pos = (pos + n) % cap
+        self._count = min(self._count + n, cap)
 
     def window(self, samples: int) -> np.ndarray:
         """Return the newest ``samples`` samples as a NumPy array.
 
         If there are fewer samples available, the array is left-padded with
         zeros to reach the requested length.
+
+        When the buffer holds at least ``samples`` samples the result is a
+        read-only view into the internal storage that stays valid until the
+        next :meth:`push_pcm16`; copy it if it must outlive that.
         """
         if samples <= 0:
             return np.zeros(0, dtype=np.int16)
 
-        arr = np.fromiter(self._buf, dtype=np.int16)
-        if arr.size >= samples:
-            return arr[-samples:]
+        avail = min(samples, self._count)
+        end = self._pos + self.max_samples
+        view = self._buf[end - avail : end]
+        if avail == samples:
+            view.flags.writeable = False
+            return view
+
+        out = np.zeros(samples, dtype=np.int16)
+        out[samples - avail :] = view
+        return out
 
-        pad = samples - arr.size
-        return np.concatenate((np.zeros(pad, dtype=np.int16), arr))
+    def window_f32(self, samples: int) -> np.ndarray:
+        """Return the newest ``samples`` samples scaled to float32.
+
+        Same semantics as :meth:`window` but reads from the float32 mirror,
+        which must have been enabled with ``float_mirror=True``.
+        """
+        if self._fbuf is None:
+            raise RuntimeError("RingBuffer16k was created without float_mirror")
+        if samples <= 0:
+            return np.zeros(0, dtype=np.float32)
+
+        avail = min(samples, self._count)
+        end = self._pos + self.max_samples
+        view = self._fbuf[end - avail : end]
+        if avail == samples:
+            view.flags.writeable = False
+            return view
+
+        out = np.zeros(samples, dtype=np.float32)
+        out[samples - avail :] = view
+        return out
 
     def step(self, samples: int) -> None:
         """Advance the buffer by removing ``samples`` samples from the left."""
-        for _ in range(min(samples, len(self._buf))):
-            self._buf.popleft()
+        if samples > 0:
+            self._count = max(self._count - samples, 0)
+
+    def clear(self) -> None:
+        """Drop all buffered samples."""
+        self._count = 0
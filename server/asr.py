@@ -2,9 +2,18 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
 import numpy as np
 from faster_whisper import WhisperModel
+from faster_whisper.audio import pad_or_trim
+from faster_whisper.tokenizer import Tokenizer
+from faster_whisper.transcribe import get_suppressed_tokens
+
+if TYPE_CHECKING:  # pragma: no cover - used only for type hints
+    from .executor import InferenceExecutor
 
 
 log = logging.getLogger(__name__)
@@ -19,13 +28,19 @@ class AsrEngine:
         Parameters
         ----------
         config:
-            Application configuration with ASR parameters.
+            Application configuration with ASR parameters. Optional
+            ``asr_cpu_threads`` and ``asr_num_workers`` set ctranslate2
+            intra-op threads per job and the number of jobs that may run
+            concurrently from different threads.
         """
         self.model = WhisperModel(
             config.asr_model,
             device=config.asr_device,
             compute_type=config.asr_compute_type,
+            cpu_threads=getattr(config, "asr_cpu_threads", 0),
+            num_workers=getattr(config, "asr_num_workers", 1),
         )
+        self._tokenizers: Dict[str, Tuple[Tokenizer, List[int]]] = {}
         log.info("ASR model loaded: %s", config.asr_model)
 
     def transcribe_window(self, audio: np.ndarray, lang: str = "ru") -> str:
@@ -53,3 +68,193 @@ class AsrEngine:
         text = "".join(segment.text for segment in segments)
         log.debug("transcription result: %s", text.strip())
         return text
+
+    def transcribe_words(
+        self, audio: np.ndarray, prompt: str = "", lang: str = "ru"
+    ) -> List[Tuple[str, float]]:
+        """Transcribe ``audio`` and return recognized words with end times.
+
+        Used by the streaming mode, which only feeds the not yet committed
+        audio and passes the committed text as ``prompt`` so the decoder
+        keeps the context without transcribing it again.
+
+        Parameters
+        ----------
+        audio: np.ndarray
+            Float32 PCM audio samples at expected sample rate.
+        prompt: str, optional
+            Preceding text given to Whisper as ``initial_prompt``.
+        lang: str, optional
+            Language code for transcription, defaults to ``"ru"``.
+
+        Returns
+        -------
+        List[Tuple[str, float]]
+            Words as produced by Whisper (with leading spaces) and their end
+            times in seconds from the start of ``audio``.
+        """
+        log.debug("transcribe words size=%d prompt=%d", len(audio), len(prompt))
+        segments, _ = self.model.transcribe(
+            audio,
+            language=lang,
+            beam_size=1,
+            vad_filter=True,
+            word_timestamps=True,
+            initial_prompt=prompt or None,
+            condition_on_previous_text=False,
+        )
+        words = [(w.word, w.end) for segment in segments for w in segment.words or ()]
+        log.debug("transcription words: %d", len(words))
+        return words
+
+    def _tokenizer(self, lang: str) -> Tuple[Tokenizer, List[int]]:
+        cached = self._tokenizers.get(lang)
+        if cached is None:
+            tokenizer = Tokenizer(
+                self.model.hf_tokenizer,
+                self.model.model.is_multilingual,
+                task="transcribe",
+                language=lang,
+            )
+            cached = (tokenizer, get_suppressed_tokens(tokenizer, [-1]))
+            self._tokenizers[lang] = cached
+        return cached
+
+    def transcribe_batch(self, audios: Sequence[np.ndarray], lang: str = "ru") -> List[str]:
+        """Transcribe several independent windows with one batched decode.
+
+        Every window is turned into log-Mel features padded to Whisper's
+        30 s input, the batch is encoded in a single ctranslate2 call and
+        decoded greedily without timestamps. Windows are expected to be short
+        (well under 30 s); unlike :meth:`transcribe_window` no Silero VAD
+        filter or temperature fallback is applied.
+
+        Parameters
+        ----------
+        audios: Sequence[np.ndarray]
+            Float32 PCM windows at the expected sample rate.
+        lang: str, optional
+            Language code for transcription, defaults to ``"ru"``.
+
+        Returns
+        -------
+        List[str]
+            Recognized text for each window, in input order.
+        """
+        if not audios:
+            return []
+        log.debug("transcribe batch size=%d", len(audios))
+        extractor = self.model.feature_extractor
+        features = np.stack(
+            [pad_or_trim(extractor(audio)[:, :-1]) for audio in audios]
+        )
+        encoder_output = self.model.encode(features)
+
+        tokenizer, suppress_tokens = self._tokenizer(lang)
+        prompt = [*tokenizer.sot_sequence, tokenizer.no_timestamps]
+        results = self.model.model.generate(
+            encoder_output,
+            [prompt] * len(audios),
+            beam_size=1,
+            max_length=self.model.max_length,
+            suppress_blank=True,
+            suppress_tokens=suppress_tokens,
+        )
+        return [tokenizer.decode(result.sequences_ids[0]) for result in results]
+
+
+class AsrBatcher:
+    """Cross-session scheduler batching ASR windows into single decodes.
+
+    Sessions await :meth:`transcribe`; a background task takes the first
+    pending window, waits up to ``max_wait_ms`` for more (up to
+    ``max_batch_size``) and runs :meth:`AsrEngine.transcribe_batch` on all of
+    them. At most ``concurrency`` batches run at once, so while workers are
+    busy new windows accumulate into larger batches.
+
+    Parameters
+    ----------
+    engine: AsrEngine
+        Engine providing ``transcribe_batch``.
+    max_batch_size: int, optional
+        Upper bound on windows per decode. Defaults to 8.
+    max_wait_ms: float, optional
+        How long the first window of a batch may wait for company.
+        Defaults to 20 ms.
+    executor: InferenceExecutor, optional
+        Executor running the batches; inline when omitted.
+    lang: str, optional
+        Language code for transcription, defaults to ``"ru"``.
+    """
+
+    def __init__(
+        self,
+        engine: AsrEngine,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 20.0,
+        executor: Optional["InferenceExecutor"] = None,
+        lang: str = "ru",
+    ) -> None:
+        self.engine = engine
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.executor = executor
+        self.lang = lang
+        self.concurrency = executor.max_workers if executor is not None else 1
+        self.batches = 0
+        self.windows = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def transcribe(self, audio: np.ndarray) -> str:
+        """Queue ``audio`` for the next batch and return its transcription."""
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+        assert self._queue is not None
+        fut: asyncio.Future[str] = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((audio, fut))
+        return await fut
+
+    async def _run(self) -> None:
+        assert self._queue is not None
+        queue = self._queue
+        slots = asyncio.Semaphore(self.concurrency)
+        while True:
+            await slots.acquire()
+            batch = [await queue.get()]
+            if queue.qsize() < self.max_batch_size - 1 and self.max_wait > 0:
+                await asyncio.sleep(self.max_wait)
+            while len(batch) < self.max_batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            # Sessions that were cancelled meanwhile no longer need a result.
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                slots.release()
+                continue
+            task = asyncio.create_task(self._decode(batch))
+            task.add_done_callback(lambda _t: slots.release())
+
+    async def _decode(self, batch: List[Tuple[np.ndarray, "asyncio.Future[str]"]]) -> None:
+        audios = [audio for audio, _ in batch]
+        self.batches += 1
+        self.windows += len(batch)
+        try:
+            if self.executor is None:
+                texts = self.engine.transcribe_batch(audios, self.lang)
+            else:
+                texts = await self.executor.run(self.engine.transcribe_batch, audios, self.lang)
+        except Exception as exc:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(exc)
+            return
+        for (_, fut), text in zip(batch, texts):
+            if not fut.done():
+                fut.set_result(text)
+
+    def close(self) -> None:
+        """Stop the background batching task."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
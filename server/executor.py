@@ -0,0 +1,220 @@
+"""Bounded executor running blocking ASR/TTS inference off the event loop."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, TypeVar
+
+from . import metrics
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# ctranslate2 uses 4 intra-op threads per job when ``cpu_threads`` is 0.
+_CT2_DEFAULT_THREADS = 4
+
+
+class ExecutorBusy(RuntimeError):
+    """Raised when the inference queue is full and the job was not admitted."""
+
+
+@dataclass
+class WaitStats:
+    """Aggregated time jobs spent queued before a worker picked them up."""
+
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    last: float = 0.0
+
+    def record(self, wait: float) -> None:
+        self.count += 1
+        self.total += wait
+        self.last = wait
+        if wait > self.max:
+            self.max = wait
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+def resolve_workers(config) -> int:
+    """Return the number of inference workers for ``config``.
+
+    ``config.infer_workers`` wins when positive; otherwise the pool is sized
+    so that workers times ctranslate2 threads per job fills the machine.
+    """
+    workers = int(getattr(config, "infer_workers", 0) or 0)
+    if workers > 0:
+        return workers
+    threads = int(getattr(config, "asr_cpu_threads", 0) or 0) or _CT2_DEFAULT_THREADS
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    return max(1, (cpus or 1) // threads)
+
+
+def _timed_call(fn: Callable[..., T], args: tuple) -> tuple[float, T]:
+    return time.monotonic(), fn(*args)
+
+
+class InferenceExecutor:
+    """Thread or process pool with a bounded number of admitted jobs.
+
+    At most ``max_workers + max_queue`` jobs are admitted at a time; further
+    submissions raise :class:`ExecutorBusy` immediately so callers can skip
+    work instead of piling up behind a slow model.
+
+    Parameters
+    ----------
+    max_workers: int
+        Number of worker threads or processes.
+    max_queue: int, optional
+        Jobs allowed to wait for a free worker. Defaults to ``max_workers``.
+    kind: str, optional
+        ``"thread"`` (default) or ``"process"``. Callables and arguments
+        submitted to a process pool must be picklable; engines are then
+        loaded per process via ``initializer``.
+    initializer: callable, optional
+        Run once in every worker process (process pools only).
+    initargs: tuple, optional
+        Arguments passed to ``initializer``.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_queue: int | None = None,
+        kind: str = "thread",
+        initializer: Callable[..., Any] | None = None,
+        initargs: tuple = (),
+    ) -> None:
+        self.max_workers = max(1, max_workers)
+        self.max_queue = self.max_workers if max_queue is None else max(0, max_queue)
+        self.kind = kind
+        self._pool: Executor
+        if kind == "process":
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=initializer,
+                initargs=initargs,
+            )
+        elif kind == "thread":
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="infer"
+            )
+        else:
+            raise ValueError(f"Unknown executor kind: {kind}")
+
+        self.pending = 0
+        self.rejected = 0
+        self.wait_stats = WaitStats()
+        log.info(
+            "inference executor: kind=%s workers=%d queue=%d",
+            kind,
+            self.max_workers,
+            self.max_queue,
+        )
+
+    @property
+    def load(self) -> float:
+        """Admitted jobs relative to the number of workers."""
+        return self.pending / self.max_workers
+
+    async def run(self, fn: Callable[..., T], *args: Any, force: bool = False) -> T:
+        """Run ``fn(*args)`` in the pool and return its result.
+
+        ``force=True`` admits the job even when the queue is full; use it for
+        work that must not be dropped, such as speaking committed text.
+
+        Raises
+        ------
+        ExecutorBusy
+            If ``max_workers + max_queue`` jobs are already admitted.
+        """
+        if not force and self.pending >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise ExecutorBusy("inference queue is full")
+
+        self.pending += 1
+        loop = asyncio.get_running_loop()
+        submitted = time.monotonic()
+        try:
+            started, result = await loop.run_in_executor(self._pool, _timed_call, fn, args)
+        finally:
+            self.pending -= 1
+        self.wait_stats.record(started - submitted)
+        metrics.QUEUE_WAIT_SECONDS.observe(started - submitted)
+        return result
+
+    async def start(self) -> None:
+        """Start all worker processes before the first real job.
+
+        Process pools spawn workers on demand, and every worker loads and
+        warms up its engines in ``initializer``; one job per worker moves
+        that cost to startup. Thread pools need nothing.
+        """
+        if self.kind != "process":
+            return
+        await asyncio.gather(
+            *(self.run(os.getpid, force=True) for _ in range(self.max_workers))
+        )
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+
+# --- process pool support -------------------------------------------------
+
+_engines: Dict[str, Any] = {}
+
+
+def init_process_engines(config) -> None:
+    """Load ASR and TTS engines inside a worker process."""
+    from server.server import load_engines
+
+    _engines["asr"], _engines["tts"] = load_engines(config)
+
+
+class ProcessAsr:
+    """Picklable stand-in for the ASR engine loaded in each worker process."""
+
+    def transcribe_window(self, audio, lang: str = "ru") -> str:
+        return _engines["asr"].transcribe_window(audio, lang)
+
+    def transcribe_batch(self, audios, lang: str = "ru"):
+        return _engines["asr"].transcribe_batch(audios, lang)
+
+    def transcribe_words(self, audio, prompt: str = "", lang: str = "ru"):
+        return _engines["asr"].transcribe_words(audio, prompt, lang)
+
+
+class ProcessTts:
+    """Picklable stand-in for the TTS engine loaded in each worker process."""
+
+    def synthesize(self, text: str):
+        return _engines["tts"].synthesize(text)
+
+    def synthesize_pcm16(self, text: str):
+        from server.tts import synthesize_pcm16
+
+        return synthesize_pcm16(_engines["tts"], text)
+
+
+def build_executor(config) -> InferenceExecutor:
+    """Create the inference executor described by ``config``."""
+    kind = getattr(config, "infer_executor", "thread")
+    workers = resolve_workers(config)
+    queue = getattr(config, "infer_queue", None)
+    if kind == "process":
+        return InferenceExecutor(
+            workers, queue, kind, initializer=init_process_engines, initargs=(config,)
+        )
+    return InferenceExecutor(workers, queue, kind)
@@ -0,0 +1,249 @@
+"""Flow control between a session and its websocket client.
+
+:class:`OutboundQueue` decouples the tick loop from the network: synthesized
+frames are queued without waiting and a sender task drains the queue, so a
+slow client only delays its own audio. The queue is bounded in seconds of
+audio and applies a slow-consumer policy when full.
+
+:class:`RateLimiter` is a token bucket used on the inbound side to reject
+clients that stream audio faster than real time.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Callable, Deque, Optional, Tuple
+
+from rt_echo.common.protocol import AUDIO, FIRST, HEADER, decode
+
+from . import metrics
+from .profiler import PROFILER
+
+log = logging.getLogger(__name__)
+
+POLICIES = ("drop", "coalesce", "disconnect")
+
+# Websocket close code for protocol policy violations (RFC 6455, 7.4.1).
+POLICY_VIOLATION = 1008
+
+
+class OutboundQueue:
+    """Bounded queue of outgoing audio frames drained by :meth:`run`.
+
+    :meth:`send` has the signature of ``ws.send`` but only enqueues a copy
+    of the frame, so callers never wait for the network. When the queued
+    audio would last longer than ``max_sec`` the ``policy`` decides:
+
+    ``"drop"``
+        Drop the oldest queued frames; stale audio is worth less than
+        fresh audio.
+    ``"coalesce"``
+        Like ``"drop"``, and the sender merges everything queued into one
+        message, so a lagging client pays the per-message cost once.
+    ``"disconnect"``
+        Close the connection with code 1008.
+
+    With ``framed`` the frames are messages of the ``rt-echo.v1`` protocol:
+    only ``AUDIO`` frames count against ``max_sec`` and are ever dropped,
+    text events and ``FLUSH``/``EOS`` acknowledgements always go out in
+    order. When the ``FIRST`` frame of a reply is dropped the flag moves to
+    the reply's next frame, so the client still sees where each reply
+    starts. Framed messages are never coalesced.
+
+    Parameters
+    ----------
+    ws:
+        Websocket with ``send`` and ``close`` coroutines.
+    max_sec: float
+        Seconds of queued audio that trigger the policy.
+    policy: str, optional
+        One of :data:`POLICIES`. Defaults to ``"drop"``.
+    bytes_per_sec: int, optional
+        Byte rate of PCM audio frames, to tell their duration. Defaults to
+        PCM16 at 16 kHz.
+    track: int, optional
+        Profiler track of the ``ws_send`` spans; the sender's thread if 0.
+    framed: bool, optional
+        Frames follow the framed protocol. Defaults to False (raw PCM).
+    frame_sec: float, optional
+        Duration of every audio frame, for compressed audio whose size says
+        nothing about its duration (one Opus packet per frame). ``0``
+        (default) derives it from the payload size and ``bytes_per_sec``.
+    """
+
+    def __init__(
+        self,
+        ws,
+        max_sec: float,
+        policy: str = "drop",
+        bytes_per_sec: int = 32_000,
+        track: int = 0,
+        framed: bool = False,
+        frame_sec: float = 0.0,
+    ) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown outbound policy: {policy}")
+        self.ws = ws
+        self.max_sec = max_sec
+        self.policy = policy
+        self.bytes_per_sec = bytes_per_sec
+        self.track = track
+        self.framed = framed
+        self.frame_sec = frame_sec
+        # (queued at, frame, seconds of audio counted against ``max_sec``)
+        self.frames: Deque[Tuple[float, bytes, float]] = deque()
+        self.queued = 0.0  # seconds of audio in ``frames``
+        self.sent = 0
+        self.dropped = 0
+        self.overflowed = False
+        self._ready = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._first_ts: Optional[int] = None  # reply whose FIRST frame was dropped
+
+    def _dequeue(self) -> bytes:
+        queued_at, frame, duration = self.frames.popleft()
+        self._forget(duration)
+        metrics.OUTBOUND_WAIT_SECONDS.observe(time.perf_counter() - queued_at)
+        return frame
+
+    def _forget(self, duration: float) -> None:
+        self.queued -= duration
+        metrics.OUTBOUND_QUEUED_SECONDS.dec(duration)
+
+    def _duration(self, frame: bytes) -> float:
+        """Return the seconds of audio in ``frame``, 0 if it is not audio."""
+        if self.framed:
+            if len(frame) < HEADER.size or frame[0] != AUDIO:
+                return 0.0
+            payload = len(frame) - HEADER.size
+        else:
+            payload = len(frame)
+        return self.frame_sec or payload / self.bytes_per_sec
+
+    def _drop_oldest(self) -> bool:
+        """Drop the oldest audio frame; False if there is none."""
+        for i, (_, frame, duration) in enumerate(self.frames):
+            if duration:
+                break
+        else:
+            return False
+        del self.frames[i]
+        self._forget(duration)
+        self.dropped += len(frame)
+        metrics.OUTBOUND_DROPPED_BYTES.inc(len(frame))
+        if self.framed and frame[1] & FIRST:
+            self._first_ts = decode(frame).ts
+            for j in range(i, len(self.frames)):
+                queued_at, later, later_duration = self.frames[j]
+                if later_duration:
+                    self.frames[j] = (queued_at, self._claim_first(later), later_duration)
+                    break
+        return True
+
+    def _claim_first(self, frame: bytes) -> bytes:
+        """Flag ``frame`` FIRST if it continues a reply that lost its first frame."""
+        if self._first_ts is None:
+            return frame
+        ts = decode(frame).ts
+        if frame[1] & FIRST or ts != self._first_ts:
+            self._first_ts = None  # a new reply started
+            return frame
+        self._first_ts = None
+        return b"".join((frame[:1], bytes((frame[1] | FIRST,)), frame[2:]))
+
+    async def send(self, data) -> None:
+        """Queue ``data`` for sending; never waits for the client."""
+        if self.overflowed:
+            return
+        # Frames may be views of reused buffers (the session's PCM scratch),
+        # so queuing them without a copy would send overwritten audio.
+        frame = bytes(data)
+        duration = self._duration(frame)
+        if duration and self.queued + duration > self.max_sec:
+            if self.policy == "disconnect":
+                self.overflowed = True
+                self._ready.set()
+                return
+            while self.queued + duration > self.max_sec and self._drop_oldest():
+                pass
+        if duration and self.framed:
+            frame = self._claim_first(frame)
+        self.frames.append((time.perf_counter(), frame, duration))
+        self._drained.clear()
+        self.queued += duration
+        metrics.OUTBOUND_QUEUED_SECONDS.inc(duration)
+        self._ready.set()
+
+    async def run(self) -> None:
+        """Send queued frames until cancelled or the client is dropped."""
+        while True:
+            if self.overflowed:
+                log.info("client too slow, %.1f s queued: disconnecting", self.queued)
+                metrics.SLOW_CLIENT_DISCONNECTS.inc()
+                self.close()
+                await self.ws.close(POLICY_VIOLATION, "client too slow")
+                return
+            if not self.frames:
+                self._drained.set()
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            if self.policy == "coalesce" and not self.framed and len(self.frames) > 1:
+                data = b"".join([self._dequeue() for _ in range(len(self.frames))])
+            else:
+                data = self._dequeue()
+            start = time.perf_counter()
+            await self.ws.send(data)
+            end = time.perf_counter()
+            metrics.SEND_SECONDS.observe(end - start)
+            PROFILER.add("ws_send", start, end, self.track)
+            metrics.BYTES_OUT.inc(len(data))
+            self.sent += len(data)
+
+    async def drain(self) -> None:
+        """Wait until everything queued so far has been sent."""
+        await self._drained.wait()
+
+    def close(self) -> None:
+        """Forget queued frames and release their share of the gauge."""
+        metrics.OUTBOUND_QUEUED_SECONDS.dec(self.queued)
+        self.frames.clear()
+        self.queued = 0.0
+
+
+class RateLimiter:
+    """Token bucket admitting ``rate`` units per second with bursts of ``burst``.
+
+    Parameters
+    ----------
+    rate: float
+        Sustained units (bytes) per second.
+    burst: float
+        Bucket size: units admitted at once after a pause, e.g. audio
+        delivered late by a congested network.
+    clock: callable, optional
+        Monotonic time source, for tests.
+    """
+
+    def __init__(
+        self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = burst
+        self.updated = clock()
+
+    def allow(self, amount: float) -> bool:
+        """Take ``amount`` tokens; return False if there are not enough."""
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if amount > self.tokens:
+            return False
+        self.tokens -= amount
+        return True
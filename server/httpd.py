@@ -0,0 +1,85 @@
+"""Minimal HTTP endpoint for health and admin routes."""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import ipaddress
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Union
+
+log = logging.getLogger(__name__)
+
+# A route returns a JSON-serializable object or ``(content_type, body)``.
+# Objects with ``"ready": false`` are answered with 503, so load balancers
+# and orchestrators hold traffic until the process is warmed up. Routes
+# doing slow work are coroutine functions and push it off the event loop.
+RouteResult = Union[dict, Tuple[str, bytes]]
+Route = Callable[[], Union[RouteResult, Awaitable[RouteResult]]]
+
+
+def _is_local(peer: Any) -> bool:
+    """Return True if ``peer`` (a socket's ``peername``) is a loopback address."""
+    try:
+        addr = ipaddress.ip_address(peer[0])
+    except (TypeError, ValueError, IndexError):
+        return False
+    if isinstance(addr, ipaddress.IPv6Address) and addr.ipv4_mapped is not None:
+        addr = addr.ipv4_mapped
+    return addr.is_loopback
+
+
+async def serve(
+    routes: Dict[str, Route],
+    port: int,
+    host: str = "0.0.0.0",
+    admin: Optional[Dict[str, Route]] = None,
+    admin_remote: bool = False,
+) -> None:
+    """Answer ``GET <path>`` requests from ``routes`` until cancelled.
+
+    ``admin`` routes change state or export internals. They only answer
+    ``POST`` and, unless ``admin_remote``, only clients on the loopback
+    interface; others get 403.
+    """
+    admin = admin or {}
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        req = await reader.read(1024)
+        parts = req.split(b" ", 2)
+        path = parts[1].decode("latin-1").split("?", 1)[0] if len(parts) > 1 else ""
+        route: Optional[Route] = None
+        forbidden = False
+        if parts[0] == b"GET":
+            route = routes.get(path)
+        elif parts[0] == b"POST":
+            route = admin.get(path)
+            forbidden = not (admin_remote or _is_local(writer.get_extra_info("peername")))
+        if route is not None and forbidden:
+            writer.write(b"HTTP/1.1 403 Forbidden\r\nContent-Length: 0\r\n\r\n")
+        elif route is not None:
+            result = route()
+            if inspect.isawaitable(result):
+                result = await result
+            status = "200 OK"
+            if isinstance(result, tuple):
+                content_type, body = result
+            else:
+                content_type, body = "application/json", json.dumps(result).encode()
+                if result.get("ready") is False:
+                    status = "503 Service Unavailable"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n".encode()
+                + f"Content-Length: {len(body)}\r\n\r\n".encode()
+                + body
+            )
+        else:
+            writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n")
+        await writer.drain()
+        writer.close()
+
+    srv = await asyncio.start_server(handle, host=host, port=port)
+    log.info("%s ready on :%d", ", ".join(sorted(routes) + sorted(admin)), port)
+    async with srv:
+        await srv.serve_forever()
@@ -0,0 +1,221 @@
+"""Low-overhead metrics exposed in the Prometheus text format.
+
+All metric values live in one preallocated float64 array owned by a
+:class:`Registry`: a counter or gauge is one slot, a histogram is one slot
+per bucket plus one for the sum. Recording is an index update with no
+allocation or string formatting; text is only produced when ``/metrics``
+is scraped.
+
+In ``--workers N`` mode every worker binds the registry to its own segment
+of a shared-memory array and the supervisor renders the sum of all
+segments.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Any, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+M = TypeVar("M", bound="_Metric")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, from sub-millisecond frame work to multi-second inference.
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry: "Registry", name: str, help: str, size: int) -> None:
+        self.name = name
+        self.help = help
+        self.offset = registry._allocate(size)
+        self.size = size
+        self._v = registry.values
+
+    def _render(self, values: np.ndarray, out: List[str]) -> None:
+        out.append(f"{self.name} {_fmt(values[self.offset])}")
+
+
+class Counter(_Metric):
+    """Monotonically increasing value."""
+
+    kind = "counter"
+
+    def __init__(self, registry: "Registry", name: str, help: str) -> None:
+        super().__init__(registry, name, help, 1)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._v[self.offset] += amount
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def __init__(self, registry: "Registry", name: str, help: str) -> None:
+        super().__init__(registry, name, help, 1)
+
+    def set(self, value: float) -> None:
+        self._v[self.offset] = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._v[self.offset] += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._v[self.offset] -= amount
+
+
+class Histogram(_Metric):
+    """Distribution over fixed upper bounds, stored as per-bucket counts."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        registry: "Registry",
+        name: str,
+        help: str,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        self.bounds = tuple(sorted(buckets))
+        # One slot per bound, one for +Inf, one for the sum.
+        super().__init__(registry, name, help, len(self.bounds) + 2)
+        self._sum = self.offset + len(self.bounds) + 1
+
+    def observe(self, value: float) -> None:
+        v = self._v
+        v[self.offset + bisect_left(self.bounds, value)] += 1
+        v[self._sum] += value
+
+    def _render(self, values: np.ndarray, out: List[str]) -> None:
+        counts = np.cumsum(values[self.offset : self._sum])
+        for bound, count in zip(self.bounds, counts):
+            out.append(f'{self.name}_bucket{{le="{_fmt(bound)}"}} {_fmt(count)}')
+        total = _fmt(counts[-1])
+        out.append(f'{self.name}_bucket{{le="+Inf"}} {total}')
+        out.append(f"{self.name}_sum {_fmt(values[self._sum])}")
+        out.append(f"{self.name}_count {total}")
+
+
+def _fmt(value: Any) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Registry:
+    """Set of metrics sharing one value array."""
+
+    def __init__(self) -> None:
+        self.metrics: List[_Metric] = []
+        self.values = np.zeros(0, dtype=np.float64)
+
+    @property
+    def size(self) -> int:
+        """Number of float64 slots used by all metrics."""
+        return self.values.size
+
+    def _allocate(self, size: int) -> int:
+        offset = self.values.size
+        self.values = np.concatenate((self.values, np.zeros(size, dtype=np.float64)))
+        for metric in self.metrics:
+            metric._v = self.values
+        return offset
+
+    def _add(self, metric: M) -> M:
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._add(Counter(self, name, help))
+
+    def gauge(self, name: str, help: str) -> Gauge:
+        return self._add(Gauge(self, name, help))
+
+    def histogram(
+        self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._add(Histogram(self, name, help, buckets))
+
+    def bind(self, values: np.ndarray) -> None:
+        """Move all metrics onto ``values``, e.g. a shared-memory segment.
+
+        Current values are added to what ``values`` already holds, so a
+        restarted worker continues its predecessor's counters. ``values``
+        must hold :attr:`size` float64 slots.
+        """
+        values += self.values
+        self.values = values
+        for metric in self.metrics:
+            metric._v = values
+
+    def gauge_slots(self) -> List[int]:
+        """Offsets of all gauges, to reset them when a worker restarts."""
+        return [m.offset for m in self.metrics if m.kind == "gauge"]
+
+    def render(self, values: Optional[np.ndarray] = None) -> bytes:
+        """Return the Prometheus text exposition of ``values``.
+
+        ``values`` defaults to the registry's own array; the supervisor
+        passes the sum over all worker segments.
+        """
+        values = self.values if values is None else values
+        out: List[str] = []
+        for metric in self.metrics:
+            out.append(f"# HELP {metric.name} {metric.help}")
+            out.append(f"# TYPE {metric.name} {metric.kind}")
+            metric._render(values, out)
+        out.append("")
+        return "\n".join(out).encode()
+
+    def route(self) -> Tuple[str, bytes]:
+        """``/metrics`` handler for :func:`server.httpd.serve`."""
+        return CONTENT_TYPE, self.render()
+
+
+REGISTRY = Registry()
+
+ASR_SECONDS = REGISTRY.histogram("rt_echo_asr_seconds", "ASR time per tick")
+TTS_SECONDS = REGISTRY.histogram("rt_echo_tts_seconds", "TTS synthesis time per chunk")
+RESAMPLE_SECONDS = REGISTRY.histogram(
+    "rt_echo_resample_seconds", "Resampling time of synthesized audio"
+)
+SEND_SECONDS = REGISTRY.histogram("rt_echo_send_seconds", "Websocket send time per message")
+OUTBOUND_WAIT_SECONDS = REGISTRY.histogram(
+    "rt_echo_outbound_wait_seconds", "Time audio frames waited in outbound queues"
+)
+QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "rt_echo_queue_wait_seconds", "Time inference jobs waited for a worker"
+)
+
+TICKS = REGISTRY.counter("rt_echo_ticks_total", "Session ticks")
+TICKS_SKIPPED = REGISTRY.counter(
+    "rt_echo_ticks_skipped_total", "Ticks dropped because of load or overrun"
+)
+ASR_SKIPPED = REGISTRY.counter("rt_echo_asr_skipped_total", "Ticks without speech, ASR skipped")
+DELTAS = REGISTRY.counter("rt_echo_deltas_total", "Stabilized text fragments spoken")
+BYTES_IN = REGISTRY.counter("rt_echo_bytes_in_total", "PCM bytes received from clients")
+BYTES_OUT = REGISTRY.counter("rt_echo_bytes_out_total", "PCM bytes sent to clients")
+OUTBOUND_DROPPED_BYTES = REGISTRY.counter(
+    "rt_echo_outbound_dropped_bytes_total", "PCM bytes dropped from full outbound queues"
+)
+SLOW_CLIENT_DISCONNECTS = REGISTRY.counter(
+    "rt_echo_slow_client_disconnects_total", "Clients disconnected for not reading audio"
+)
+INBOUND_REJECTED = REGISTRY.counter(
+    "rt_echo_inbound_rejected_total", "Clients disconnected for sending faster than real time"
+)
+
+SESSIONS = REGISTRY.gauge("rt_echo_sessions", "Active websocket sessions")
+BUFFERED_SECONDS = REGISTRY.gauge(
+    "rt_echo_buffered_seconds", "Audio held in session ring buffers"
+)
+OUTBOUND_QUEUED_SECONDS = REGISTRY.gauge(
+    "rt_echo_outbound_queued_seconds", "Audio waiting in outbound queues"
+)
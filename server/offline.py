@@ -0,0 +1,327 @@
+"""Offline transcription of recorded calls on a virtual clock.
+
+Every WAV file is fed to its own :class:`EchoSession` in 20 ms frames, as a
+live client would send them, but time is measured in samples instead of
+seconds: a tick runs after every ``step_sec`` of pushed audio, or right
+after the frame that ends speech, and waits for nothing. Ring buffer, VAD
+gating, stabilizer and TTS therefore see exactly what they would see live
+on an idle server (at the minimum step), and a file is processed as fast
+as the engines allow.
+
+Files are spread over a process pool; every worker loads the engines once.
+For each input ``<name>.wav`` the output directory receives the spoken
+transcript ``<name>.txt``, the synthesized reply ``<name>.wav`` (PCM16 at
+16 kHz) and ``<name>.json`` with the timed deltas and counters;
+``summary.json`` aggregates the run. ``<name>`` is the input's path
+relative to the deepest directory containing all inputs, so
+``day1/call.wav`` and ``day2/call.wav`` keep their subdirectories.
+
+Example::
+
+    python -m server.offline --out results/ calls/ --jobs 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from rt_echo.common.audio import float32_to_pcm16, resample
+from .scheduler import TickScheduler
+from .session import EchoSession
+
+log = logging.getLogger(__name__)
+
+CHUNK_SAMPLES = 320  # 20 ms frames, as sent by live clients
+
+Loader = Callable[[Any], Tuple[Any, Any]]
+
+
+@dataclass
+class FileResult:
+    """Outcome of one offline session."""
+
+    path: str
+    audio_sec: float = 0.0
+    wall_sec: float = 0.0
+    ticks: int = 0
+    asr_calls: int = 0
+    asr_skipped: int = 0
+    transcript: str = ""
+    deltas: List[Tuple[float, str]] = field(default_factory=list)
+    error: str = ""
+
+
+class PcmSink:
+    """Websocket stand-in collecting the synthesized reply."""
+
+    def __init__(self) -> None:
+        self.chunks: List[bytes] = []
+
+    async def send(self, data) -> None:
+        self.chunks.append(bytes(data))
+
+    def getvalue(self) -> bytes:
+        return b"".join(self.chunks)
+
+
+def read_wav(path: str, sr: int) -> bytes:
+    """Return ``path`` as mono PCM16 at ``sr``, mixing down and resampling."""
+    with wave.open(str(path), "rb") as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM is supported")
+        channels, src_sr = wf.getnchannels(), wf.getframerate()
+        data = wf.readframes(wf.getnframes())
+    if channels == 1 and src_sr == sr:
+        return data
+    audio = np.frombuffer(data, dtype=np.int16).reshape(-1, channels)
+    mono = audio.mean(axis=1, dtype=np.float32) / 32768.0
+    return float32_to_pcm16(resample(mono, src_sr, sr))
+
+
+def write_wav(path: Path, pcm: bytes, sr: int) -> None:
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sr)
+        wf.writeframes(pcm)
+
+
+async def run_session(
+    session: EchoSession, pcm: bytes, out, chunk_samples: int = CHUNK_SAMPLES
+) -> List[Tuple[float, str]]:
+    """Feed ``pcm`` to ``session`` on a virtual clock.
+
+    Returns ``(seconds, text)`` for every delta, timed at the audio position
+    of its tick. Text still unstable when the input ends is spoken last.
+    """
+    config = session.config
+    sr = config.asr_sr
+    # Trailing silence lets VAD and the stabilizer close the last utterance.
+    tail = getattr(config, "vad_end_ms", 300) / 1000 + 2 * config.step_sec
+    data = pcm + bytes(int(tail * sr) * 2)
+    chunk_bytes = chunk_samples * 2
+    deltas: List[Tuple[float, str]] = []
+    pushed = 0
+    due = session.step_samples
+    for i in range(0, len(data), chunk_bytes):
+        session.push(data[i : i + chunk_bytes])
+        pushed += len(data[i : i + chunk_bytes]) // 2
+        woken = session.scheduler.consume_wake()
+        if woken or pushed >= due:
+            text = await session.run_tick(out, woken)
+            if text:
+                deltas.append((pushed / sr, text))
+            due = pushed + session.step_samples
+    text = await session.finish_utterance(out)
+    if text:
+        deltas.append((pushed / sr, text))
+    return deltas
+
+
+async def transcribe_file(
+    path: str, config, asr, tts, out_dir: Optional[str] = None, name: Optional[str] = None
+) -> FileResult:
+    """Run one WAV file through a fresh session; write outputs to ``out_dir``.
+
+    Outputs are named ``<name>.*`` (may contain subdirectories), by default
+    after the file's stem.
+    """
+    result = FileResult(path=str(path))
+    start = time.perf_counter()
+    pcm = read_wav(path, config.asr_sr)
+    result.audio_sec = len(pcm) / 2 / config.asr_sr
+
+    session = EchoSession(config, asr, tts)
+    # Fixed step: inference time must not change the tick positions.
+    session.scheduler = TickScheduler(config.step_sec)
+    sink = PcmSink()
+    result.deltas = await run_session(session, pcm, sink)
+    result.transcript = "".join(text for _, text in result.deltas).strip()
+    result.ticks = session.ticks
+    result.asr_calls = session.asr_calls
+    result.asr_skipped = session.asr_skipped
+    result.wall_sec = time.perf_counter() - start
+
+    if out_dir is not None:
+        stem = Path(out_dir) / (name or Path(path).stem)
+        stem.parent.mkdir(parents=True, exist_ok=True)
+        stem.with_name(f"{stem.name}.txt").write_text(result.transcript + "\n", encoding="utf-8")
+        write_wav(stem.with_name(f"{stem.name}.wav"), sink.getvalue(), config.asr_sr)
+        stem.with_name(f"{stem.name}.json").write_text(
+            json.dumps(asdict(result), ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+    return result
+
+
+# --- process pool ---------------------------------------------------------
+
+_engines: Dict[str, Any] = {}
+
+
+def _init_worker(config, loader: Optional[Loader]) -> None:
+    if loader is None:
+        from server.server import load_engines
+
+        loader = load_engines
+    _engines["asr"], _engines["tts"] = loader(config)
+
+
+def _run_file(path: str, name: str, config, out_dir: str) -> FileResult:
+    try:
+        return asyncio.run(
+            transcribe_file(path, config, _engines["asr"], _engines["tts"], out_dir, name)
+        )
+    except Exception as exc:  # one bad file must not stop the corpus
+        log.exception("failed: %s", path)
+        return FileResult(path=str(path), error=repr(exc))
+
+
+def find_wavs(inputs: Sequence[str], skip: Optional[str] = None) -> List[str]:
+    """Expand directories in ``inputs`` to the WAV files below them.
+
+    Files below ``skip``, typically the output directory, are left out so
+    a rerun does not transcribe earlier replies.
+    """
+    skipped = Path(skip).resolve() if skip else None
+    paths: List[str] = []
+    for item in inputs:
+        p = Path(item)
+        found = sorted(p.rglob("*.wav")) if p.is_dir() else [p]
+        paths.extend(
+            str(f) for f in found if skipped is None or skipped not in f.resolve().parents
+        )
+    return paths
+
+
+def output_names(paths: Sequence[str]) -> List[str]:
+    """Return a distinct output name for every path in ``paths``.
+
+    Names are the paths relative to the deepest directory containing them
+    all, without the suffix; the rare remaining clashes (``a.wav`` next to
+    ``a.WAV``) get a ``-<n>`` suffix.
+    """
+    if not paths:
+        return []
+    resolved = [Path(p).resolve() for p in paths]
+    root = Path(os.path.commonpath([str(p.parent) for p in resolved]))
+    names: List[str] = []
+    seen: Dict[str, int] = {}
+    for path in resolved:
+        name = path.relative_to(root).with_suffix("").as_posix()
+        count = seen[name] = seen.get(name, 0) + 1
+        names.append(name if count == 1 else f"{name}-{count}")
+    return names
+
+
+def run_corpus(
+    paths: Sequence[str],
+    config,
+    out_dir: str,
+    jobs: int = 1,
+    loader: Optional[Loader] = None,
+) -> dict:
+    """Transcribe ``paths`` with ``jobs`` worker processes (inline for one).
+
+    Outputs are named by :func:`output_names`. ``loader(config) -> (asr, tts)`` loads the engines in every worker and
+    must be picklable; it defaults to :func:`server.server.load_engines`.
+    Returns the summary also written to ``out_dir/summary.json``.
+    """
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    results: List[FileResult] = []
+
+    def done(result: FileResult) -> None:
+        results.append(result)
+        log.info(
+            "%s: %.1f s audio in %.1f s%s",
+            result.path,
+            result.audio_sec,
+            result.wall_sec,
+            f" ERROR {result.error}" if result.error else "",
+        )
+
+    names = output_names(paths)
+    if jobs <= 1:
+        _init_worker(config, loader)
+        for path, name in zip(paths, names):
+            done(_run_file(path, name, config, out_dir))
+    else:
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(config, loader),
+        ) as pool:
+            futures = [
+                pool.submit(_run_file, path, name, config, out_dir)
+                for path, name in zip(paths, names)
+            ]
+            for future in as_completed(futures):
+                done(future.result())
+    wall = time.perf_counter() - start
+    audio = sum(r.audio_sec for r in results)
+    summary = {
+        "files": len(results),
+        "failed": [r.path for r in results if r.error],
+        "audio_sec": round(audio, 3),
+        "wall_sec": round(wall, 3),
+        "speed": round(audio / wall, 2) if wall else None,
+        "jobs": jobs,
+        "results": [
+            {k: v for k, v in asdict(r).items() if k != "deltas"}
+            for r in sorted(results, key=lambda r: r.path)
+        ],
+    }
+    (Path(out_dir) / "summary.json").write_text(
+        json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+    return summary
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    from rt_echo.common.config import load_config
+    from .executor import resolve_workers
+    from .workers import available_cpus
+
+    parser = argparse.ArgumentParser(description="Offline transcription on a virtual clock")
+    parser.add_argument("inputs", nargs="+", help="WAV files or directories")
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument(
+        "--jobs", type=int, default=0, help="Worker processes (default: sized to the CPUs)"
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    config = load_config()
+    jobs = args.jobs or resolve_workers(config)
+    cpus = len(available_cpus())
+    # Split the machine between the workers unless threads are configured.
+    if not config.asr_cpu_threads:
+        config.asr_cpu_threads = max(1, cpus // jobs)
+    if not config.tts_threads:
+        config.tts_threads = max(1, cpus // jobs)
+    paths = find_wavs(args.inputs, skip=args.out)
+    log.info("%d files, %d workers x %d threads", len(paths), jobs, config.asr_cpu_threads)
+    summary = run_corpus(paths, config, args.out, jobs)
+    print(
+        f"{summary['files']} files, {summary['audio_sec']:.0f} s audio in "
+        f"{summary['wall_sec']:.1f} s ({summary['speed']}x real time), "
+        f"{len(summary['failed'])} failed"
+    )
+
+
+if __name__ == "__main__":
+    main()
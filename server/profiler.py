@@ -0,0 +1,334 @@
+"""On-demand hot-path profiling: timed spans and stack sampling.
+
+The process-wide :data:`PROFILER` is off by default and then costs one
+attribute check per instrumented call site. Once started (from the admin
+routes on the health port, or ``PROFILE=1``) it records:
+
+* **spans** -- ``(name, start, end, track)`` tuples for the stages of a tick
+  and of inbound frame handling, written into a preallocated ring. A slot
+  is claimed with ``next()`` on an :func:`itertools.count` and filled with
+  one list store, both atomic under the GIL, so writers from the event loop
+  and executor threads never lock. The oldest spans are overwritten.
+* **stacks** -- a daemon thread samples the Python stacks of all other
+  threads every ``sample_ms`` and counts them per collapsed stack.
+
+Spans export as Chrome trace JSON (``chrome://tracing``, Perfetto) with one
+row per session and per thread; stacks export in the collapsed format read
+by ``flamegraph.pl`` and speedscope.
+
+Tracks: session ``n`` records its tick stages on track ``2 * n`` and its
+websocket sends on ``2 * n + 1``; spans without a track go to the recording
+thread (a negative track). Inference running in a process pool is only seen
+from the event loop, as the span awaiting it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import FrameType
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .httpd import Route
+
+Span = Tuple[str, float, float, int]
+
+
+def session_track(session_id: int, send: bool = False) -> int:
+    """Track of a session's tick stages, or of its sender task."""
+    return 2 * session_id + int(send)
+
+
+def _track_name(track: int, threads: Dict[int, str]) -> str:
+    if track < 0:
+        return threads.get(-track, f"thread {-track}")
+    return f"session {track // 2}" + (" send" if track % 2 else "")
+
+
+class _NoSpan:
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "track", "start")
+
+    def __init__(self, profiler: "Profiler", name: str, track: int) -> None:
+        self.profiler = profiler
+        self.name = name
+        self.track = track
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.profiler.add(self.name, self.start, time.perf_counter(), self.track)
+
+
+class StackSampler(threading.Thread):
+    """Thread counting the collapsed Python stacks of all other threads."""
+
+    def __init__(self, interval: float) -> None:
+        super().__init__(name="stack-sampler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._halt = threading.Event()
+        self._labels: Dict[Any, str] = {}
+
+    def _label(self, frame: FrameType) -> str:
+        code = frame.f_code
+        label = self._labels.get(code)
+        if label is None:
+            name = getattr(code, "co_qualname", code.co_name)
+            label = self._labels[code] = f"{name} ({os.path.basename(code.co_filename)})"
+        return label
+
+    def sample(self) -> None:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == self.ident:
+                continue
+            stack: List[str] = []
+            f: Optional[FrameType] = frame
+            while f is not None:
+                stack.append(self._label(f))
+                f = f.f_back
+            stack.append(names.get(ident, f"thread {ident}"))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def run(self) -> None:
+        while not self._halt.wait(self.interval):
+            self.sample()
+
+    def stop(self) -> None:
+        self._halt.set()
+
+
+class Profiler:
+    """Span ring and stack sampler of one process.
+
+    Parameters
+    ----------
+    capacity: int, optional
+        Spans kept; older spans are overwritten.
+    """
+
+    def __init__(self, capacity: int = 1 << 16) -> None:
+        self.enabled = False
+        self.started = 0.0
+        self.sample_ms = 0.0
+        self._reset(capacity)
+        self.sampler: Optional[StackSampler] = None
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+    def _reset(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.spans: List[Optional[Span]] = [None] * capacity
+        self._next = itertools.count()
+
+    def span(self, name: str, track: int = 0):
+        """Context manager timing its body as span ``name`` on ``track``.
+
+        Returns a shared no-op context when profiling is off.
+        """
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, name, track)
+
+    def add(self, name: str, start: float, end: float, track: int = 0) -> None:
+        """Record a span measured with :func:`time.perf_counter`."""
+        if not self.enabled:
+            return
+        if not track:
+            track = -threading.get_native_id()
+        self.spans[next(self._next) % self.capacity] = (name, start, end, track)
+
+    def start(self, sample_ms: float = 10.0, capacity: Optional[int] = None) -> None:
+        """Clear previous data and start recording (and sampling if ``sample_ms``)."""
+        self.stop()
+        self._reset(capacity or self.capacity)
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = time.perf_counter()
+        self.sample_ms = sample_ms
+        if sample_ms > 0:
+            self.sampler = StackSampler(sample_ms / 1000)
+            self.stacks = self.sampler.stacks
+            self.sampler.start()
+        self.enabled = True
+
+    def stop(self) -> None:
+        """Stop recording; recorded data stays available for export."""
+        self.enabled = False
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.sampler.join()
+            self.samples = self.sampler.samples
+            self.sampler = None
+
+    def recorded_spans(self) -> List[Span]:
+        """Spans in the ring, oldest first."""
+        spans = [s for s in self.spans if s is not None]
+        spans.sort(key=lambda s: s[1])
+        return spans
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage count and latency percentiles in milliseconds."""
+        durations: Dict[str, List[float]] = {}
+        for name, start, end, _ in self.recorded_spans():
+            durations.setdefault(name, []).append(end - start)
+        out = {}
+        for name, values in sorted(durations.items()):
+            ms = np.array(values) * 1000
+            out[name] = {
+                "count": len(ms),
+                "mean": round(float(ms.mean()), 3),
+                "p50": round(float(np.percentile(ms, 50)), 3),
+                "p99": round(float(np.percentile(ms, 99)), 3),
+                "max": round(float(ms.max()), 3),
+            }
+        return out
+
+    def status(self) -> dict:
+        """Cheap state report; :meth:`summary` has the per-stage latencies."""
+        return {
+            "profiling": self.enabled,
+            "sample_ms": self.sample_ms,
+            "spans": self.capacity - self.spans.count(None),
+            "capacity": self.capacity,
+            "stack_samples": self.sampler.samples if self.sampler else self.samples,
+        }
+
+    def chrome_trace(self) -> dict:
+        """Recorded spans as a Chrome trace event document."""
+        pid = os.getpid()
+        threads = {t.native_id: t.name for t in threading.enumerate() if t.native_id}
+        events: List[dict] = []
+        tracks = set()
+        for name, start, end, track in self.recorded_spans():
+            tracks.add(track)
+            events.append(
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": round((start - self.started) * 1e6, 1),
+                    "dur": round((end - start) * 1e6, 1),
+                    "pid": pid,
+                    "tid": track,
+                }
+            )
+        for track in sorted(tracks):
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": track,
+                    "args": {"name": _track_name(track, threads)},
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def collapsed(self) -> str:
+        """Sampled stacks in the collapsed (folded) flamegraph format."""
+        stacks = dict(self.stacks)  # one C-level copy; the sampler keeps counting
+        return "".join(f"{stack} {n}\n" for stack, n in sorted(stacks.items()))
+
+    def dump(self, directory: str, stem: str) -> List[str]:
+        """Write ``<stem>.trace.json`` and ``<stem>.folded`` to ``directory``."""
+        out = Path(directory)
+        out.mkdir(parents=True, exist_ok=True)
+        trace_path, stacks_path = out / f"{stem}.trace.json", out / f"{stem}.folded"
+        trace_path.write_text(json.dumps(self.chrome_trace()))
+        stacks_path.write_text(self.collapsed())
+        return [str(trace_path), str(stacks_path)]
+
+
+PROFILER = Profiler()
+
+
+def start_from_config(config) -> None:
+    """Start :data:`PROFILER` with the ``profile_*`` settings of ``config``."""
+    PROFILER.start(
+        getattr(config, "profile_sample_ms", 10.0), getattr(config, "profile_spans", 1 << 16)
+    )
+
+
+def dump_stem() -> str:
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+
+
+def stop_and_dump(config, stem: str) -> dict:
+    """Stop :data:`PROFILER` and write its files to ``config.profile_dir``.
+
+    Returns the status with the written ``files`` and ``stages_ms``. Slow
+    with a full ring: call it off the event loop.
+    """
+    PROFILER.stop()
+    files = PROFILER.dump(getattr(config, "profile_dir", "profiles"), stem)
+    return {**PROFILER.status(), "files": files, "stages_ms": PROFILER.summary()}
+
+
+def status_routes() -> Dict[str, Route]:
+    """Read-only ``GET`` routes reporting on :data:`PROFILER`.
+
+    ``/profile`` reports the state, ``/profile/stages`` the per-stage
+    latencies, computed in a thread.
+    """
+
+    async def stages() -> dict:
+        return await asyncio.to_thread(PROFILER.summary)
+
+    return {"/profile": PROFILER.status, "/profile/stages": stages}
+
+
+def admin_routes(config) -> Dict[str, Route]:
+    """Admin routes controlling :data:`PROFILER` of this process.
+
+    Served as ``POST`` routes (see :func:`server.httpd.serve`).
+    ``/profile/start`` and ``/profile/stop`` toggle recording (stopping also
+    writes both files to ``config.profile_dir``), ``/profile/trace`` and
+    ``/profile/stacks`` return the current data directly. All of them run
+    in a thread, so exporting a full ring does not stall the sessions on the
+    event loop.
+    """
+
+    async def start() -> dict:
+        await asyncio.to_thread(start_from_config, config)
+        return PROFILER.status()
+
+    async def stop() -> dict:
+        return await asyncio.to_thread(stop_and_dump, config, dump_stem())
+
+    async def trace() -> Tuple[str, bytes]:
+        body = await asyncio.to_thread(lambda: json.dumps(PROFILER.chrome_trace()).encode())
+        return "application/json", body
+
+    async def stacks() -> Tuple[str, bytes]:
+        body = await asyncio.to_thread(lambda: PROFILER.collapsed().encode())
+        return "text/plain; charset=utf-8", body
+
+    return {
+        "/profile/start": start,
+        "/profile/stop": stop,
+        "/profile/trace": trace,
+        "/profile/stacks": stacks,
+    }
@@ -0,0 +1,117 @@
+"""Per-session tick scheduling."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Callable, Optional
+
+
+class TickScheduler:
+    """Deadline-based tick timer with an adaptive step.
+
+    Ticks are due every ``step`` seconds measured from the previous
+    deadline, not from the end of the previous tick, so inference time does
+    not accumulate as drift. Deadlines that passed while a tick was still
+    running are skipped and counted in :attr:`missed` instead of being run
+    back to back.
+
+    After every inference :meth:`record` updates an exponential moving
+    average of its latency, and the step becomes
+    ``clamp(max(min_step, headroom * latency) * max(load, 1), min_step, max_step)``:
+    slow inference or a saturated executor stretch the step, a fast and
+    idle server returns it to ``min_step``. :meth:`wake` makes the pending
+    :meth:`wait` return immediately, for example on end of speech.
+
+    Parameters
+    ----------
+    min_step: float
+        Shortest step in seconds.
+    max_step: float, optional
+        Longest step in seconds. Defaults to ``min_step`` (fixed step).
+    alpha: float, optional
+        Smoothing factor of the latency average. Defaults to 0.3.
+    headroom: float, optional
+        Step per second of inference latency. Defaults to 1.5.
+    clock: callable, optional
+        Monotonic clock in seconds. Defaults to :func:`time.monotonic`.
+    """
+
+    def __init__(
+        self,
+        min_step: float,
+        max_step: Optional[float] = None,
+        alpha: float = 0.3,
+        headroom: float = 1.5,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.min_step = min_step
+        self.max_step = max(max_step or min_step, min_step)
+        self.alpha = alpha
+        self.headroom = headroom
+        self.clock = clock
+        self.step = min_step
+        self.latency: Optional[float] = None
+        self.missed = 0
+        self.woken = 0
+        self._deadline: Optional[float] = None
+        self._wake = asyncio.Event()
+
+    @property
+    def deadline(self) -> Optional[float]:
+        """Clock time the next tick is due, None before the first wait."""
+        return self._deadline
+
+    def record(self, latency: float, load: float = 0.0) -> float:
+        """Account for an inference that took ``latency`` seconds.
+
+        ``load`` is the executor load (admitted jobs per worker). Returns
+        the new step.
+        """
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self.alpha * (latency - self.latency)
+        step = max(self.min_step, self.headroom * self.latency) * max(load, 1.0)
+        self.step = min(max(step, self.min_step), self.max_step)
+        return self.step
+
+    def wake(self) -> None:
+        """Make the pending or next :meth:`wait` return immediately."""
+        self._wake.set()
+
+    def consume_wake(self) -> bool:
+        """Return and clear a pending :meth:`wake`.
+
+        For drivers that tick on their own clock instead of :meth:`wait`.
+        """
+        woken = self._wake.is_set()
+        self._wake.clear()
+        return woken
+
+    async def wait(self) -> bool:
+        """Sleep until the next deadline; return True if woken early."""
+        now = self.clock()
+        if self._deadline is None:
+            self._deadline = now + self.step
+        woken = self._wake.is_set()
+        if not woken and self._deadline > now:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self._deadline - now)
+                woken = True
+            except asyncio.TimeoutError:
+                pass
+        self._wake.clear()
+
+        now = self.clock()
+        if woken:
+            self.woken += 1
+            self._deadline = now + self.step
+            return True
+        late = now - self._deadline
+        if late >= self.step:
+            self.missed += int(late // self.step)
+            self._deadline = now + self.step
+        else:
+            self._deadline += self.step
+        return False
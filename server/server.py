@@ -1,20 +1,63 @@
+import argparse
 import asyncio
+import functools
+import json
 import logging
-from typing import Optional
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional, Tuple, Union
 
 import websockets
 from websockets.server import WebSocketServerProtocol
 
 # --- конфиг
+from rt_echo.common.codec import opus_available
 from rt_echo.common.config import load_config
+from rt_echo.common.protocol import (
+    AUDIO,
+    EOS,
+    FLUSH,
+    SUBPROTOCOL,
+    SUBPROTOCOL_OPUS,
+    decode,
+    select_subprotocol,
+)
 # --- ASR / TTS / сессия
-from rt_echo.server.asr import AsrEngine
+from rt_echo.server.asr import AsrBatcher, AsrEngine
 from rt_echo.server.session import EchoSession
+from server.executor import (
+    InferenceExecutor,
+    ProcessAsr,
+    ProcessTts,
+    build_executor,
+    resolve_workers,
+)
+from server import metrics
+from server.flow import POLICY_VIOLATION, RateLimiter
+from server.httpd import Route, serve
+from server.profiler import (
+    PROFILER,
+    admin_routes,
+    dump_stem,
+    start_from_config,
+    status_routes,
+    stop_and_dump,
+)
+from server.trace import open_recorder
+from server.warmup import stage, timed, warm_up
+from rt_echo.server.tts_silero import SileroTTS
 try:
-    from rt_echo.server.tts_piper import PiperTTS as TTSEngine
+    from rt_echo.server.tts_piper import PiperTTS
 except Exception:  # pragma: no cover - Piper may be optional
     # fallback на Silero, если Piper не используется в проекте
-    from rt_echo.server.tts_silero import SileroTTS as TTSEngine
+    PiperTTS = None  # type: ignore
+
+TTSEngine = Union["PiperTTS", SileroTTS]
+
+if TYPE_CHECKING:  # pragma: no cover - used only for type hints
+    from server.workers import WorkerSlot
 
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
@@ -22,74 +65,294 @@ log = logging.getLogger("rt-echo")
 
 cfg = load_config()  # читает env: ASR_MODEL, ASR_DEVICE, ASR_COMPUTE_TYPE, RU_SPEAKER, WS_PORT
 WS_PORT = getattr(cfg, "ws_port", 8000)
+HEALTH_PORT = 8001
+PROTOCOL_ERROR = 1002  # код закрытия WS при битом кадре (RFC 6455, 7.4.1)
 
 asr_engine: Optional[AsrEngine] = None
 tts_engine: Optional[TTSEngine] = None
+executor: Optional[InferenceExecutor] = None
+batcher: Optional[AsrBatcher] = None
+active_sessions = 0
+ready = False  # модели загружены и прогреты, WS принимает подключения
+startup_timings: Dict[str, float] = {}
+
+
+def load_engines(
+    config, num_workers: int = 1, timings: Optional[Dict[str, float]] = None
+) -> Tuple[AsrEngine, TTSEngine]:
+    """Загрузить ASR и TTS параллельно и прогреть (в главном процессе или в воркере пула).
+
+    Длительность стадий пишется в лог и в ``timings``.
+    """
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+    # ctranslate2 и onnxruntime отпускают GIL при загрузке: грузим одновременно
+    with ThreadPoolExecutor(2, thread_name_prefix="load") as pool:
+        asr_future = pool.submit(timed, timings, "asr_load", load_asr, config, num_workers)
+        tts_future = pool.submit(timed, timings, "tts_load", load_tts, config)
+        asr, tts = asr_future.result(), tts_future.result()
+    warm_up(asr, tts, config, timings)
+    timings["total"] = time.perf_counter() - start
+    log.info("startup: engines ready in %.2f s", timings["total"])
+    return asr, tts
+
+
+def load_asr(config, num_workers: int = 1) -> AsrEngine:
+    """Whisper через faster-whisper."""
+    log.info(
+        "Loading ASR: model=%s device=%s compute=%s threads=%s workers=%d",
+        config.asr_model,
+        config.asr_device,
+        config.asr_compute_type,
+        config.asr_cpu_threads or "auto",
+        num_workers,
+    )
+    return AsrEngine(
+        config.asr_model,
+        config.asr_device,
+        config.asr_compute_type,
+        cpu_threads=config.asr_cpu_threads,
+        num_workers=num_workers,
+    )
+
+
+def load_tts(config) -> TTSEngine:
+    """PiperTTS по пути к .onnx (PIPER_MODEL), иначе SileroTTS по имени спикера."""
+    if config.tts_engine == "piper" and PiperTTS is not None and config.piper_model:
+        speaker_json = config.piper_config or f"{config.piper_model}.json"
+        model_sr = None
+        try:
+            model_sr = json.loads(Path(speaker_json).read_text())["audio"]["sample_rate"]
+        except (OSError, ValueError, KeyError):
+            log.warning("sample rate not found in %s, assuming 16 kHz", speaker_json)
+        log.info("Loading TTS engine: piper %s", config.piper_model)
+        return PiperTTS(
+            config.piper_model,
+            speaker_json,
+            model_sample_rate=model_sr,
+            cache_bytes=config.tts_cache_mb << 20,
+            cache_dir=config.tts_cache_dir or None,
+            cache_dir_bytes=config.tts_cache_dir_mb << 20,
+            threads=config.tts_threads,
+            optimized_dir=config.onnx_cache_dir or None,
+            inter_threads=config.tts_inter_threads,
+            graph_optimization=config.tts_graph_opt,
+            execution_mode=config.tts_execution_mode,
+            mem_arena=config.tts_mem_arena,
+            sessions=config.tts_sessions,
+            io_binding=config.tts_io_binding,
+            batch_phrases=config.tts_batch_phrases,
+        )
+    if config.tts_engine == "piper":
+        log.warning("PIPER_MODEL is not set or Piper is unavailable, using Silero")
+    log.info("Loading TTS engine: silero %s", config.ru_speaker)
+    return SileroTTS(config.ru_speaker)
 
 
 async def ws_handler(ws: WebSocketServerProtocol) -> None:
     """На каждое подключение — своя EchoSession."""
+    global active_sessions
     assert asr_engine and tts_engine
-    session = EchoSession(cfg, asr_engine, tts_engine)
+    recorder = open_recorder(cfg.trace_dir, cfg) if cfg.trace_dir else None
+    # клиент, предложивший субпротокол rt-echo.v1(.opus), говорит кадрами с заголовком
+    opus = ws.subprotocol == SUBPROTOCOL_OPUS
+    framed = opus or ws.subprotocol == SUBPROTOCOL
+    session = EchoSession(
+        cfg, asr_engine, tts_engine, executor, batcher, recorder, framed=framed, opus=opus
+    )
     writer_task = asyncio.create_task(session.tick(ws))  # периодический ASR→TTS→send
+    active_sessions += 1
+    metrics.SESSIONS.inc()
+    # Клиент не может слать аудио быстрее реального времени (с запасом на джиттер).
+    bytes_per_sec = cfg.asr_sr * 2
+    limiter = (
+        RateLimiter(bytes_per_sec * cfg.inbound_max_rate, bytes_per_sec * cfg.inbound_burst_sec)
+        if cfg.inbound_max_rate > 0
+        else None
+    )
     try:
         async for msg in ws:
-            if isinstance(msg, bytes):
-                session.push(msg)  # PCM16@16k входящий блок
+            if not isinstance(msg, bytes):
+                continue
+            capture_ts = 0
+            if framed:
+                try:
+                    frame = decode(msg)
+                    if frame.type == AUDIO and session.decoder is not None:
+                        frame = frame._replace(payload=session.decoder.decode(frame.payload))
+                except ValueError as exc:  # битый заголовок или Opus-пакет
+                    log.info("bad frame: %s", exc)
+                    await ws.close(PROTOCOL_ERROR, "bad frame")
+                    break
+                if frame.type in (FLUSH, EOS):
+                    session.request_flush(end=frame.type == EOS)
+                    continue
+                if frame.type != AUDIO:
+                    continue  # неизвестные типы — от более новых клиентов
+                msg, capture_ts = frame.payload, frame.ts
+            elif not msg:
+                # пустой кадр в сыром режиме — конец потока
+                session.request_flush(end=True)
+                continue
+            if limiter is not None and not limiter.allow(len(msg)):
+                log.info("client sends faster than real time: disconnecting")
+                metrics.INBOUND_REJECTED.inc()
+                await ws.close(POLICY_VIOLATION, "audio faster than real time")
+                break
+            with PROFILER.span("on_frame", session.track):
+                session.push(msg, capture_ts)  # PCM16@16k входящий блок
     finally:
+        active_sessions -= 1
+        metrics.SESSIONS.dec()
         writer_task.cancel()
 
 
+def server_subprotocols(config) -> Tuple[str, ...]:
+    """Субпротоколы, которые сервер принимает (Opus — если есть libopus)."""
+    if config.opus and opus_available():
+        return (SUBPROTOCOL_OPUS, SUBPROTOCOL)
+    return (SUBPROTOCOL,)
+
+
+def health_status() -> dict:
+    """Состояние процесса для /healthz (503, пока модели не прогреты)."""
+    status: dict = {
+        "status": "ok" if ready else "starting",
+        "ready": ready,
+        "sessions": active_sessions,
+        "startup_s": {k: round(v, 3) for k, v in startup_timings.items()},
+    }
+    if executor is not None:
+        wait = executor.wait_stats
+        status["executor"] = {
+            "pending": executor.pending,
+            "rejected": executor.rejected,
+            "queue_wait_ms_mean": round(wait.mean * 1000, 3),
+            "queue_wait_ms_max": round(wait.max * 1000, 3),
+        }
+    cache_stats = getattr(tts_engine, "cache_stats", None)
+    if cache_stats is not None:
+        status["tts_cache"] = cache_stats()
+    return status
+
+
 async def health_server() -> None:
-    """Простой /healthz на 8001 (не мешает WS на 8000)."""
-
-    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
-        req = await reader.read(1024)
-        if b"GET /healthz" in req:
-            body = b'{"status":"ok"}'
-            writer.write(
-                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
-                + f"Content-Length: {len(body)}\r\n\r\n".encode()
-                + body
-            )
-        else:  # pragma: no cover - other paths are not used in tests
-            writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n")
-        await writer.drain()
-        writer.close()
+    """Простой /healthz, /metrics и /profile/* на 8001 (не мешает WS на 8000)."""
+    routes: Dict[str, Route] = {"/healthz": health_status, "/metrics": metrics.REGISTRY.route}
+    routes.update(status_routes())
+    await serve(routes, HEALTH_PORT, admin=admin_routes(cfg), admin_remote=cfg.admin_remote)
 
-    srv = await asyncio.start_server(handle, host="0.0.0.0", port=8001)
-    log.info("/healthz ready on :8001")
-    async with srv:
-        await srv.serve_forever()
 
+async def sync_profiler(slot: "WorkerSlot", seen: float) -> float:
+    """Выполнить команду профилирования супервизора (>0 старт, <0 стоп).
 
-async def main() -> None:
-    global asr_engine, tts_engine
-    log.info(
-        "Loading ASR: model=%s device=%s compute=%s",
-        cfg.asr_model,
-        cfg.asr_device,
-        cfg.asr_compute_type,
-    )
-    asr_engine = AsrEngine(cfg.asr_model, cfg.asr_device, cfg.asr_compute_type)
+    Остановка и запись файлов идут в потоке, чтобы не тормозить сессии.
+    """
+    command = slot.get("profile")
+    if command != seen:
+        if command > 0:
+            await asyncio.to_thread(start_from_config, cfg)
+        elif PROFILER.enabled:
+            stem = f"worker{slot.index}-{dump_stem()}"
+            result = await asyncio.to_thread(stop_and_dump, cfg, stem)
+            log.info("profile written: %s", ", ".join(result["files"]))
+    return command
 
-    log.info("Loading TTS engine…")
-    # PiperTTS обычно принимает путь к .onnx, SileroTTS — имя спикера.
-    try:
-        tts_engine = TTSEngine(cfg)  # если твой класс принимает cfg
-    except TypeError:  # pragma: no cover - compatibility path
-        # совместимость со старой сигнатурой
-        tts_engine = TTSEngine(getattr(cfg, "ru_speaker", "kseniya_16khz"))
 
-    ws_srv = await websockets.serve(ws_handler, "0.0.0.0", WS_PORT, max_size=2**23)
-    log.info("WS server on :%d", WS_PORT)
+async def publish_stats(slot: "WorkerSlot", interval: float = 1.0) -> None:
+    """Воркер пишет свои счётчики в общую память супервизора."""
+    profile = 0.0
+    while True:
+        profile = await sync_profiler(slot, profile)
+        slot.update(
+            pid=os.getpid(), heartbeat=time.time(), sessions=active_sessions, ready=float(ready)
+        )
+        if executor is not None:
+            wait = executor.wait_stats
+            slot.update(
+                pending=executor.pending,
+                rejected=executor.rejected,
+                queue_wait_ms_mean=wait.mean * 1000,
+                queue_wait_ms_max=wait.max * 1000,
+            )
+        await asyncio.sleep(interval)
+
 
-    await asyncio.gather(ws_srv.wait_closed(), health_server())
+async def main(slot: Optional["WorkerSlot"] = None) -> None:
+    """Запустить сервер; со ``slot`` — как один из воркеров ``--workers N``."""
+    global asr_engine, tts_engine, executor, batcher, ready
+    if cfg.profile:
+        start_from_config(cfg)
+    # /healthz (или слот воркера) отвечает "starting" уже во время загрузки
+    background = [
+        asyncio.create_task(health_server() if slot is None else publish_stats(slot))
+    ]
+    start = time.perf_counter()
+    executor = build_executor(cfg)
+    if executor.kind == "process":
+        # модели грузятся и прогреваются в каждом процессе пула через initializer
+        asr_engine, tts_engine = ProcessAsr(), ProcessTts()
+        with stage(startup_timings, "process_pool_start"):
+            await executor.start()
+    else:
+        # num_workers даёт ctranslate2 выполнять запросы из потоков параллельно
+        asr_engine, tts_engine = await asyncio.to_thread(
+            load_engines, cfg, resolve_workers(cfg), startup_timings
+        )
+    if cfg.asr_batch_size > 1:
+        # окна всех сессий декодируются пачками
+        batcher = AsrBatcher(
+            asr_engine, cfg.asr_batch_size, cfg.asr_batch_wait_ms, executor
+        )
+        log.info(
+            "ASR batching: max_batch=%d max_wait=%.0f ms",
+            cfg.asr_batch_size,
+            cfg.asr_batch_wait_ms,
+        )
+
+    subprotocols = server_subprotocols(cfg)
+    log.info("WS subprotocols: %s (raw PCM without)", ", ".join(subprotocols))
+    # воркеры делят один порт: ядро раскидывает подключения (SO_REUSEPORT);
+    # слушаем только после прогрева, чтобы первые клиенты не ловили холодный старт
+    ws_srv = await websockets.serve(
+        ws_handler,
+        "0.0.0.0",
+        WS_PORT,
+        max_size=2**23,
+        reuse_port=slot is not None,
+        select_subprotocol=functools.partial(select_subprotocol, supported=subprotocols),
+    )
+    startup_timings["ready"] = time.perf_counter() - start
+    ready = True
+    if slot is None:
+        log.info("WS server on :%d, ready in %.2f s", WS_PORT, startup_timings["ready"])
+    else:
+        log.info(
+            "WS worker %d on :%d (pid %d), ready in %.2f s",
+            slot.index,
+            WS_PORT,
+            os.getpid(),
+            startup_timings["ready"],
+        )
+    await asyncio.gather(ws_srv.wait_closed(), *background)
 
 
 if __name__ == "__main__":
-    try:
-        asyncio.run(main())
-    except KeyboardInterrupt:
-        pass
+    parser = argparse.ArgumentParser(description="rt-echo ASR→TTS server")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=cfg.workers,
+        help="число процессов-воркеров на общем WS_PORT (env WORKERS)",
+    )
+    args = parser.parse_args()
+    if args.workers > 1:
+        from server.workers import run_supervisor
+
+        run_supervisor(args.workers, HEALTH_PORT, admin_remote=cfg.admin_remote)
+    else:
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            pass
 
@@ -1,15 +1,33 @@
 from __future__ import annotations
 
 import asyncio
+import itertools
 import logging
 import time
-from typing import TYPE_CHECKING, Protocol
+from typing import TYPE_CHECKING, Any, Callable, Optional, Protocol, TypeVar
 
 import numpy as np
 
+from rt_echo.common.audio import Pcm16Converter
+from rt_echo.common.codec import FRAME_MS, OpusDecoder, OpusEncoder
+from rt_echo.common.protocol import EOS, FINAL, FIRST, FLUSH, PARTIAL, FrameEncoder
 from rt_echo.server.buffer import RingBuffer16k
+from . import metrics
+from .executor import ExecutorBusy, InferenceExecutor
+from .flow import OutboundQueue
+from .profiler import PROFILER, session_track
+from .scheduler import TickScheduler
 from .stabilizer import Stabilizer
-from .tts import ensure_pcm16_16k
+from .trace import DELTA, HYP, TICK, TraceRecorder
+from .tts import next_chunk, synthesize_pcm16
+from .vad import StreamingVad
+
+T = TypeVar("T")
+
+# Characters of committed text passed to Whisper as the prompt.
+_PROMPT_CHARS = 200
+
+_ids = itertools.count(1)
 
 
 class TTS(Protocol):
@@ -21,7 +39,7 @@ class TTS(Protocol):
 
 
 if TYPE_CHECKING:  # pragma: no cover - used only for type hints
-    from .asr import AsrEngine
+    from .asr import AsrBatcher, AsrEngine
 
 
 class EchoSession:
@@ -30,68 +48,478 @@ class EchoSession:
     The session accumulates incoming PCM16 audio in a :class:`RingBuffer16k`,
     periodically runs ASR to obtain text, stabilizes the hypothesis and
     speaks back newly stabilized text using provided TTS engine.
+
+    When an :class:`InferenceExecutor` is given, ASR and TTS run in its
+    workers so the event loop keeps serving other connections. Each session
+    awaits its own job, so it never has more than one in flight: if the
+    executor is saturated or inference outlasts the step, the affected
+    ticks are skipped and counted instead of queued.
+
+    Ticks follow a :class:`TickScheduler`: deadlines are kept regardless of
+    inference time and the step adapts between ``step_sec`` and
+    ``step_max_sec`` (``4 * step_sec`` when unset) to the measured ASR
+    latency and executor load.
+
+    With an :class:`AsrBatcher`, windows are transcribed together with those
+    of other sessions in one batched decode instead of individually.
+
+    Unless ``config.vad_gate`` is false, pushed audio is fed to a per-session
+    :class:`StreamingVad` as it arrives. Ticks with no speech since the
+    previous tick skip ASR; the first such tick after speech flushes the
+    stabilizer, speaks the never-stabilized tail and drops the buffered
+    utterance audio. Once ``vad_end_ms`` of silence follows speech, the next
+    tick is started immediately and finishes the utterance right away.
+
+    With ``config.asr_streaming`` the session keeps up to
+    ``asr_max_buffer_sec`` of audio and transcribes all of it with word
+    timestamps. Words the last ``asr_agreement_n`` hypotheses agree on are
+    committed: their audio is dropped from the buffer and their text is
+    passed to Whisper as the prompt of later ticks, so each decode only
+    covers the still unstable speech. Streaming windows differ per session
+    and bypass the batcher.
+
+    Synthesized audio goes through a per-session :class:`OutboundQueue`
+    holding at most ``outbound_max_sec`` of audio, drained by its own sender
+    task: a slow client never stalls the tick loop, and when its queue is
+    full ``outbound_policy`` drops stale audio or disconnects it.
+
+    With a :class:`TraceRecorder` the session records inbound audio, ASR
+    hypotheses, deltas and TTS output sizes for replay with
+    ``replay_trace.py``; the recorder is closed with the session.
+
+    With ``framed=True`` the client negotiated the ``rt-echo.v1`` protocol
+    (see :mod:`rt_echo.common.protocol`): audio goes out in numbered frames
+    echoing the capture time of the newest inbound frame, together with
+    partial and final text events, and :meth:`request_flush` is answered
+    with an acknowledgement frame. With ``opus=True`` as well, inbound
+    packets are decoded by :attr:`decoder` before :meth:`push` and the
+    synthesized audio is sent as 20 ms Opus packets.
+
+    While :data:`server.profiler.PROFILER` is recording, the stages of
+    frame handling and of every tick are timed as spans on the session's
+    track.
     """
 
-    def __init__(self, config, asr: "AsrEngine", tts: TTS) -> None:
+    def __init__(
+        self,
+        config,
+        asr: "AsrEngine",
+        tts: TTS,
+        executor: Optional[InferenceExecutor] = None,
+        batcher: Optional["AsrBatcher"] = None,
+        recorder: Optional[TraceRecorder] = None,
+        framed: bool = False,
+        opus: bool = False,
+    ) -> None:
         self.config = config
+        self.recorder = recorder
+        self.frames: Optional[FrameEncoder] = FrameEncoder() if framed or opus else None
+        self.encoder: Optional[OpusEncoder] = None
+        self.decoder: Optional[OpusDecoder] = None
+        if opus:
+            self.encoder = OpusEncoder(getattr(config, "opus_bitrate", 24_000), config.asr_sr)
+            self.decoder = OpusDecoder(config.asr_sr)
+        self.capture_ts = 0  # client timestamp of the newest frame
+        self.arrival = 0.0  # perf_counter when it arrived
+        self._reply_ts = 0  # ``capture_ts`` echoed by the current tick
+        self._flush: Optional[bool] = None  # pending flush; True ends the stream
+        self.id = next(_ids)
+        self.track = session_track(self.id)
         self.asr = asr
         self.tts = tts
+        self.executor = executor
+        self.batcher = batcher
+        self.ticks = 0
+        self.ticks_skipped = 0
+        self.asr_calls = 0
+        self.asr_skipped = 0
+        self._buffered = 0.0  # seconds last reported to the buffer gauge
 
+        self.streaming = getattr(config, "asr_streaming", False)
         max_samples = int(config.asr_sr * config.window_sec)
-        self.ring = RingBuffer16k(max_samples)
-        self.stabilizer = Stabilizer()
         self.window_samples = max_samples
+        if self.streaming:
+            max_samples = int(config.asr_sr * getattr(config, "asr_max_buffer_sec", 15.0))
+            self.stabilizer = Stabilizer(
+                n_history=getattr(config, "asr_agreement_n", 2), policy="local_agreement"
+            )
+        else:
+            self.stabilizer = Stabilizer(
+                n_history=getattr(config, "stabilizer_history", 5),
+                policy=getattr(config, "stabilizer_policy", "lcp"),
+            )
+        self.ring = RingBuffer16k(max_samples, float_mirror=True)
+        self.samples_pushed = 0
+        self.committed_text = ""  # recent committed text, the ASR prompt
         self.step_samples = int(config.asr_sr * config.step_sec)
         self.step_sec = config.step_sec
         self.log = logging.getLogger(__name__)
+        self.frame_bytes = int(config.asr_sr * getattr(config, "tts_frame_ms", 40) / 1000) * 2
+        if self.encoder is not None:
+            self.frame_bytes = self.encoder.frame_bytes  # one packet per message
+        self._reply_start = False  # next audio frame starts a reply
+        # Scratch for float→PCM16 of TTS output, reused for every chunk: the
+        # outbound queue copies each frame out of it. Views into it cannot
+        # cross a process boundary, so it is only used inline or with threads.
+        self.pcm_scratch: Optional[Pcm16Converter] = (
+            Pcm16Converter() if executor is None or executor.kind == "thread" else None
+        )
+
+        self.vad_gate = getattr(config, "vad_gate", True)
+        self.vad = StreamingVad(
+            config.asr_sr,
+            mode=getattr(config, "vad_mode", 2),
+            energy_floor_dbfs=getattr(config, "vad_energy_floor_dbfs", -55.0),
+        )
+        self._tick_frame = 0  # first VAD frame not yet covered by a tick
+        self._end_frames = max(getattr(config, "vad_end_ms", 300) // 20, 1)
+
+        self.scheduler = TickScheduler(
+            config.step_sec, getattr(config, "step_max_sec", 0.0) or 4 * config.step_sec
+        )
 
-    def push(self, data: bytes) -> None:
-        """Append raw PCM16 bytes to the internal ring buffer."""
+    def push(self, data: bytes, capture_ts: int = 0) -> None:
+        """Append raw PCM16 bytes to the internal ring buffer.
+
+        ``capture_ts`` is the client's timestamp of the frame in the framed
+        protocol, echoed back with the replies it leads to.
+        """
         self.log.debug("push %d bytes", len(data))
-        self.ring.push_pcm16(data)
+        self.capture_ts = capture_ts
+        self.arrival = time.perf_counter()
+        with PROFILER.span("ring_push", self.track):
+            self.ring.push_pcm16(data)
+        metrics.BYTES_IN.inc(len(data))
+        self.samples_pushed += len(data) // 2
+        if self.recorder is not None:
+            self.recorder.audio(data)
+        if self.vad_gate:
+            with PROFILER.span("vad", self.track):
+                self.vad.push(data)
+            if self._speech_ended() and (
+                self.stabilizer.history or self.vad.speech_since(self._tick_frame)
+            ):
+                self.scheduler.wake()
+
+    def request_flush(self, end: bool = False) -> None:
+        """Finish the utterance at the next tick, which starts at once.
+
+        Received audio is transcribed and the unstable tail spoken, then a
+        ``FLUSH`` frame is sent (framed protocol only). With ``end`` the
+        stream is over: ``EOS`` is sent instead and the websocket closed
+        once all queued audio is out.
+        """
+        self._flush = end or bool(self._flush)
+        self.scheduler.wake()
+
+    async def _event(self, out, kind: int, **fields: Any) -> None:
+        """Send a text event in the framed protocol."""
+        if self.frames is not None:
+            await out.send(self.frames.event(kind, self._reply_ts, **fields))
+
+    def _update_buffered(self) -> None:
+        """Publish the change of buffered audio to the metrics gauge."""
+        buffered = len(self.ring) / self.config.asr_sr
+        metrics.BUFFERED_SECONDS.inc(buffered - self._buffered)
+        self._buffered = buffered
+
+    def _speech_ended(self) -> bool:
+        """Return True if speech was followed by ``vad_end_ms`` of silence."""
+        last = self.vad.last_speech_frame
+        return last >= 0 and self.vad.frames_total - 1 - last >= self._end_frames
+
+    def _end_utterance(self) -> str:
+        """Flush the stabilizer, drop the utterance audio, return its tail."""
+        tail = self.stabilizer.finalize()
+        self.ring.clear()
+        self.committed_text = (self.committed_text + tail)[-_PROMPT_CHARS:]
+        self.log.debug("end of speech, final tail: %s", tail.strip())
+        return tail
+
+    async def _infer(self, fn: Callable[..., T], *args: Any, force: bool = False) -> T:
+        """Run blocking inference inline or in the configured executor."""
+        if self.executor is None:
+            return fn(*args)
+        return await self.executor.run(fn, *args, force=force)
+
+    async def _transcribe(self, audio: np.ndarray) -> str:
+        if self.batcher is not None:
+            return await self.batcher.transcribe(audio)
+        return await self._infer(self.asr.transcribe_window, audio)
+
+    async def _recognize(self, audio: np.ndarray) -> str:
+        """Transcribe ``audio`` and return the newly stabilized text."""
+        if not self.streaming:
+            with PROFILER.span("asr", self.track):
+                hyp = await self._transcribe(audio)
+            self.log.debug("ASR hypothesis: %s", hyp.strip())
+            if self.recorder is not None:
+                self.recorder.text(HYP, hyp)
+            with PROFILER.span("stabilizer", self.track):
+                return self.stabilizer.get_delta(hyp)
+
+        # ``audio`` ends at the newest sample pushed before the call.
+        start = self.samples_pushed - len(audio)
+        with PROFILER.span("asr", self.track):
+            words = await self._infer(self.asr.transcribe_words, audio, self.committed_text)
+        self.log.debug("ASR words: %s", "".join(w for w, _ in words).strip())
+        if self.recorder is not None:
+            self.recorder.words(words)
+        with PROFILER.span("stabilizer", self.track):
+            delta = self.stabilizer.get_delta_tokens([w for w, _ in words])
+        committed = len(self.stabilizer.stable_tokens)
+        if len(audio) >= self.ring.max_samples and committed < len(words):
+            # Buffer is full and nothing would free it: commit everything.
+            self.log.debug("ASR buffer full, forcing commit")
+            delta += "".join(w for w, _ in words[committed:])
+            committed = len(words)
+        if committed:
+            end = start + int(words[committed - 1][1] * self.config.asr_sr)
+            # Push may have continued (or overwritten old audio) meanwhile.
+            self.ring.step(end - (self.samples_pushed - len(self.ring)))
+            if committed == len(words):
+                self.stabilizer.finalize()
+            else:
+                self.stabilizer.rebase()
+            self.committed_text = (self.committed_text + delta)[-_PROMPT_CHARS:]
+        return delta
+
+    def _outbound(self, ws) -> OutboundQueue:
+        """Return the outbound queue of ``ws`` described by the config."""
+        config = self.config
+        return OutboundQueue(
+            ws,
+            getattr(config, "outbound_max_sec", 2.0),
+            getattr(config, "outbound_policy", "drop"),
+            config.asr_sr * 2,
+            session_track(self.id, send=True),
+            framed=self.frames is not None,
+            # Opus packets vary in size but each holds one frame.
+            frame_sec=FRAME_MS / 1000 if self.encoder is not None else 0.0,
+        )
+
+    async def _send_frame(self, ws, payload) -> None:
+        """Send one frame (PCM or an Opus packet) in the negotiated format."""
+        if self.frames is None:
+            await ws.send(payload)
+            return
+        flags = FIRST if self._reply_start else 0
+        self._reply_start = False
+        await ws.send(self.frames.audio(payload, self._reply_ts, flags))
+
+    async def _send_audio(self, ws, pcm: memoryview) -> None:
+        """Send a chunk of synthesized PCM in 20 ms frames.
+
+        With Opus the chunk is encoded in a worker thread, so a long reply
+        does not hold up the event loop; the samples short of a whole frame
+        wait for the next chunk.
+        """
+        if self.encoder is None:
+            for i in range(0, len(pcm), self.frame_bytes):
+                await self._send_frame(ws, pcm[i : i + self.frame_bytes])
+            return
+        for packet in await asyncio.to_thread(self.encoder.encode, pcm):
+            await self._send_frame(ws, packet)
+
+    async def _speak(self, ws, text: str) -> tuple[float, float]:
+        """Synthesize ``text`` and stream it to ``ws`` in small PCM frames.
+
+        Engines with ``synthesize_stream`` are advanced chunk by chunk and
+        every chunk is sent as soon as it is ready. ``ws`` is normally the
+        session's :class:`OutboundQueue`. Returns the time to the first
+        chunk and the total time spent sending.
+        """
+        start_tts = time.perf_counter()
+        stream = getattr(self.tts, "synthesize_stream", None)
+        chunks = stream(text) if stream is not None else None
+        first_chunk: Optional[float] = None
+        self._reply_start = True
+        send_time = 0.0
+        while True:
+            start_chunk = time.perf_counter()
+            # The text is already committed, so jobs are never dropped.
+            if chunks is None:
+                pcm = await self._infer(
+                    synthesize_pcm16, self.tts, text, self.pcm_scratch, force=True
+                )
+            else:
+                pcm = await self._infer(next_chunk, chunks, force=True)
+                if pcm is None:
+                    break
+            start_send = time.perf_counter()
+            metrics.TTS_SECONDS.observe(start_send - start_chunk)
+            PROFILER.add("tts", start_chunk, start_send, self.track)
+            if first_chunk is None:
+                first_chunk = start_send - start_tts
+
+            view = memoryview(pcm)
+            if self.recorder is not None:
+                self.recorder.tts(len(view))
+            await self._send_audio(ws, view)
+            end_send = time.perf_counter()
+            PROFILER.add("send", start_send, end_send, self.track)
+            send_time += end_send - start_send
+            if chunks is None:
+                break
+        if self.encoder is not None:
+            # The reply's last partial frame, padded with silence.
+            for packet in self.encoder.flush():
+                await self._send_frame(ws, packet)
+        return first_chunk or 0.0, send_time
+
+    async def finish_utterance(self, out) -> str:
+        """Speak what never stabilized and forget the utterance's audio.
+
+        Called when speech pauses, and by drivers whose input has ended.
+        Returns the spoken text.
+        """
+        tail = self._end_utterance()
+        if not tail.strip():
+            return ""
+        if self.recorder is not None:
+            self.recorder.text(DELTA, tail)
+        await self._event(out, FINAL, text=tail, queue_ms=0.0, asr_ms=0.0)
+        await self._speak(out, tail)
+        return tail
+
+    async def run_tick(self, out, woken: bool = False) -> str:
+        """Run one tick: transcribe, stabilize and speak via ``out``.
+
+        ``out`` is anything with an async ``send``, normally the session's
+        :class:`OutboundQueue`. ``woken`` marks a tick started early on end
+        of speech. Returns the text spoken during the tick.
+        """
+        with PROFILER.span("tick", self.track):
+            return await self._run_tick(out, woken)
+
+    async def _run_tick(self, out, woken: bool) -> str:
+        self._reply_ts, arrival = self.capture_ts, self.arrival
+        self.ticks += 1
+        metrics.TICKS.inc()
+        self._update_buffered()
+        self.log.debug("tick start%s", " (end of speech)" if woken else "")
+        if self.recorder is not None:
+            self.recorder.record(TICK)
+
+        if self.vad_gate and not self.vad.speech_since(self._tick_frame):
+            self.asr_skipped += 1
+            metrics.ASR_SKIPPED.inc()
+            if not self.stabilizer.history:
+                # The step adapts, so in streaming mode a fixed step would
+                # leave silence behind: drop all of it instead.
+                self.ring.step(len(self.ring) if self.streaming else self.step_samples)
+                return ""
+            return await self.finish_utterance(out)
+        tick_frame, self._tick_frame = self._tick_frame, self.vad.frames_total
+
+        # Non-owning float32 view, converted incrementally on push.
+        if self.streaming and not len(self.ring):
+            return ""
+        with PROFILER.span("ring_window", self.track):
+            audio = self.ring.window_f32(
+                len(self.ring) if self.streaming else self.window_samples
+            )
+            if self.executor is not None or self.batcher is not None:
+                # ``push`` keeps writing into the ring while the worker runs.
+                audio = audio.copy()
+
+        start_asr = time.perf_counter()
+        try:
+            delta = await self._recognize(audio)
+        except ExecutorBusy:
+            self.ticks_skipped += 1
+            metrics.TICKS_SKIPPED.inc()
+            self._tick_frame = tick_frame
+            self.log.debug("inference queue full, tick skipped")
+            if not self.streaming:
+                self.ring.step(self.step_samples)
+            return ""
+        self.asr_calls += 1
+        mic_to_asr = time.perf_counter() - start_asr
+        metrics.ASR_SECONDS.observe(mic_to_asr)
+        load = self.executor.load if self.executor is not None else 0.0
+        step = self.scheduler.record(mic_to_asr, load)
+        self.log.debug("ASR took %.3f s, step %.3f s", mic_to_asr, step)
+
+        if self.frames is not None:
+            await self._event(out, PARTIAL, text=self.stabilizer.unstable)
+        ended = self.vad_gate and self._speech_ended()
+        if ended:
+            # Speech is over: emit everything now instead of waiting for the
+            # stabilizer to agree on the last words.
+            delta += self._end_utterance()
+
+        if delta:
+            metrics.DELTAS.inc()
+            if self.recorder is not None:
+                self.recorder.text(DELTA, delta)
+            await self._event(
+                out,
+                FINAL,
+                text=delta,
+                queue_ms=round(max(start_asr - arrival, 0.0) * 1000, 3),
+                asr_ms=round(mic_to_asr * 1000, 3),
+            )
+            asr_to_tts, tts_to_play = await self._speak(out, delta)
+            self.log.debug(
+                "mic→asr=%.3f asr→tts=%.3f tts→play=%.3f",
+                mic_to_asr,
+                asr_to_tts,
+                tts_to_play,
+            )
+
+        if not self.streaming and not ended:
+            self.ring.step(self.step_samples)
+        self.log.debug("tick end")
+        return delta
 
     async def tick(self, ws) -> None:
         """Process audio in a loop and stream synthesized speech.
 
-        Every ``config.step_sec`` seconds the newest ``config.window_sec`` window of audio is
-        transcribed. Newly stabilized text is synthesized to speech and sent
-        over the provided websocket ``ws``.
+        On every tick of :attr:`scheduler` the newest ``config.window_sec``
+        window of audio is transcribed (in streaming mode, all not yet
+        committed audio), see :meth:`run_tick`. Newly stabilized text is
+        synthesized to speech and queued for the provided websocket ``ws``.
         """
 
+        out = self._outbound(ws)
+        sender = asyncio.create_task(out.run())
         try:
             while True:
-                await asyncio.sleep(self.step_sec)
-                self.log.debug("tick start")
-
-                window = self.ring.window(self.window_samples)
-                audio = window.astype(np.float32) / 32768.0
-
-                start_asr = time.perf_counter()
-                hyp = self.asr.transcribe_window(audio)
-                mic_to_asr = time.perf_counter() - start_asr
-                self.log.debug("ASR hypothesis: %s", hyp.strip())
-                delta = self.stabilizer.get_delta(hyp)
-
-                if delta:
-                    start_tts = time.perf_counter()
-                    audio, sr = self.tts.synthesize(delta)
-                    pcm = ensure_pcm16_16k(audio, sr)
-                    asr_to_tts = time.perf_counter() - start_tts
-
-                    start_play = time.perf_counter()
-                    await ws.send(pcm)
-                    tts_to_play = time.perf_counter() - start_play
-
-                    self.log.info(
-                        "metrics mic→asr=%.3f asr→tts=%.3f tts→play=%.3f",
-                        mic_to_asr,
-                        asr_to_tts,
-                        tts_to_play,
-                    )
-                else:
-                    self.log.info("metrics mic→asr=%.3f", mic_to_asr)
-
-                self.ring.step(self.step_samples)
-                self.log.debug("tick end")
+                missed = self.scheduler.missed
+                woken = await self.scheduler.wait()
+                # Deadlines that passed during the previous tick were dropped.
+                missed = self.scheduler.missed - missed
+                if missed:
+                    self.ticks_skipped += missed
+                    metrics.TICKS_SKIPPED.inc(missed)
+                await self.run_tick(out, woken)
+                if self._flush is not None:
+                    end, self._flush = self._flush, None
+                    await self.finish_utterance(out)
+                    if self.frames is not None:
+                        await out.send(self.frames.frame(EOS if end else FLUSH, ts=self._reply_ts))
+                    if end:
+                        self.log.info("end of stream")
+                        await out.drain()
+                        await ws.close()
+                        break
         except asyncio.CancelledError:  # pragma: no cover - cancellation flow
             pass
+        finally:
+            sender.cancel()
+            out.close()
+            if self.recorder is not None:
+                self.recorder.close()
+            metrics.BUFFERED_SECONDS.dec(self._buffered)
+            self._buffered = 0.0
+            self.log.info(
+                "session closed: ticks=%d asr_calls=%d asr_skipped=%d ticks_skipped=%d "
+                "bytes_sent=%d bytes_dropped=%d",
+                self.ticks,
+                self.asr_calls,
+                self.asr_skipped,
+                self.ticks_skipped,
+                out.sent,
+                out.dropped,
+            )
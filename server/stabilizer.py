@@ -2,13 +2,35 @@
 
 from __future__ import annotations
 
+import re
 from collections import deque
-from typing import Deque, List
+from typing import Deque, Sequence, Tuple
+
+Tokens = Tuple[str, ...]
 
 
 class Stabilizer:
     """Track stable prefix across streaming ASR hypotheses.
 
+    Hypotheses are split into tokens once on arrival: every token ends with
+    exactly one delimiter character, and trailing text without a delimiter
+    is an incomplete token that can never become stable. The stable prefix
+    is the agreed run of whole tokens, which is the same text a
+    character-level common prefix trimmed back to the last delimiter would
+    give, at linear cost.
+
+    Two policies are supported:
+
+    ``"lcp"`` (default)
+        The stable prefix is the common prefix of the last ``n_history``
+        hypotheses and may shrink when a hypothesis revises earlier words;
+        nothing is emitted until it grows past the previous prefix again.
+    ``"local_agreement"``
+        LocalAgreement-``n``: tokens on which the last ``n_history``
+        hypotheses agree are committed and never revised. Only the tokens
+        after the committed prefix are compared, so the cost per hypothesis
+        is bounded by the unstable suffix.
+
     Parameters
     ----------
     n_history: int, optional
@@ -16,29 +38,66 @@ class Stabilizer:
     delimiters: str, optional
         Characters considered as token delimiters. Stable prefix is trimmed to
         the last occurrence of any of these characters. Defaults to ``" .,!?"``.
+    policy: str, optional
+        ``"lcp"`` or ``"local_agreement"``. Defaults to ``"lcp"``.
     """
 
-    def __init__(self, n_history: int = 5, delimiters: str = " .,!?") -> None:
+    def __init__(
+        self, n_history: int = 5, delimiters: str = " .,!?", policy: str = "lcp"
+    ) -> None:
+        if policy not in ("lcp", "local_agreement"):
+            raise ValueError(f"Unknown stabilizer policy: {policy}")
         self.n_history = n_history
         self.delimiters = delimiters
+        self.policy = policy
         self.history: Deque[str] = deque(maxlen=n_history)
         self.stable_prefix: str = ""
+        self._tokens: Deque[Tokens] = deque(maxlen=n_history)
+        self._stable: Tokens = ()
+        delim = re.escape(delimiters)
+        self._token_re = re.compile(f"[^{delim}]*[{delim}]") if delimiters else None
+
+    @property
+    def stable_tokens(self) -> Tokens:
+        """Tokens making up :attr:`stable_prefix`."""
+        return self._stable
 
-    def _longest_common_prefix(self, strs: List[str]) -> str:
-        if not strs:
+    @property
+    def unstable(self) -> str:
+        """Part of the latest hypothesis beyond the stable prefix."""
+        if not self.history:
             return ""
-        prefix = strs[0]
-        for s in strs[1:]:
-            while not s.startswith(prefix) and prefix:
-                prefix = prefix[:-1]
-        return prefix
-
-    def _truncate_to_delim(self, text: str) -> str:
-        for i in range(len(text) - 1, -1, -1):
-            if text[i] in self.delimiters:
-                return text[: i + 1]
+        last = self.history[-1]
+        if last.startswith(self.stable_prefix):
+            return last[len(self.stable_prefix) :]
+        if self.policy == "local_agreement":
+            return "".join(self._tokens[-1][len(self._stable) :])
         return ""
 
+    def _tokenize(self, text: str) -> Tokens:
+        if self._token_re is None:
+            return ()
+        return tuple(self._token_re.findall(text))
+
+    def _agreement(self, ref: Tokens, start: int) -> int:
+        """Return how many tokens of ``ref`` all hypotheses share.
+
+        Tokens before ``start`` are known to agree and are not compared.
+        """
+        n = len(ref)
+        for other in self._tokens:
+            if other is ref:
+                continue
+            limit = min(n, len(other))
+            if limit <= start:
+                n = limit
+                continue
+            i = start
+            while i < limit and other[i] == ref[i]:
+                i += 1
+            n = i
+        return n
+
     def get_delta(self, new_hyp: str) -> str:
         """Return newly stabilized part of the hypothesis.
 
@@ -53,14 +112,74 @@ class Stabilizer:
             Portion of text that became stable since last invocation.
         """
         self.history.append(new_hyp)
+        return self._push(self._tokenize(new_hyp))
 
-        lcp = self._longest_common_prefix(list(self.history))
-        lcp = self._truncate_to_delim(lcp)
+    def get_delta_tokens(self, tokens: Sequence[str]) -> str:
+        """Like :meth:`get_delta` for a hypothesis that is already tokenized.
+
+        Useful when the recognizer provides words; every element is treated
+        as a complete token.
+        """
+        tokens = tuple(tokens)
+        self.history.append("".join(tokens))
+        return self._push(tokens)
 
-        prev = self.stable_prefix
-        if not lcp.startswith(prev):
-            delta = ""
-        else:
-            delta = lcp[len(prev) :]
-        self.stable_prefix = lcp
-        return delta
+    def _push(self, ref: Tokens) -> str:
+        self._tokens.append(ref)
+        prev = self._stable
+        k = len(prev)
+
+        if self.policy == "local_agreement":
+            if len(self._tokens) < self._tokens.maxlen:  # type: ignore[operator]
+                return ""
+            n = self._agreement(ref, k) if len(ref) >= k else k
+            if n <= k:
+                return ""
+            delta = "".join(ref[k:n])
+            self._stable = prev + ref[k:n]
+            self.stable_prefix += delta
+            return delta
+
+        # Every earlier hypothesis still in the history starts with ``prev``,
+        # so once ``ref`` does too only the suffix needs comparing.
+        extends = ref[:k] == prev
+        n = self._agreement(ref, k if extends else 0)
+        if extends and n >= k:
+            delta = "".join(ref[k:n])
+            if delta:
+                self._stable = ref[:n]
+                self.stable_prefix += delta
+            return delta
+
+        self._stable = ref[:n]
+        self.stable_prefix = "".join(self._stable)
+        return ""
+
+    def rebase(self) -> None:
+        """Forget the stable prefix, keeping the unstable suffixes.
+
+        Used after the audio behind the stable prefix has been dropped: the
+        stable tokens are removed from every remembered hypothesis so that
+        agreement continues on what remains.
+        """
+        k = len(self._stable)
+        if not k:
+            return
+        self._tokens = deque((t[k:] for t in self._tokens), maxlen=self.n_history)
+        self.history = deque(("".join(t) for t in self._tokens), maxlen=self.n_history)
+        self._stable = ()
+        self.stable_prefix = ""
+
+    def finalize(self) -> str:
+        """Flush the utterance and start over.
+
+        Returns the part of the latest hypothesis beyond the stable prefix,
+        i.e. text that never became stable because the speaker stopped, and
+        clears the history and stable prefix.
+        """
+        tail = self.unstable
+        self.history.clear()
+        self._tokens.clear()
+        self._stable = ()
+        self.stable_prefix = ""
+        return tail
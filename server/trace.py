@@ -0,0 +1,222 @@
+"""Compact binary traces of sessions for offline replay.
+
+A trace starts with ``MAGIC``, a little-endian ``u32`` length and a JSON
+header (format version, session config, wall-clock start). Records follow
+back to back, each a ``<BdI`` header (kind, seconds since the session
+started, payload length) and the payload:
+
+========== =============================================================
+``AUDIO``  inbound PCM16 frame as received
+``TICK``   empty, a tick started
+``HYP``    UTF-8 ASR hypothesis of the tick
+``WORDS``  JSON ``[[word, end_sec], ...]`` hypothesis in streaming mode
+``DELTA``  UTF-8 stabilized text passed to TTS
+``TTS``    ``<I`` bytes of synthesized PCM sent for one chunk
+========== =============================================================
+
+Recording only packs records into a memory buffer. Full buffers and the
+file handling go to one writer thread per process, so the event loop never
+waits for the disk.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+from dataclasses import asdict, is_dataclass
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"RTTRACE1"
+VERSION = 1
+
+AUDIO, TICK, HYP, WORDS, DELTA, TTS = range(1, 7)
+KIND_NAMES = {AUDIO: "audio", TICK: "tick", HYP: "hyp", WORDS: "words", DELTA: "delta", TTS: "tts"}
+
+_RECORD = struct.Struct("<BdI")
+_U32 = struct.Struct("<I")
+
+
+class Record(NamedTuple):
+    kind: int
+    t: float
+    payload: bytes
+
+
+class _Writer(threading.Thread):
+    """Appends buffers to trace files in the background."""
+
+    def __init__(self) -> None:
+        super().__init__(name="trace-writer", daemon=True)
+        self.queue: "queue.SimpleQueue[Tuple[Union[str, threading.Event], bytes, bool]]" = (
+            queue.SimpleQueue()
+        )
+
+    def run(self) -> None:
+        files: Dict[str, BinaryIO] = {}
+        while True:
+            path, data, close = self.queue.get()
+            if isinstance(path, threading.Event):
+                path.set()
+                continue
+            try:
+                f = files.get(path)
+                if f is None:
+                    f = files[path] = open(path, "ab")
+                f.write(data)
+                if close:
+                    files.pop(path).close()
+            except OSError as exc:
+                log.warning("trace %s: %s", path, exc)
+
+
+_writer: Optional[_Writer] = None
+_writer_lock = threading.Lock()
+_ids = itertools.count(1)
+
+
+def _submit(path: str, data: bytes, close: bool = False) -> None:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = _Writer()
+                _writer.start()
+    _writer.queue.put((path, data, close))
+
+
+def sync(timeout: Optional[float] = None) -> None:
+    """Wait until everything submitted so far is written."""
+    if _writer is not None:
+        done = threading.Event()
+        _writer.queue.put((done, b"", False))
+        done.wait(timeout)
+
+
+def _config_dict(config) -> dict:
+    if is_dataclass(config) and not isinstance(config, type):
+        values = asdict(config)
+    else:
+        values = dict(vars(config))
+    return {k: v for k, v in values.items() if isinstance(v, (bool, int, float, str))}
+
+
+class TraceRecorder:
+    """Append-only trace of one session.
+
+    Parameters
+    ----------
+    path: str
+        Trace file to create.
+    config:
+        Session configuration, stored in the header for replay.
+    flush_bytes: int, optional
+        Buffered bytes handed to the writer thread at once.
+    """
+
+    def __init__(self, path: str, config, flush_bytes: int = 64 << 10) -> None:
+        self.path = str(path)
+        self.flush_bytes = flush_bytes
+        self.start = time.monotonic()
+        header = json.dumps(
+            {"version": VERSION, "started": time.time(), "config": _config_dict(config)},
+            ensure_ascii=False,
+        ).encode()
+        self.buffer = bytearray(MAGIC + _U32.pack(len(header)) + header)
+        self.closed = False
+
+    def record(self, kind: int, payload: bytes = b"") -> None:
+        if self.closed:
+            return
+        buf = self.buffer
+        buf += _RECORD.pack(kind, time.monotonic() - self.start, len(payload))
+        buf += payload
+        if len(buf) >= self.flush_bytes:
+            self.flush()
+
+    def audio(self, data: bytes) -> None:
+        self.record(AUDIO, data)
+
+    def text(self, kind: int, text: str) -> None:
+        self.record(kind, text.encode())
+
+    def words(self, words) -> None:
+        self.record(WORDS, json.dumps(words, ensure_ascii=False).encode())
+
+    def tts(self, nbytes: int) -> None:
+        self.record(TTS, _U32.pack(nbytes))
+
+    def flush(self) -> None:
+        """Hand the buffered records to the writer thread."""
+        if self.buffer:
+            _submit(self.path, bytes(self.buffer))
+            self.buffer.clear()
+
+    def close(self) -> None:
+        if not self.closed:
+            _submit(self.path, bytes(self.buffer), close=True)
+            self.buffer.clear()
+            self.closed = True
+
+
+class MemoryRecorder(TraceRecorder):
+    """Recorder keeping its records in :attr:`records` instead of a file."""
+
+    def __init__(self) -> None:
+        self.start = time.monotonic()
+        self.records: List[Record] = []
+        self.closed = False
+
+    def record(self, kind: int, payload: bytes = b"") -> None:
+        self.records.append(Record(kind, time.monotonic() - self.start, payload))
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def open_recorder(trace_dir: str, config) -> TraceRecorder:
+    """Create a recorder with a unique file name in ``trace_dir``."""
+    Path(trace_dir).mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    path = Path(trace_dir) / f"{stamp}-{os.getpid()}-{next(_ids)}.rttrace"
+    return TraceRecorder(str(path), config)
+
+
+def read_trace(path: str) -> Tuple[dict, Iterator[Record]]:
+    """Return the header and an iterator over the records of a trace.
+
+    A record cut short by a crash ends the iteration.
+    """
+    data = Path(path).read_bytes()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"not a trace file: {path}")
+    offset = len(MAGIC)
+    (size,) = _U32.unpack_from(data, offset)
+    offset += _U32.size
+    header = json.loads(data[offset : offset + size])
+    if header.get("version") != VERSION:
+        raise ValueError(f"unsupported trace version: {header.get('version')}")
+    offset += size
+
+    def records() -> Iterator[Record]:
+        pos = offset
+        while pos + _RECORD.size <= len(data):
+            kind, t, length = _RECORD.unpack_from(data, pos)
+            pos += _RECORD.size
+            if pos + length > len(data):
+                return
+            yield Record(kind, t, data[pos : pos + length])
+            pos += length
+
+    return header, records()
@@ -1,23 +1,98 @@
 from __future__ import annotations
 
+import re
+import time
+from typing import Iterator, List, Optional
+
 import numpy as np
 
-from rt_echo.common.audio import resample
+from rt_echo.common.audio import Pcm16Converter, float32_to_pcm16_into, resample
+
+from .metrics import RESAMPLE_SECONDS
+from .profiler import PROFILER
 
 
 TARGET_SR = 16_000
 
+# A phrase ends after sentence or clause punctuation followed by whitespace.
+_PHRASE_END = re.compile(r"(?<=[.!?…;:,])\s+")
+
 
-def ensure_pcm16_16k(wav_f32: np.ndarray, sr: int) -> bytes:
+def ensure_pcm16_16k(
+    wav_f32: np.ndarray, sr: int, converter: Optional[Pcm16Converter] = None
+) -> bytes | memoryview:
     """Convert ``wav_f32`` to PCM16 @ 16 kHz.
 
     Any input floating point waveform with sample rate ``sr`` is first
     resampled to 16 kHz if necessary, then clipped to ``[-1, 1]`` and
     converted to 16-bit signed little-endian PCM bytes.
+
+    With a ``converter`` the conversion reuses its scratch buffers and a
+    memoryview into them is returned instead of new bytes; it is valid until
+    the converter is used again.
     """
 
     wav_f32 = np.asarray(wav_f32, dtype=np.float32)
     if sr != TARGET_SR:
+        start = time.perf_counter()
         wav_f32 = resample(wav_f32, sr, TARGET_SR)
-    wav_f32 = np.clip(wav_f32, -1.0, 1.0)
-    return (wav_f32 * 32767).astype(np.int16).tobytes()
+        end = time.perf_counter()
+        RESAMPLE_SECONDS.observe(end - start)
+        PROFILER.add("resample", start, end)
+    with PROFILER.span("pcm_convert"):
+        if converter is not None:
+            return converter.to_pcm16(wav_f32)
+        # Resampled audio is a fresh array and can serve as its own scratch.
+        tmp = None if sr == TARGET_SR else wav_f32
+        return float32_to_pcm16_into(wav_f32, np.empty(wav_f32.size, np.int16), tmp).tobytes()
+
+
+def synthesize_pcm16(
+    tts, text: str, converter: Optional[Pcm16Converter] = None
+) -> bytes | memoryview:
+    """Synthesize ``text`` with ``tts`` and return PCM16 @ 16 kHz bytes.
+
+    Module-level so it can be submitted to an inference executor, including
+    a process pool, as a single job. Engines with their own cached
+    ``synthesize_pcm16`` are used directly; otherwise ``converter`` is
+    passed on to :func:`ensure_pcm16_16k`.
+    """
+
+    direct = getattr(tts, "synthesize_pcm16", None)
+    if direct is not None:
+        return direct(text)
+    audio, sr = tts.synthesize(text)
+    return ensure_pcm16_16k(audio, sr, converter)
+
+
+def split_phrases(text: str, min_chars: int = 24) -> List[str]:
+    """Split ``text`` into phrases suitable for incremental synthesis.
+
+    Text is cut after sentence and clause punctuation; pieces shorter than
+    ``min_chars`` are merged with the following one so that very short
+    fragments do not each pay for a separate model run. Joining the result
+    gives back ``text`` without the inter-phrase whitespace.
+    """
+
+    phrases: List[str] = []
+    current = ""
+    for piece in _PHRASE_END.split(text.strip()):
+        current = f"{current} {piece}" if current else piece
+        if len(current) >= min_chars:
+            phrases.append(current)
+            current = ""
+    if current:
+        if phrases and len(current) < min_chars // 2:
+            phrases[-1] = f"{phrases[-1]} {current}"
+        else:
+            phrases.append(current)
+    return phrases
+
+
+def next_chunk(chunks: Iterator[bytes]) -> Optional[bytes]:
+    """Return the next chunk of a synthesis stream or ``None`` when done.
+
+    Module-level so advancing a stream can be submitted to an executor.
+    """
+
+    return next(chunks, None)
@@ -0,0 +1,181 @@
+"""Caches for text-to-speech: byte-bounded LRU and an on-disk store."""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+
+log = logging.getLogger(__name__)
+
+V = TypeVar("V")
+
+
+def _nbytes(value) -> int:
+    return int(getattr(value, "nbytes", None) or len(value))
+
+
+class LruCache(Generic[V]):
+    """Least-recently-used mapping bounded by the total size of its values.
+
+    Safe to share between inference threads.
+
+    Parameters
+    ----------
+    max_bytes: int
+        Upper bound on the summed size of cached values. Values larger than
+        this are never stored.
+    sizeof: callable, optional
+        Returns the size of a value in bytes. Defaults to ``nbytes`` for
+        arrays and ``len`` otherwise.
+    """
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[V], int] = _nbytes) -> None:
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[Hashable, tuple[V, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: Hashable, value: V) -> None:
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self._data[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._data.popitem(last=False)
+                self.nbytes -= evicted
+                self.evictions += 1
+
+
+class DiskAudioCache:
+    """Directory of PCM blobs keyed by a hash.
+
+    Entries are written atomically (temporary file plus rename), so several
+    processes may share one directory and a warm cache survives restarts.
+    Lookups are plain reads: a hit is copied into the in-memory cache
+    anyway, so mapping the file would save nothing.
+
+    Parameters
+    ----------
+    directory: str or path
+        Cache directory, created if missing.
+    max_bytes: int, optional
+        Budget of the summed size of the blobs, ``0`` for unbounded. A hit
+        refreshes the entry's modification time; once a write takes the
+        directory over budget, the least recently used entries are deleted
+        until it is back under 90% of it, so a full cache is not rescanned
+        on every write.
+    """
+
+    def __init__(self, directory: str | os.PathLike, max_bytes: int = 0) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self.nbytes = sum(size for _, size, _ in self._entries())
+
+    @staticmethod
+    def key_for(*parts: bytes) -> str:
+        h = hashlib.sha1()
+        for part in parts:
+            h.update(len(part).to_bytes(8, "little"))
+            h.update(part)
+        return h.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.pcm"
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        """Return ``(mtime, size, path)`` of every entry."""
+        entries = []
+        for path in self.directory.glob("*/*.pcm"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:  # evicted by another process
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.max_bytes:
+            try:
+                os.utime(path)
+            except OSError:  # evicted meanwhile
+                pass
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError as exc:  # pragma: no cover - disk full, permissions
+            log.warning("TTS disk cache write failed: %s", exc)
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self.nbytes += len(data)
+            if self.max_bytes and self.nbytes > self.max_bytes:
+                self._evict(self.max_bytes * 9 // 10)
+
+    def _evict(self, target: int) -> None:
+        """Delete the least recently used entries down to ``target`` bytes.
+
+        Sizes are recounted from the directory, which other processes may
+        share.
+        """
+        entries = sorted(self._entries())
+        self.nbytes = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self.nbytes <= target:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            self.nbytes -= size
+            self.evictions += 1
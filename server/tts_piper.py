@@ -4,9 +4,18 @@ from __future__ import annotations
 
 from pathlib import Path
 
+import hashlib
+import json
 import logging
+import os
+import queue
+from typing import Iterator, List, Optional, Sequence
+
 import numpy as np
 
+from .tts import ensure_pcm16_16k, split_phrases
+from .tts_cache import DiskAudioCache, LruCache
+
 try:  # pragma: no cover - environment may not have onnxruntime
     import onnxruntime as ort
 except Exception:  # pragma: no cover
@@ -20,6 +29,77 @@ except Exception:  # pragma: no cover
 
 log = logging.getLogger(__name__)
 
+GRAPH_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+
+# Piper's noise_scale, length_scale and noise_w when the voice config has
+# no "inference" section.
+DEFAULT_SCALES = (0.667, 1.0, 0.8)
+
+# Batched outputs are padded to the longest item. Exports that also return
+# the per-phoneme durations (in frames, zero for padding) give each item's
+# length as ``durations.sum() * hop_length``; without them phrases are
+# decoded one at a time.
+DURATIONS_OUTPUT = "durations"
+HOP_LENGTH = 256
+
+
+class _Runner:
+    """One inference session with its constant inputs and IO binding.
+
+    Piper exports take ``input`` (phoneme ids, ``[batch, n]``),
+    ``input_lengths`` (``[batch]``), ``scales`` and, for multi-speaker
+    voices, ``sid``; only inputs the model declares are fed. With IO
+    binding the inputs are bound without copies and the output is
+    allocated from the session's memory arena, whose buffers are reused
+    from run to run. :meth:`run` also returns the :data:`DURATIONS_OUTPUT`
+    of models that declare it, else None.
+    """
+
+    def __init__(self, session, scales: np.ndarray, io_binding: bool) -> None:
+        self.session = session
+        get_inputs = getattr(session, "get_inputs", None)
+        self.inputs = {i.name for i in get_inputs()} if get_inputs else {"input"}
+        get_outputs = getattr(session, "get_outputs", None)
+        outputs = [o.name for o in get_outputs()] if get_outputs else ["output"]
+        self.scales = scales
+        self.output = outputs[0]
+        self.durations = DURATIONS_OUTPUT if DURATIONS_OUTPUT in outputs[1:] else None
+        self._durations_index = outputs.index(DURATIONS_OUTPUT) if self.durations else 0
+        self.binding = None
+        if io_binding and hasattr(session, "io_binding"):
+            self.binding = session.io_binding()
+
+    def run(
+        self, ids: np.ndarray, lengths: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray | None]:
+        feeds = {"input": ids}
+        if "input_lengths" in self.inputs:
+            feeds["input_lengths"] = lengths
+        if "scales" in self.inputs:
+            feeds["scales"] = self.scales
+        if "sid" in self.inputs:
+            feeds["sid"] = np.zeros(len(ids), dtype=np.int64)
+        if self.binding is None:
+            outs = self.session.run(None, feeds)
+            return outs[0], outs[self._durations_index] if self.durations else None
+
+        binding = self.binding
+        for name, value in feeds.items():
+            binding.bind_cpu_input(name, value)
+        binding.bind_output(self.output)
+        if self.durations:
+            binding.bind_output(self.durations)
+        self.session.run_with_iobinding(binding)
+        bound = [value.numpy() for value in binding.get_outputs()]
+        binding.clear_binding_inputs()
+        binding.clear_binding_outputs()
+        return bound[0], bound[1] if self.durations else None
+
 
 class PiperTTS:
     """Simple wrapper around a Piper ONNX model.
@@ -29,7 +109,48 @@ class PiperTTS:
     model_path: str
         Path to the Piper ONNX model.
     speaker_json: str
-        Path to speaker configuration used for phonemization.
+        Path to speaker configuration used for phonemization. Its
+        ``inference`` section provides the synthesis scales.
+    model_sample_rate: int, optional
+        Sample rate the model produces, defaults to 16 kHz.
+    cache_bytes: int, optional
+        Budget of the in-memory ``(voice, phonemes) -> PCM16 @ 16 kHz``
+        cache used by :meth:`synthesize_pcm16`. ``0`` disables it.
+    phoneme_cache_bytes: int, optional
+        Budget of the ``text -> phonemes`` cache. ``0`` disables it.
+    cache_dir: str, optional
+        Directory persisting synthesized PCM across restarts.
+    cache_dir_bytes: int, optional
+        Budget of ``cache_dir``; least recently used entries are deleted
+        beyond it. ``0`` leaves the directory unbounded.
+    threads: int, optional
+        onnxruntime intra-op threads, ``0`` for the runtime default.
+    optimized_dir: str, optional
+        Directory caching the graph optimized by onnxruntime. The first
+        start saves it, later starts load it with optimizations disabled
+        and skip that work. The graph may be specific to the host's CPU,
+        so the directory should not be shared between machines.
+    inter_threads: int, optional
+        Inter-op threads for ``execution_mode="parallel"``, ``0`` for the
+        runtime default.
+    graph_optimization: str, optional
+        ``"disable"``, ``"basic"``, ``"extended"`` or ``"all"`` (default).
+    execution_mode: str, optional
+        ``"sequential"`` (default) or ``"parallel"`` operator execution.
+    mem_arena: bool, optional
+        Keep onnxruntime's CPU memory arena (default). Disabling it lowers
+        idle memory at the cost of allocations per run.
+    sessions: int, optional
+        Inference sessions in the pool. Concurrent synthesis calls each
+        take their own session instead of contending for one.
+    io_binding: bool, optional
+        Bind inputs and outputs instead of passing feed dictionaries.
+    batch_phrases: int, optional
+        Phrases :meth:`synthesize_stream` decodes together in one run after
+        the first one. ``0`` or ``1`` synthesizes phrase by phrase, as do
+        models without a :data:`DURATIONS_OUTPUT`. The hop length turning
+        durations into samples is read from ``audio.hop_length`` of
+        ``speaker_json`` (default 256).
     """
 
     sample_rate = 16_000
@@ -39,19 +160,135 @@ class PiperTTS:
         model_path: str,
         speaker_json: str,
         model_sample_rate: int | None = None,
+        cache_bytes: int = 32 << 20,
+        phoneme_cache_bytes: int = 4 << 20,
+        cache_dir: str | None = None,
+        cache_dir_bytes: int = 512 << 20,
+        threads: int = 0,
+        optimized_dir: str | None = None,
+        inter_threads: int = 0,
+        graph_optimization: str = "all",
+        execution_mode: str = "sequential",
+        mem_arena: bool = True,
+        sessions: int = 1,
+        io_binding: bool = True,
+        batch_phrases: int = 0,
     ) -> None:
         self.model_path = model_path
         self.speaker_json = speaker_json
         self.model_sample_rate = model_sample_rate or self.sample_rate
+        self.voice = f"{Path(model_path).name}:{Path(speaker_json).name}".encode()
+        self.phoneme_cache: LruCache | None = (
+            LruCache(phoneme_cache_bytes) if phoneme_cache_bytes > 0 else None
+        )
+        self.audio_cache: LruCache[bytes] | None = (
+            LruCache(cache_bytes) if cache_bytes > 0 else None
+        )
+        self.disk_cache = DiskAudioCache(cache_dir, cache_dir_bytes) if cache_dir else None
+        self.batch_phrases = batch_phrases
 
         if not Path(model_path).is_file():
             raise FileNotFoundError(f"Piper model not found: {model_path}")
 
         if ort is None:  # pragma: no cover - handled via mocks in tests
             raise RuntimeError("onnxruntime is required for PiperTTS")
+        if graph_optimization not in GRAPH_LEVELS:
+            raise ValueError(f"Unknown graph optimization level: {graph_optimization}")
+        if execution_mode not in ("sequential", "parallel"):
+            raise ValueError(f"Unknown execution mode: {execution_mode}")
+
+        self.threads = threads
+        self.inter_threads = inter_threads
+        self.graph_optimization = graph_optimization
+        self.execution_mode = execution_mode
+        self.mem_arena = mem_arena
+        self.scales, self.hop_length = self._read_voice(speaker_json)
+        self._runners: "queue.SimpleQueue[_Runner]" = queue.SimpleQueue()
+        for _ in range(max(1, sessions)):
+            runner = _Runner(self._load(optimized_dir), self.scales, io_binding)
+            self._runners.put(runner)
+        self.batching = runner.durations is not None
+        if batch_phrases > 1 and not self.batching:
+            log.info("Piper model has no %s output, phrases are not batched", DURATIONS_OUTPUT)
+        log.info("Piper model loaded: %s (%d sessions)", model_path, max(1, sessions))
+
+    @staticmethod
+    def _read_voice(speaker_json: str) -> tuple[np.ndarray, int]:
+        scales, hop_length = DEFAULT_SCALES, HOP_LENGTH
+        try:
+            voice = json.loads(Path(speaker_json).read_text())
+            inference = voice.get("inference", {})
+            scales = (
+                inference.get("noise_scale", scales[0]),
+                inference.get("length_scale", scales[1]),
+                inference.get("noise_w", scales[2]),
+            )
+            hop_length = int(voice.get("audio", {}).get("hop_length", hop_length))
+        except (OSError, ValueError, AttributeError):
+            log.warning("no inference scales in %s, using defaults", speaker_json)
+        return np.array(scales, dtype=np.float32), hop_length
+
+    @staticmethod
+    def optimized_path(model_path: str, optimized_dir: str) -> Path:
+        """Cache file of the optimized graph of ``model_path``.
+
+        The name changes with the model file and the onnxruntime version,
+        so stale graphs are never loaded.
+        """
+        stat = Path(model_path).stat()
+        ident = f"{Path(model_path).resolve()}:{stat.st_size}:{stat.st_mtime_ns}:"
+        ident += getattr(ort, "__version__", "")
+        digest = hashlib.sha1(ident.encode()).hexdigest()[:16]
+        return Path(optimized_dir) / f"{Path(model_path).stem}-{digest}.ort.onnx"
+
+    def _options(self, optimize: bool = True):
+        opts = ort.SessionOptions()
+        if self.threads > 0:
+            opts.intra_op_num_threads = self.threads
+            opts.inter_op_num_threads = 1
+        if self.execution_mode == "parallel":
+            opts.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+            if self.inter_threads > 0:
+                opts.inter_op_num_threads = self.inter_threads
+        if not self.mem_arena:
+            opts.enable_cpu_mem_arena = False
+        level = self.graph_optimization if optimize else "disable"
+        opts.graph_optimization_level = getattr(ort.GraphOptimizationLevel, GRAPH_LEVELS[level])
+        return opts
 
-        self.session = ort.InferenceSession(model_path)
-        log.info("Piper model loaded: %s", model_path)
+    def _load(self, optimized_dir: str | None):
+        model_path = self.model_path
+        if not optimized_dir:
+            default = (
+                self.threads <= 0
+                and self.graph_optimization == "all"
+                and self.execution_mode == "sequential"
+                and self.mem_arena
+            )
+            if default:
+                return ort.InferenceSession(model_path)
+            return ort.InferenceSession(model_path, sess_options=self._options())
+
+        cached = self.optimized_path(model_path, optimized_dir)
+        if cached.is_file():
+            try:
+                session = ort.InferenceSession(str(cached), sess_options=self._options(False))
+                log.info("optimized graph loaded from %s", cached)
+                return session
+            except Exception as exc:  # corrupt or incompatible file
+                log.warning("ignoring optimized graph %s: %s", cached, exc)
+                cached.unlink(missing_ok=True)
+
+        # Workers may start together: write privately, publish atomically.
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cached.with_name(f"{cached.name}.{os.getpid()}.tmp")
+        opts = self._options()
+        opts.optimized_model_filepath = str(tmp)
+        session = ort.InferenceSession(model_path, sess_options=opts)
+        if tmp.is_file():
+            os.replace(tmp, cached)
+            log.info("optimized graph saved to %s", cached)
+        return session
 
     def synthesize(self, text: str) -> tuple[np.ndarray, int]:
         """Synthesize text into float32 audio and sample rate.
@@ -66,14 +303,131 @@ class PiperTTS:
         tuple[np.ndarray, int]
             Generated audio in ``float32`` format and its sample rate.
         """
+        log.debug("synthesize text length=%d", len(text))
+        return self._run(self._phonemize(text)), self.model_sample_rate
+
+    def _phonemize(self, text: str):
         if piper_phonemize is None:  # pragma: no cover - handled via mocks in tests
             raise RuntimeError("piper_phonemizer is required for phonemization")
+        if self.phoneme_cache is None:
+            return piper_phonemize(text, self.speaker_json)
 
-        log.debug("synthesize text length=%d", len(text))
-        phonemes = piper_phonemize(text, self.speaker_json)
-        audio = self.session.run(None, {"input": phonemes})[0]
-        audio = np.asarray(audio, dtype=np.float32)
-        audio = np.clip(audio, -1.0, 1.0)
+        phonemes = self.phoneme_cache.get(text)
+        if phonemes is None:
+            phonemes = np.asarray(piper_phonemize(text, self.speaker_json))
+            self.phoneme_cache.put(text, phonemes)
+        return phonemes
 
+    def _run(self, phonemes) -> np.ndarray:
+        log.debug("synthesize phonemes length=%d", len(phonemes))
+        audio = self._run_batch([phonemes])[0]
         log.debug("synthesize produced %d samples", len(audio))
-        return audio, self.model_sample_rate
+        return audio
+
+    def _run_batch(self, batch: Sequence) -> List[np.ndarray]:
+        """Decode phoneme sequences in one run, padded to the longest one."""
+        if len(batch) > 1 and not self.batching:
+            return [self._run_batch([phonemes])[0] for phonemes in batch]
+        lengths = np.array([len(p) for p in batch], dtype=np.int64)
+        ids = np.zeros((len(batch), int(lengths.max())), dtype=np.int64)
+        for row, phonemes in zip(ids, batch):
+            row[: len(phonemes)] = phonemes
+
+        runner = self._runners.get()
+        try:
+            out, durations = runner.run(ids, lengths)
+        finally:
+            self._runners.put(runner)
+        audio = np.asarray(out, dtype=np.float32).reshape(len(batch), -1)
+        if audio.flags.writeable:
+            np.clip(audio, -1.0, 1.0, out=audio)
+        else:
+            audio = np.clip(audio, -1.0, 1.0)
+        if len(batch) == 1:
+            return [audio[0]]
+        assert durations is not None
+        frames = np.asarray(durations).reshape(len(batch), -1).sum(axis=1)
+        return [row[: int(n) * self.hop_length] for row, n in zip(audio, frames)]
+
+    def _cached(self, key: bytes) -> Optional[bytes]:
+        if self.audio_cache is not None:
+            cached = self.audio_cache.get(key)
+            if cached is not None:
+                return cached
+        if self.disk_cache is None:
+            return None
+        pcm = self.disk_cache.get(DiskAudioCache.key_for(key))
+        if pcm is not None and self.audio_cache is not None:
+            self.audio_cache.put(key, pcm)
+        return pcm
+
+    def _store(self, key: bytes, pcm: bytes) -> None:
+        if self.disk_cache is not None:
+            self.disk_cache.put(DiskAudioCache.key_for(key), pcm)
+        if self.audio_cache is not None:
+            self.audio_cache.put(key, pcm)
+
+    def synthesize_pcm16(self, text: str) -> bytes:
+        """Synthesize ``text`` straight to PCM16 @ 16 kHz, using the caches."""
+        phonemes = self._phonemize(text)
+        key = self.voice + np.asarray(phonemes).tobytes()
+        pcm = self._cached(key)
+        if pcm is None:
+            pcm = bytes(ensure_pcm16_16k(self._run(phonemes), self.model_sample_rate))
+            self._store(key, pcm)
+        return pcm
+
+    def synthesize_batch(self, texts: Sequence[str]) -> List[bytes]:
+        """Like :meth:`synthesize_pcm16` for several texts.
+
+        Cache misses are decoded together in one run of the model.
+        """
+        phonemes = [self._phonemize(text) for text in texts]
+        keys = [self.voice + np.asarray(p).tobytes() for p in phonemes]
+        out: List[Optional[bytes]] = [self._cached(key) for key in keys]
+        misses = [i for i, pcm in enumerate(out) if pcm is None]
+        if misses:
+            audios = self._run_batch([phonemes[i] for i in misses])
+            for i, audio in zip(misses, audios):
+                pcm = bytes(ensure_pcm16_16k(audio, self.model_sample_rate))
+                self._store(keys[i], pcm)
+                out[i] = pcm
+        return out  # type: ignore[return-value]
+
+    def cache_stats(self) -> dict:
+        """Return hit/miss counters and sizes of the caches."""
+        stats = {}
+        for name, cache in (("phonemes", self.phoneme_cache), ("audio", self.audio_cache)):
+            if cache is not None:
+                stats[name] = {
+                    "hits": cache.hits,
+                    "misses": cache.misses,
+                    "evictions": cache.evictions,
+                    "bytes": cache.nbytes,
+                }
+        if self.disk_cache is not None:
+            stats["disk"] = {
+                "hits": self.disk_cache.hits,
+                "misses": self.disk_cache.misses,
+                "evictions": self.disk_cache.evictions,
+                "bytes": self.disk_cache.nbytes,
+            }
+        return stats
+
+    def synthesize_stream(self, text: str) -> Iterator[bytes]:
+        """Synthesize ``text`` phrase by phrase.
+
+        Yields PCM16 @ 16 kHz for every phrase as soon as it is synthesized,
+        so playback can start before the whole text is done. Recurring
+        phrases are served from the caches. With ``batch_phrases`` the
+        phrases after the first, which only play once it has finished, are
+        decoded in batches.
+        """
+        phrases = split_phrases(text)
+        if self.batch_phrases < 2 or not self.batching or len(phrases) < 3:
+            for phrase in phrases:
+                yield self.synthesize_pcm16(phrase)
+            return
+        yield self.synthesize_pcm16(phrases[0])
+        for i in range(1, len(phrases), self.batch_phrases):
+            yield from self.synthesize_batch(phrases[i : i + self.batch_phrases])
@@ -3,8 +3,12 @@
 from __future__ import annotations
 
 import logging
+from typing import Iterator
+
 import numpy as np
 
+from .tts import ensure_pcm16_16k, split_phrases
+
 
 log = logging.getLogger(__name__)
 
@@ -35,3 +39,13 @@ class SileroTTS:
         silence = np.zeros(samples, dtype=np.float32)
         log.debug("synthesize produced %d samples", len(silence))
         return silence, self.sample_rate
+
+    def synthesize_stream(self, text: str) -> Iterator[bytes]:
+        """Synthesize ``text`` phrase by phrase.
+
+        Yields PCM16 @ 16 kHz bytes for every phrase as soon as it is
+        synthesized, so playback can start before the whole text is done.
+        """
+        for phrase in split_phrases(text):
+            audio, sr = self.synthesize(phrase)
+            yield ensure_pcm16_16k(audio, sr)
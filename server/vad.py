@@ -2,10 +2,129 @@
 
 from __future__ import annotations
 
+from typing import Optional
+
 import numpy as np
 import webrtcvad
 
-_vad = webrtcvad.Vad(2)
+
+class StreamingVad:
+    """Incremental per-session voice activity detector.
+
+    Audio is consumed as it arrives; only complete new frames are examined
+    and a partial frame is kept until the next :meth:`push`. Per-frame
+    decisions are cached by absolute frame index for the last
+    ``history_frames`` frames, so masks over recent audio never re-run the
+    detector. Each instance owns its ``webrtcvad.Vad``, which keeps state
+    between frames and must not be shared across threads.
+
+    Parameters
+    ----------
+    sr: int
+        Sample rate of the audio, defaults to 16 kHz.
+    frame_ms: int
+        Frame size in milliseconds (10, 20 or 30), defaults to 20 ms.
+    mode: int
+        webrtcvad aggressiveness from 0 to 3, defaults to 2.
+    energy_floor_dbfs: float, optional
+        Frames whose RMS level is below this many dBFS are marked silent
+        without calling webrtcvad. The RMS of all new frames is computed in
+        one vectorized pass. ``None`` disables the pre-filter.
+    history_frames: int
+        Number of most recent decisions kept for :meth:`mask`.
+    """
+
+    def __init__(
+        self,
+        sr: int = 16000,
+        frame_ms: int = 20,
+        mode: int = 2,
+        energy_floor_dbfs: Optional[float] = None,
+        history_frames: int = 1500,
+    ) -> None:
+        self.sr = sr
+        self.frame_len = int(sr * frame_ms / 1000)
+        self._vad = webrtcvad.Vad(mode)
+        if energy_floor_dbfs is None:
+            self._energy_floor_sq: Optional[float] = None
+        else:
+            floor = 32768.0 * 10.0 ** (energy_floor_dbfs / 20.0)
+            self._energy_floor_sq = floor * floor
+        self._decisions = np.zeros(max(history_frames, 1), dtype=bool)
+        self._tail = np.zeros(0, dtype=np.int16)
+        self._last_speech = -1
+
+        self.frames_total = 0
+        self.frames_checked = 0
+        self.frames_prefiltered = 0
+
+    def push(self, pcm: np.ndarray | bytes) -> int:
+        """Consume new int16 PCM and return the number of new speech frames."""
+        if isinstance(pcm, np.ndarray):
+            samples = pcm.astype(np.int16, copy=False)
+        else:
+            samples = np.frombuffer(pcm, dtype=np.int16)
+        if self._tail.size:
+            samples = np.concatenate((self._tail, samples))
+
+        fl = self.frame_len
+        n_frames = samples.size // fl
+        self._tail = samples[n_frames * fl :].copy()
+        if not n_frames:
+            return 0
+
+        frames = np.ascontiguousarray(samples[: n_frames * fl]).reshape(n_frames, fl)
+        decisions = np.zeros(n_frames, dtype=bool)
+        if self._energy_floor_sq is None:
+            candidates = range(n_frames)
+        else:
+            f = frames.astype(np.float32)
+            power = np.einsum("ij,ij->i", f, f) / fl
+            loud = np.flatnonzero(power >= self._energy_floor_sq)
+            self.frames_prefiltered += n_frames - loud.size
+            candidates = loud.tolist()
+
+        raw = memoryview(frames.reshape(-1)).cast("B")
+        step = fl * 2
+        is_speech = self._vad.is_speech
+        checked = 0
+        for i in candidates:
+            decisions[i] = is_speech(raw[i * step : (i + 1) * step], self.sr)
+            checked += 1
+        self.frames_checked += checked
+
+        start = self.frames_total
+        cap = self._decisions.size
+        idx = np.arange(start, start + n_frames) % cap
+        self._decisions[idx] = decisions
+        self.frames_total += n_frames
+
+        speech = np.flatnonzero(decisions)
+        if speech.size:
+            self._last_speech = start + int(speech[-1])
+        return int(speech.size)
+
+    def mask(self, start: Optional[int] = None, stop: Optional[int] = None) -> np.ndarray:
+        """Return cached decisions for absolute frames ``[start, stop)``.
+
+        Defaults to all frames still held in the history. Frames older than
+        the history are not available and are clipped from the range.
+        """
+        oldest = max(self.frames_total - self._decisions.size, 0)
+        start = oldest if start is None else max(start, oldest)
+        stop = self.frames_total if stop is None else min(stop, self.frames_total)
+        if stop <= start:
+            return np.zeros(0, dtype=bool)
+        return self._decisions[np.arange(start, stop) % self._decisions.size]
+
+    @property
+    def last_speech_frame(self) -> int:
+        """Absolute index of the newest speech frame, ``-1`` if none yet."""
+        return self._last_speech
+
+    def speech_since(self, frame: int) -> bool:
+        """Return True if any frame with index ``>= frame`` contained speech."""
+        return self._last_speech >= frame
 
 
 def active_mask(int16_pcm: np.ndarray, sr: int = 16000, frame_ms: int = 20) -> np.ndarray:
@@ -28,18 +147,24 @@ def active_mask(int16_pcm: np.ndarray, sr: int = 16000, frame_ms: int = 20) -> n
     """
     frame_len = int(sr * frame_ms / 1000)
     n_frames = len(int16_pcm) // frame_len
-    mask = np.zeros(n_frames, dtype=bool)
-
-    for i in range(n_frames):
-        frame = int16_pcm[i * frame_len:(i + 1) * frame_len]
-        mask[i] = _vad.is_speech(frame.tobytes(), sr)
+    vad = StreamingVad(sr, frame_ms, history_frames=n_frames)
+    vad.push(np.asarray(int16_pcm))
+    return vad.mask()
 
-    return mask
 
+def trim_silence_head_tail(
+    pcm: np.ndarray,
+    sr: int = 16000,
+    frame_ms: int = 20,
+    mask: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Trim leading and trailing silence from PCM audio.
 
-def trim_silence_head_tail(pcm: np.ndarray, sr: int = 16000, frame_ms: int = 20) -> np.ndarray:
-    """Trim leading and trailing silence from PCM audio."""
-    mask = active_mask(pcm, sr=sr, frame_ms=frame_ms)
+    A precomputed ``mask`` (for example from :meth:`StreamingVad.mask`)
+    avoids running the detector again.
+    """
+    if mask is None:
+        mask = active_mask(pcm, sr=sr, frame_ms=frame_ms)
     if not mask.any():
         return pcm[:0]
 
@@ -0,0 +1,300 @@
+"""Multi-process worker mode.
+
+A supervisor process starts ``N`` worker processes. Each worker runs the
+regular asyncio server with its own engines and accepts connections on the
+same ``WS_PORT`` through ``SO_REUSEPORT``, so the kernel spreads new
+connections across workers. Workers are pinned to disjoint CPU sets and
+their inference thread counts are sized to those sets. Every worker
+publishes its counters into a shared-memory slot that the supervisor
+aggregates on its health port.
+
+Nothing heavy is imported here. A spawned worker re-imports the main
+module (``server.server``, and with it ctranslate2 / onnxruntime) before
+its entry point runs, so the supervisor applies the CPU affinity and thread
+environment around ``Process.start`` and the child inherits both from the
+very first import.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import multiprocessing as mp
+import os
+import time
+from multiprocessing.sharedctypes import RawArray
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from .httpd import Route, serve
+from .metrics import CONTENT_TYPE, REGISTRY
+
+log = logging.getLogger(__name__)
+
+# Layout of one worker's slot in :class:`WorkerStats`.
+STAT_FIELDS = (
+    "pid",
+    "heartbeat",
+    "sessions",
+    "pending",
+    "rejected",
+    "queue_wait_ms_mean",
+    "queue_wait_ms_max",
+    "ready",
+    "profile",  # written by the supervisor: >0 profile, <0 stop and dump
+)
+
+# A worker whose heartbeat is older than this is reported as down.
+HEARTBEAT_TIMEOUT = 5.0
+
+_ENGINE_THREAD_ENV = ("ASR_CPU_THREADS", "TTS_THREADS")
+_THREAD_ENV = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def available_cpus() -> List[int]:
+    """Return the CPUs this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def split_cpus(cpus: Sequence[int], n: int) -> List[List[int]]:
+    """Split ``cpus`` into ``n`` contiguous groups of near-equal size.
+
+    With fewer CPUs than groups, CPUs are shared round robin.
+    """
+    cpus = list(cpus)
+    if not cpus:
+        return [[] for _ in range(n)]
+    if n >= len(cpus):
+        return [[cpus[i % len(cpus)]] for i in range(n)]
+    base, extra = divmod(len(cpus), n)
+    groups, start = [], 0
+    for i in range(n):
+        size = base + (i < extra)
+        groups.append(cpus[start : start + size])
+        start += size
+    return groups
+
+
+class WorkerSlot:
+    """One worker's view of :class:`WorkerStats`."""
+
+    def __init__(self, array: Any, index: int) -> None:
+        self.array = array
+        self.index = index
+        self._base = index * len(STAT_FIELDS)
+
+    def update(self, **values: float) -> None:
+        """Store ``values`` by field name. Readers tolerate torn updates."""
+        for name, value in values.items():
+            self.array[self._base + STAT_FIELDS.index(name)] = value
+
+    def get(self, name: str) -> float:
+        return self.array[self._base + STAT_FIELDS.index(name)]
+
+
+class WorkerStats:
+    """Fixed-size table of per-worker counters in shared memory.
+
+    Each worker only writes its own slot, so no locking is needed; the
+    supervisor reads all slots for the aggregated health report. A second
+    array holds one segment per worker for the values of
+    :data:`server.metrics.REGISTRY`.
+    """
+
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self.array = RawArray("d", workers * len(STAT_FIELDS))
+        self.metrics_array = RawArray("d", workers * REGISTRY.size)
+        self.profile_generation = 0
+
+    def metrics_segments(self) -> np.ndarray:
+        """Per-worker metric values as a ``(workers, size)`` array view."""
+        return np.frombuffer(self.metrics_array, dtype=np.float64).reshape(self.workers, -1)
+
+    def metrics_route(self) -> Tuple[str, bytes]:
+        """``/metrics`` handler rendering the sum over all workers."""
+        return CONTENT_TYPE, REGISTRY.render(self.metrics_segments().sum(axis=0))
+
+    def reset_gauges(self, index: int) -> None:
+        """Zero the gauges of a worker that exited; counters are kept."""
+        self.slot(index).update(pid=0, sessions=0, pending=0, ready=0)
+        segment = self.metrics_segments()[index]
+        segment[REGISTRY.gauge_slots()] = 0.0
+
+    def slot(self, index: int) -> WorkerSlot:
+        return WorkerSlot(self.array, index)
+
+    def snapshot(self) -> List[Dict[str, float]]:
+        n = len(STAT_FIELDS)
+        values = list(self.array)
+        return [dict(zip(STAT_FIELDS, values[i * n : (i + 1) * n])) for i in range(self.workers)]
+
+    def set_profiling(self, on: bool) -> dict:
+        """Ask every worker to start or stop its profiler.
+
+        Workers pick the command up with their next stats update; on stop
+        each writes its trace and stacks to its ``PROFILE_DIR``.
+        """
+        if on:
+            self.profile_generation += 1
+        command = self.profile_generation if on else -self.profile_generation
+        for i in range(self.workers):
+            self.slot(i).update(profile=command)
+        return {"profiling": on, "workers": self.workers}
+
+    def admin_routes(self) -> Dict[str, Route]:
+        """``POST`` routes forwarding profiler start and stop to all workers."""
+        return {
+            "/profile/start": lambda: self.set_profiling(True),
+            "/profile/stop": lambda: self.set_profiling(False),
+        }
+
+    def health(self) -> dict:
+        """Aggregate the slots into a health report."""
+        now = time.time()
+        workers: List[Dict[str, Any]] = []
+        for i, slot in enumerate(self.snapshot()):
+            up = slot["pid"] > 0 and now - slot["heartbeat"] < HEARTBEAT_TIMEOUT
+            workers.append({"index": i, "alive": up, **slot})
+        alive = sum(1 for w in workers if w["alive"])
+        ready = sum(1 for w in workers if w["alive"] and w["ready"])
+        return {
+            "status": "ok" if alive == self.workers else ("degraded" if alive else "down"),
+            # Connections only reach workers that listen, i.e. are warmed up.
+            "ready": ready > 0,
+            "workers_alive": alive,
+            "workers_ready": ready,
+            "workers": workers,
+            "sessions": sum(w["sessions"] for w in workers if w["alive"]),
+            "pending": sum(w["pending"] for w in workers if w["alive"]),
+            "rejected": sum(w["rejected"] for w in workers),
+        }
+
+
+def _thread_env(threads: int) -> None:
+    """Size inference thread pools of this process to ``threads``."""
+    for name in _ENGINE_THREAD_ENV:
+        if os.environ.get(name, "0") in ("", "0"):
+            os.environ[name] = str(threads)
+    for name in _THREAD_ENV:
+        os.environ.setdefault(name, str(threads))
+
+
+@contextlib.contextmanager
+def _child_environment(cpus: List[int]) -> Iterator[None]:
+    """Pin this process to ``cpus`` and size thread env vars to them, then restore.
+
+    Processes started inside inherit both through fork/exec.
+    """
+    saved_env = {name: os.environ.get(name) for name in _ENGINE_THREAD_ENV + _THREAD_ENV}
+    pin = bool(cpus) and hasattr(os, "sched_setaffinity")
+    saved_cpus = os.sched_getaffinity(0) if pin else None
+    _thread_env(max(len(cpus), 1))
+    if pin:
+        os.sched_setaffinity(0, cpus)
+    try:
+        yield
+    finally:
+        if saved_cpus is not None:
+            os.sched_setaffinity(0, saved_cpus)
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _worker_main(index: int, stats_array: Any, metrics_array: Any) -> None:
+    """Entry point of a worker process, already pinned by :func:`_spawn`."""
+    segments = np.frombuffer(metrics_array, dtype=np.float64).reshape(-1, REGISTRY.size)
+    REGISTRY.bind(segments[index])
+
+    from server import server
+
+    try:
+        asyncio.run(server.main(WorkerSlot(stats_array, index)))
+    except KeyboardInterrupt:  # pragma: no cover - interactive shutdown
+        pass
+
+
+def _spawn(ctx: Any, index: int, cpus: List[int], stats: WorkerStats) -> Any:
+    proc = ctx.Process(
+        target=_worker_main,
+        args=(index, stats.array, stats.metrics_array),
+        name=f"rt-echo-worker-{index}",
+    )
+    with _child_environment(cpus):
+        proc.start()
+    log.info("worker %d started pid=%d cpus=%s", index, proc.pid, cpus)
+    return proc
+
+
+async def supervise(
+    workers: int,
+    health_port: int = 8001,
+    restart_delay: float = 1.0,
+    admin_remote: bool = False,
+) -> None:
+    """Run ``workers`` worker processes, restart them on exit, serve health.
+
+    ``admin_remote`` lets other hosts use the profiler admin routes, see
+    :func:`server.httpd.serve`.
+    """
+    ctx = mp.get_context("spawn")
+    stats = WorkerStats(workers)
+    groups = split_cpus(available_cpus(), workers)
+    procs = [_spawn(ctx, i, groups[i], stats) for i in range(workers)]
+    routes: Dict[str, Route] = {"/healthz": stats.health, "/metrics": stats.metrics_route}
+    health = asyncio.create_task(
+        serve(routes, health_port, admin=stats.admin_routes(), admin_remote=admin_remote)
+    )
+    try:
+        while True:
+            await asyncio.sleep(restart_delay)
+            for i, proc in enumerate(procs):
+                if not proc.is_alive():
+                    log.warning("worker %d exited with %s, restarting", i, proc.exitcode)
+                    stats.reset_gauges(i)
+                    procs[i] = _spawn(ctx, i, groups[i], stats)
+    finally:
+        health.cancel()
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            proc.join(timeout=5)
+
+
+def prefetch_asr_model() -> None:
+    """Resolve ``ASR_MODEL`` to a local directory once for all workers.
+
+    Workers then load the same files (shared through the page cache)
+    instead of racing to download the model. Network errors only log a
+    warning, leaving the workers to try the local cache; an unknown model
+    name or repository raises at once instead of crashing every worker.
+    """
+    from faster_whisper import download_model
+    from huggingface_hub.utils import RepositoryNotFoundError
+
+    model = os.environ.get("ASR_MODEL", "small")
+    if os.path.isdir(model):
+        return
+    try:
+        os.environ["ASR_MODEL"] = download_model(model)
+    except RepositoryNotFoundError:
+        raise
+    except OSError as exc:  # hub errors are OSErrors too: offline, rate limited
+        log.warning("could not prefetch ASR model %s: %s", model, exc)
+
+
+def run_supervisor(workers: int, health_port: int = 8001, admin_remote: bool = False) -> None:
+    """Blocking entry point of ``--workers N``."""
+    prefetch_asr_model()
+    try:
+        asyncio.run(supervise(workers, health_port, admin_remote=admin_remote))
+    except KeyboardInterrupt:  # pragma: no cover - interactive shutdown
+        pass
+
@@ -0,0 +1,55 @@
+import asyncio
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from server.asr import AsrBatcher
+
+
+class FakeEngine:
+    """Records batch sizes and echoes the first sample of every window."""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def transcribe_batch(self, audios, lang="ru"):
+        self.batch_sizes.append(len(audios))
+        return [f"{lang}:{int(a[0])}" for a in audios]
+
+
+def test_windows_from_many_sessions_share_a_batch():
+    engine = FakeEngine()
+
+    async def scenario():
+        batcher = AsrBatcher(engine, max_batch_size=4, max_wait_ms=20)
+        windows = [np.full(16, i, dtype=np.float32) for i in range(6)]
+        texts = await asyncio.gather(*(batcher.transcribe(w) for w in windows))
+        batcher.close()
+        return batcher, texts
+
+    batcher, texts = asyncio.run(scenario())
+    assert texts == [f"ru:{i}" for i in range(6)]
+    assert engine.batch_sizes == [4, 2]
+    assert batcher.batches == 2
+    assert batcher.windows == 6
+
+
+def test_engine_error_reaches_every_caller():
+    class Failing:
+        def transcribe_batch(self, audios, lang="ru"):
+            raise RuntimeError("boom")
+
+    async def scenario():
+        batcher = AsrBatcher(Failing(), max_batch_size=2, max_wait_ms=0)
+        results = await asyncio.gather(
+            batcher.transcribe(np.zeros(4, dtype=np.float32)),
+            batcher.transcribe(np.zeros(4, dtype=np.float32)),
+            return_exceptions=True,
+        )
+        batcher.close()
+        return results
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
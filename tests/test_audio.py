@@ -0,0 +1,48 @@
+import os
+import sys
+
+import numpy as np
+from scipy.signal import resample_poly
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from rt_echo.common.audio import Resampler, get_resampler, resample
+
+
+def test_resampler_matches_resample_poly():
+    x = np.random.default_rng(0).standard_normal(5000).astype(np.float32)
+    r = get_resampler(22_050, 16_000)
+    assert get_resampler(22_050, 16_000) is r
+    assert Resampler(22_050, 16_000).taps is r.taps
+    out = resample(x, 22_050, 16_000)
+    assert out.dtype == np.float32
+    assert np.array_equal(out, resample_poly(x, r.up, r.down))
+
+
+def test_stream_matches_one_shot():
+    rng = np.random.default_rng(1)
+    x = rng.standard_normal(9000).astype(np.float32)
+    for src, dst in ((22_050, 16_000), (8_000, 16_000), (48_000, 16_000)):
+        stream = Resampler(src, dst).stream()
+        parts, pos = [], 0
+        for size in rng.integers(1, 700, size=30):
+            parts.append(stream.process(x[pos : pos + size]).copy())
+            pos += size
+        parts.append(stream.process(x[pos:], final=True).copy())
+        assert np.array_equal(np.concatenate(parts), resample(x, src, dst))
+
+
+def test_converter_matches_and_reuses_buffers():
+    from rt_echo.common.audio import Pcm16Converter, float32_to_pcm16
+
+    rng = np.random.default_rng(2)
+    conv = Pcm16Converter()
+    w = (rng.standard_normal(800) * 0.8).astype(np.float32)
+    first = conv.to_pcm16(w)
+    assert bytes(first) == float32_to_pcm16(w)
+    again = conv.to_pcm16(w[:400])
+    assert bytes(again) == float32_to_pcm16(w[:400])
+    assert np.shares_memory(np.frombuffer(first, np.int16), np.frombuffer(again, np.int16))
+
+    pcm = float32_to_pcm16(w)
+    expected = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+    assert np.array_equal(conv.to_float32(pcm), expected)
@@ -0,0 +1,63 @@
+import os
+import sys
+from collections import deque
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from rt_echo.server.buffer import RingBuffer16k
+
+
+def _reference_window(ref: deque, samples: int) -> np.ndarray:
+    arr = np.array(ref, dtype=np.int16)
+    if arr.size >= samples:
+        return arr[arr.size - samples :]
+    return np.concatenate((np.zeros(samples - arr.size, dtype=np.int16), arr))
+
+
+def test_window_pads_until_full():
+    ring = RingBuffer16k(8)
+    ring.push_pcm16(np.arange(1, 4, dtype=np.int16).tobytes())
+    assert ring.window(5).tolist() == [0, 0, 1, 2, 3]
+    assert ring.window(0).size == 0
+
+
+def test_matches_deque_reference():
+    rng = np.random.default_rng(0)
+    cap = 50
+    ring = RingBuffer16k(cap)
+    ref: deque = deque(maxlen=cap)
+
+    for _ in range(300):
+        n = int(rng.integers(0, 80))
+        samples = rng.integers(-32768, 32767, size=n, dtype=np.int16)
+        ring.push_pcm16(memoryview(samples.tobytes()))
+        ref.extend(samples.tolist())
+        for w in (1, 17, cap, cap + 5):
+            assert np.array_equal(ring.window(w), _reference_window(ref, w))
+        k = int(rng.integers(0, 30))
+        ring.step(k)
+        for _ in range(min(k, len(ref))):
+            ref.popleft()
+        assert len(ring) == len(ref)
+
+
+def test_full_window_is_readonly_view():
+    ring = RingBuffer16k(4)
+    ring.push_pcm16(np.arange(6, dtype=np.int16).tobytes())
+    win = ring.window(4)
+    assert win.tolist() == [2, 3, 4, 5]
+    assert not win.flags.owndata
+    assert not win.flags.writeable
+
+
+def test_float_mirror_matches_int16_window():
+    rng = np.random.default_rng(1)
+    ring = RingBuffer16k(64, float_mirror=True)
+    for _ in range(40):
+        samples = rng.integers(-32768, 32767, size=int(rng.integers(1, 50)), dtype=np.int16)
+        ring.push_pcm16(samples.tobytes())
+        ring.step(int(rng.integers(0, 20)))
+        for w in (10, 64, 70):
+            expected = ring.window(w).astype(np.float32) / 32768.0
+            assert np.array_equal(ring.window_f32(w), expected)
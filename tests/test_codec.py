@@ -0,0 +1,216 @@
+import asyncio
+import functools
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import websockets
+from websockets.typing import Subprotocol
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from rt_echo.common import codec
+from rt_echo.common.codec import FRAME_SAMPLES, OpusDecoder, OpusEncoder, opus_available
+from rt_echo.common.protocol import (
+    AUDIO,
+    EOS,
+    FIRST,
+    SUBPROTOCOL,
+    SUBPROTOCOL_OPUS,
+    FrameEncoder,
+    decode,
+    select_subprotocol,
+)
+from server import server
+from server.session import EchoSession
+from server.tts_silero import SileroTTS
+
+try:  # the client package needs sounddevice and PortAudio
+    from rt_echo.client import ws_client
+except (ImportError, OSError):
+    ws_client = None
+
+SAMPLE_RATE = 16_000
+
+needs_opus = pytest.mark.skipif(not opus_available(), reason="opuslib/libopus not installed")
+needs_client = pytest.mark.skipif(ws_client is None, reason="sounddevice not installed")
+
+
+class FakeEncoder:
+    def __init__(self, fs, channels, application):
+        self.bitrate = 0
+
+    def encode(self, pcm, frame_size):
+        assert len(pcm) == 2 * frame_size
+        return b"OP" + pcm
+
+
+class FakeOpusError(Exception):
+    pass
+
+
+class FakeDecoder:
+    def __init__(self, fs, channels):
+        pass
+
+    def decode(self, packet, frame_size):
+        if not packet.startswith(b"OP"):
+            raise FakeOpusError("corrupted stream")
+        return packet[2:]
+
+
+@pytest.fixture
+def fake_opus(monkeypatch):
+    """Stand in for libopus: a packet is a marker followed by the frame's PCM."""
+    fake = SimpleNamespace(Encoder=FakeEncoder, Decoder=FakeDecoder, OpusError=FakeOpusError)
+    monkeypatch.setattr(codec, "opuslib", fake)
+
+
+def tone(seconds, freq=440.0):
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return (0.3 * np.sin(2 * np.pi * freq * t) * 32767).astype(np.int16).tobytes()
+
+
+def test_codec_requires_opus(monkeypatch):
+    monkeypatch.setattr(codec, "opuslib", None)
+    assert not opus_available()
+    with pytest.raises(RuntimeError):
+        OpusEncoder()
+    with pytest.raises(RuntimeError):
+        OpusDecoder()
+
+
+def test_encoder_buffers_partial_frames(fake_opus):
+    enc, dec = OpusEncoder(bitrate=16_000), OpusDecoder()
+    pcm = tone(0.25)  # 12.5 frames: the half frame waits for flush
+    packets = enc.encode(pcm[:1000]) + enc.encode(memoryview(pcm)[1000:])
+    assert len(packets) == 12
+    packets += enc.flush()
+    assert len(packets) == 13 and enc.flush() == []
+    out = b"".join(dec.decode(p) for p in packets)
+    assert out == pcm + bytes(len(out) - len(pcm))
+    with pytest.raises(ValueError):
+        dec.decode(b"\xff" * 3)
+    # Anything but a codec error is a bug, not a corrupt packet.
+    with pytest.raises(TypeError):
+        dec.decode(None)
+
+
+@needs_opus
+def test_roundtrip_in_20ms_packets():
+    enc, dec = OpusEncoder(bitrate=24_000), OpusDecoder()
+    pcm = tone(0.25)
+    packets = enc.encode(pcm) + enc.flush()
+    assert len(packets) == 13
+    assert sum(map(len, packets)) < len(pcm) / 5
+    out = b"".join(dec.decode(p) for p in packets)
+    assert len(out) == 13 * FRAME_SAMPLES * 2
+    # Opus delays the signal a few ms; compare energy instead of samples.
+    x = np.frombuffer(out, np.int16).astype(np.float32)[FRAME_SAMPLES : 12 * FRAME_SAMPLES]
+    y = np.frombuffer(pcm, np.int16).astype(np.float32)[FRAME_SAMPLES : 12 * FRAME_SAMPLES]
+    assert abs(np.sqrt((x**2).mean()) / np.sqrt((y**2).mean()) - 1) < 0.2
+    with pytest.raises(ValueError):
+        dec.decode(b"\xff" * 3)
+
+
+class EchoAsr:
+    def transcribe_window(self, _audio: np.ndarray, lang: str = "ru") -> str:
+        return "привет мир"
+
+
+class FakeWs:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, data) -> None:
+        self.sent.append(bytes(data))
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        pass
+
+
+def test_session_decodes_inbound_and_encodes_replies(fake_opus):
+    cfg = SimpleNamespace(asr_sr=SAMPLE_RATE, window_sec=0.5, step_sec=0.05)
+    client = OpusEncoder()
+
+    async def run():
+        session = EchoSession(cfg, EchoAsr(), SileroTTS(), framed=True, opus=True)
+        ws = FakeWs()
+        task = asyncio.create_task(session.tick(ws))
+        for i, packet in enumerate(client.encode(tone(0.2))):
+            session.push(session.decoder.decode(packet), capture_ts=i)
+            await asyncio.sleep(0.005)
+        session.request_flush(end=True)
+        await asyncio.wait_for(task, 2.0)
+        return session, ws
+
+    session, ws = asyncio.run(run())
+    assert session.samples_pushed == 10 * FRAME_SAMPLES
+    frames = [decode(m) for m in ws.sent]
+    audio = [f for f in frames if f.type == AUDIO]
+    assert audio and audio[0].flags & FIRST and frames[-1].type == EOS
+    assert all(f.payload[:2] == b"OP" for f in audio)
+    dec = OpusDecoder()
+    assert all(len(dec.decode(f.payload)) == FRAME_SAMPLES * 2 for f in audio)
+
+
+class Player:
+    def __init__(self):
+        self.pcm = []
+
+    def play(self, pcm: bytes) -> None:
+        self.pcm.append(pcm)
+
+
+def test_server_negotiates_opus_end_to_end(fake_opus, monkeypatch):
+    monkeypatch.setattr(server, "asr_engine", EchoAsr())
+    monkeypatch.setattr(server, "tts_engine", SileroTTS())
+    monkeypatch.setattr(server.cfg, "step_sec", 0.05)
+    monkeypatch.setattr(server.cfg, "window_sec", 0.5)
+    monkeypatch.setattr(server.cfg, "trace_dir", "")
+    monkeypatch.setattr(server.cfg, "opus", True)
+    supported = server.server_subprotocols(server.cfg)
+    assert supported == (SUBPROTOCOL_OPUS, SUBPROTOCOL)
+
+    async def run():
+        srv = await websockets.serve(
+            server.ws_handler,
+            "127.0.0.1",
+            0,
+            select_subprotocol=functools.partial(select_subprotocol, supported=supported),
+        )
+        port = srv.sockets[0].getsockname()[1]
+        enc, frames, messages = OpusEncoder(), FrameEncoder(), []
+        async with websockets.connect(
+            f"ws://127.0.0.1:{port}",
+            subprotocols=[Subprotocol(SUBPROTOCOL_OPUS), Subprotocol(SUBPROTOCOL)],
+        ) as ws:
+            assert ws.subprotocol == SUBPROTOCOL_OPUS
+            for i, packet in enumerate(enc.encode(tone(0.2))):
+                await ws.send(frames.audio(packet, 100 + i))
+            await ws.send(frames.frame(EOS))
+            async for message in ws:
+                messages.append(message)
+        srv.close()
+        await srv.wait_closed()
+        return messages
+
+    frames = [decode(m) for m in asyncio.run(asyncio.wait_for(run(), 5.0))]
+    assert frames[-1].type == EOS
+    audio = [f for f in frames if f.type == AUDIO]
+    assert audio and audio[0].flags & FIRST and 100 <= audio[0].ts <= 109
+    dec = OpusDecoder()
+    assert all(len(dec.decode(f.payload)) == FRAME_SAMPLES * 2 for f in audio)
+
+
+@needs_client
+def test_client_decodes_and_skips_corrupt_packets(fake_opus):
+    assert ws_client._subprotocols(True, True) == [SUBPROTOCOL_OPUS, SUBPROTOCOL]
+    enc, frames, player = OpusEncoder(), FrameEncoder(), Player()
+    for packet in enc.encode(tone(0.1)):
+        ws_client._on_frame(frames.audio(packet), player, OpusDecoder())
+    # A corrupt packet or a truncated frame is skipped, not fatal.
+    ws_client._on_frame(frames.audio(b"\xff\xfe"), player, OpusDecoder())
+    ws_client._on_frame(b"\x01", player, OpusDecoder())
+    assert b"".join(player.pcm) == tone(0.1)
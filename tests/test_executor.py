@@ -0,0 +1,106 @@
+import asyncio
+import os
+import sys
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from server import metrics
+from server.executor import ExecutorBusy, InferenceExecutor
+from server.session import EchoSession
+
+SAMPLE_RATE = 16_000
+
+
+def test_rejects_when_queue_full():
+    release = threading.Event()
+
+    async def scenario():
+        ex = InferenceExecutor(max_workers=1, max_queue=1)
+        first = asyncio.ensure_future(ex.run(release.wait))
+        second = asyncio.ensure_future(ex.run(lambda: "queued"))
+        await asyncio.sleep(0.05)
+        assert ex.pending == 2
+        with pytest.raises(ExecutorBusy):
+            await ex.run(lambda: "rejected")
+        forced = asyncio.ensure_future(ex.run(lambda: "forced", force=True))
+        release.set()
+        results = await asyncio.gather(first, second, forced)
+        ex.shutdown()
+        return ex, results
+
+    ex, results = asyncio.run(scenario())
+    assert results == [True, "queued", "forced"]
+    assert ex.rejected == 1
+    assert ex.pending == 0
+    assert ex.wait_stats.count == 3
+    assert ex.wait_stats.max >= 0.0
+
+
+def test_runs_off_event_loop_thread():
+    async def scenario():
+        ex = InferenceExecutor(max_workers=2)
+        loop_thread = threading.get_ident()
+        worker_thread = await ex.run(threading.get_ident)
+        ex.shutdown()
+        return loop_thread, worker_thread
+
+    loop_thread, worker_thread = asyncio.run(scenario())
+    assert loop_thread != worker_thread
+
+
+class CountingAsr:
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe_window(self, _audio: np.ndarray) -> str:
+        self.calls += 1
+        return "привет"
+
+    def transcribe_words(self, _audio: np.ndarray, prompt: str = ""):
+        self.calls += 1
+        return [(" привет", 0.5)]
+
+
+def tone(seconds: float) -> bytes:
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return (0.1 * np.sin(2 * np.pi * 440 * t) * 32767).astype(np.int16).tobytes()
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_session_skips_tick_when_executor_saturated(streaming):
+    cfg = SimpleNamespace(
+        asr_sr=SAMPLE_RATE, window_sec=1.0, step_sec=0.25, asr_streaming=streaming
+    )
+    release = threading.Event()
+
+    async def scenario():
+        ex = InferenceExecutor(max_workers=1, max_queue=0)
+        blocker = asyncio.ensure_future(ex.run(release.wait))
+        await asyncio.sleep(0.05)
+        asr = CountingAsr()
+        session = EchoSession(cfg, asr, tts=None, executor=ex)
+        session.push(tone(0.5))
+        before = len(session.ring)
+        skipped = metrics.REGISTRY.values[metrics.TICKS_SKIPPED.offset]
+        try:
+            spoken = await session.run_tick(None)
+        finally:
+            release.set()
+            await blocker
+            ex.shutdown()
+        skipped = metrics.REGISTRY.values[metrics.TICKS_SKIPPED.offset] - skipped
+        return session, asr.calls, spoken, skipped, before
+
+    session, calls, spoken, skipped, before = asyncio.run(scenario())
+    assert spoken == "" and calls == 0
+    assert session.ticks_skipped == 1 and skipped == 1
+    assert session.asr_calls == 0
+    # The speech stays pending, so the next tick transcribes it.
+    assert session._tick_frame == 0 and session.vad.speech_since(0)
+    # Windowed mode moves on by a step; streaming keeps the audio to decode.
+    expected = before if streaming else before - session.step_samples
+    assert len(session.ring) == expected
@@ -0,0 +1,150 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from rt_echo.common.protocol import (
+    AUDIO,
+    EOS,
+    FINAL,
+    FIRST,
+    HEADER,
+    PARTIAL,
+    FrameEncoder,
+    decode,
+)
+from server.flow import OutboundQueue, RateLimiter
+
+
+class SlowWs:
+    """Websocket whose ``send`` blocks until released."""
+
+    def __init__(self):
+        self.sent = []
+        self.closed = None
+        self.release = asyncio.Event()
+
+    async def send(self, data) -> None:
+        await self.release.wait()
+        self.sent.append(bytes(data))
+
+    async def close(self, code=1000, reason="") -> None:
+        self.closed = code
+
+
+def _fill(policy: str, frames: int = 6):
+    async def run():
+        ws = SlowWs()
+        out = OutboundQueue(ws, max_sec=4.0, policy=policy, bytes_per_sec=10)
+        sender = asyncio.create_task(out.run())
+        await out.send(bytes([0]) * 10)
+        await asyncio.sleep(0)  # sender takes frame 0 and blocks in send
+        for i in range(1, frames):
+            await out.send(bytes([i]) * 10)  # returns at once
+        await asyncio.sleep(0)
+        ws.release.set()
+        for _ in range(20):
+            await asyncio.sleep(0)
+        sender.cancel()
+        return ws, out
+
+    return asyncio.run(run())
+
+
+def test_drop_keeps_newest_frames():
+    ws, out = _fill("drop")
+    assert [f[0] for f in ws.sent] == [0, 2, 3, 4, 5]
+    assert out.dropped == 10
+    assert out.queued == 0.0
+
+
+def test_coalesce_merges_backlog():
+    ws, out = _fill("coalesce")
+    assert len(ws.sent) == 2
+    assert ws.sent[0] == bytes([0]) * 10
+    assert ws.sent[1] == b"".join(bytes([i]) * 10 for i in range(2, 6))
+
+
+def test_disconnect_closes_slow_client():
+    ws, out = _fill("disconnect")
+    assert ws.closed == 1008
+    assert out.overflowed
+    assert [f[0] for f in ws.sent] == [0]
+
+
+def test_rate_limiter_allows_real_time_with_burst():
+    now = [0.0]
+    limiter = RateLimiter(rate=80, burst=50, clock=lambda: now[0])
+    assert limiter.allow(50)
+    assert not limiter.allow(10)
+    now[0] += 0.125
+    assert limiter.allow(10)
+    # Sustained sending at the rate is always admitted.
+    for _ in range(100):
+        now[0] += 0.125
+        assert limiter.allow(10)
+    assert not limiter.allow(60)
+
+
+def test_framed_drop_keeps_events_and_moves_first_flag():
+    enc = FrameEncoder()
+
+    async def run():
+        ws = SlowWs()
+        out = OutboundQueue(ws, max_sec=3.0, policy="drop", bytes_per_sec=10, framed=True)
+        sender = asyncio.create_task(out.run())
+        await out.send(enc.event(PARTIAL, 1, text="x"))
+        await asyncio.sleep(0)  # sender blocks on the event
+        await out.send(enc.event(FINAL, 7, text="привет"))
+        await out.send(enc.audio(bytes(10), 7, FIRST))
+        for _ in range(4):
+            await out.send(enc.audio(bytes(10), 7))
+        await out.send(enc.frame(EOS, ts=7))
+        ws.release.set()
+        await asyncio.wait_for(out.drain(), 1.0)
+        sender.cancel()
+        return ws, out
+
+    ws, out = asyncio.run(run())
+    frames = [decode(m) for m in ws.sent]
+    assert [f.type for f in frames] == [PARTIAL, FINAL, AUDIO, AUDIO, AUDIO, EOS]
+    assert [f.seq for f in frames] == [0, 1, 4, 5, 6, 7]
+    assert [bool(f.flags & FIRST) for f in frames if f.type == AUDIO] == [True, False, False]
+    assert out.dropped == 2 * (HEADER.size + 10)
+
+
+def test_compressed_frames_count_by_duration():
+    enc = FrameEncoder()
+
+    async def run():
+        ws = SlowWs()
+        out = OutboundQueue(ws, max_sec=0.06, framed=True, frame_sec=0.02)
+        # Opus packets of silence are tiny, speech packets large: only the
+        # number of packets tells how much audio is queued.
+        for size in (3, 120, 3, 3, 120):
+            await out.send(enc.audio(bytes(size), 1))
+        return out
+
+    out = asyncio.run(run())
+    assert len(out.frames) == 3
+    assert abs(out.queued - 0.06) < 1e-9
+    assert out.dropped == 2 * HEADER.size + 123
+    out.close()
+
+
+def test_queued_frames_survive_buffer_reuse():
+    async def run():
+        ws = SlowWs()
+        out = OutboundQueue(ws, max_sec=4.0, bytes_per_sec=10)
+        sender = asyncio.create_task(out.run())
+        scratch = bytearray(10)
+        for i in range(3):
+            scratch[:] = bytes([i]) * 10  # like the session's PCM scratch
+            await out.send(memoryview(scratch))
+        ws.release.set()
+        await asyncio.wait_for(out.drain(), 1.0)
+        sender.cancel()
+        return ws
+
+    ws = asyncio.run(run())
+    assert ws.sent == [bytes([i]) * 10 for i in range(3)]
@@ -0,0 +1,69 @@
+import asyncio
+import os
+import sys
+import wave
+
+import numpy as np
+import websockets
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from load_test import (
+    load_chunks,
+    percentiles,
+    run_session,
+    speech_ends,
+    speech_flags,
+)
+
+
+def test_speech_ends_need_a_long_pause():
+    flags = [False, True, True, False, True, False, False, False, True]
+    # The one-chunk gap after index 2 is too short; index 4 ends an utterance.
+    assert speech_ends(flags, pause_chunks=2) == [4, 8]
+
+
+def test_percentiles_in_milliseconds():
+    p = percentiles([0.001 * i for i in range(1, 101)])
+    assert p["count"] == 100
+    assert p["p50"] == 50.5
+    assert p["max"] == 100.0
+    assert percentiles([])["p95"] is None
+
+
+def test_session_against_local_server(tmp_path):
+    sr = 16000
+    t = np.arange(int(0.2 * sr)) / sr
+    pcm = np.concatenate(
+        [(0.3 * np.sin(2 * np.pi * 440 * t) * 32767).astype(np.int16), np.zeros(int(0.4 * sr), np.int16)]
+    )
+    wav_path = tmp_path / "in.wav"
+    with wave.open(str(wav_path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sr)
+        wf.writeframes(pcm.tobytes())
+
+    async def reply(ws):
+        received = 0
+        async for msg in ws:
+            received += 1
+            if received in (5, 25):
+                await ws.send(bytes(640))
+
+    async def scenario():
+        async with websockets.serve(reply, "127.0.0.1", 0) as srv:
+            port = srv.sockets[0].getsockname()[1]
+            chunks = load_chunks(wav_path)
+            ends = speech_ends(speech_flags(chunks), pause_chunks=10)
+            return await run_session(
+                f"ws://127.0.0.1:{port}", 0, wav_path, chunks, ends, tail=0.2
+            )
+
+    result = asyncio.run(scenario())
+    assert result.error is None
+    assert result.chunks_sent == 30
+    assert len(result.bursts) == 2
+    assert result.bytes_received == 1280
+    assert 0.05 < result.ttfa() < 0.2
+    assert len(result.speech_end_times) == 1
+    assert len(result.delta_latencies()) == 1
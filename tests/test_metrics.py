@@ -0,0 +1,49 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from server.metrics import Registry
+
+
+def test_histogram_counter_and_gauge_render():
+    reg = Registry()
+    hist = reg.histogram("lat_seconds", "Latency", buckets=(0.1, 1.0))
+    hits = reg.counter("hits_total", "Hits")
+    live = reg.gauge("live", "Live things")
+    for value in (0.05, 0.1, 0.5, 3.0):
+        hist.observe(value)
+    hits.inc()
+    hits.inc(2)
+    live.inc(3)
+    live.dec()
+
+    text = reg.render().decode()
+    assert "# TYPE lat_seconds histogram" in text
+    assert 'lat_seconds_bucket{le="0.1"} 2' in text
+    assert 'lat_seconds_bucket{le="1"} 3' in text
+    assert 'lat_seconds_bucket{le="+Inf"} 4' in text
+    assert "lat_seconds_sum 3.65" in text
+    assert "lat_seconds_count 4" in text
+    assert "hits_total 3" in text
+    assert "# TYPE live gauge\nlive 2" in text
+
+
+def test_bound_segments_are_summed():
+    reg = Registry()
+    hits = reg.counter("hits_total", "Hits")
+    live = reg.gauge("live", "Live things")
+    shared = np.zeros((2, reg.size))
+
+    hits.inc(5)
+    reg.bind(shared[0])
+    hits.inc()
+    live.set(1)
+    shared[1] = shared[0]  # a second worker with the same values
+    assert shared[0, hits.offset] == 6
+
+    shared[1, reg.gauge_slots()] = 0
+    text = reg.render(shared.sum(axis=0)).decode()
+    assert "hits_total 12" in text
+    assert "live 1" in text
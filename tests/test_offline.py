@@ -0,0 +1,112 @@
+import json
+import os
+import sys
+import wave
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from server import offline
+from server.tts_silero import SileroTTS
+
+SAMPLE_RATE = 16_000
+
+
+class GrowingAsr:
+    """Hypothesis grows by one word per call, the last word changes."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe_window(self, _audio: np.ndarray, lang: str = "ru") -> str:
+        self.calls += 1
+        words = ["раз", "два", "три", "четыре", "пять", "шесть"][: self.calls]
+        return " ".join(words) + (" " if self.calls % 2 else "")
+
+
+def stub_engines(_config):
+    return GrowingAsr(), SileroTTS()
+
+
+def make_config():
+    return SimpleNamespace(asr_sr=SAMPLE_RATE, window_sec=0.5, step_sec=0.05)
+
+
+def write_call(path, sr=SAMPLE_RATE, channels=1):
+    t = np.arange(int(sr * 0.4)) / sr
+    tone = 0.1 * np.sin(2 * np.pi * 440 * t)
+    audio = np.concatenate([tone, np.zeros(int(sr * 0.5)), tone])
+    pcm = (np.repeat(audio[:, None], channels, axis=1) * 32767).astype(np.int16)
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(sr)
+        wf.writeframes(pcm.tobytes())
+
+
+def test_read_wav_mixes_down_and_resamples(tmp_path):
+    write_call(tmp_path / "a.wav", sr=8000, channels=2)
+    pcm = offline.read_wav(str(tmp_path / "a.wav"), SAMPLE_RATE)
+    assert len(pcm) // 2 == int(SAMPLE_RATE * 1.3)
+
+
+def test_transcribe_is_deterministic(tmp_path):
+    write_call(tmp_path / "call.wav")
+    results = []
+    for run in ("a", "b"):
+        out = tmp_path / run
+        out.mkdir()
+        asr, tts = stub_engines(None)
+        results.append(
+            offline.asyncio.run(
+                offline.transcribe_file(str(tmp_path / "call.wav"), make_config(), asr, tts, str(out))
+            )
+        )
+    first, second = results
+    assert first.deltas == second.deltas
+    assert len(first.deltas) >= 2
+    assert first.transcript.startswith("раз")
+    assert first.ticks == second.ticks and first.asr_skipped > 0
+    assert (tmp_path / "a" / "call.txt").read_text().strip() == first.transcript
+    assert json.loads((tmp_path / "a" / "call.json").read_text())["ticks"] == first.ticks
+    with wave.open(str(tmp_path / "a" / "call.wav")) as wf:
+        assert wf.getnframes() > 0
+    assert (tmp_path / "a" / "call.wav").read_bytes() == (tmp_path / "b" / "call.wav").read_bytes()
+
+
+def test_corpus_in_process_pool(tmp_path):
+    corpus = tmp_path / "calls"
+    corpus.mkdir()
+    for name in ("one", "two", "three"):
+        write_call(corpus / f"{name}.wav")
+    paths = offline.find_wavs([str(corpus)])
+    assert [os.path.basename(p) for p in paths] == ["one.wav", "three.wav", "two.wav"]
+
+    out = tmp_path / "out"
+    summary = offline.run_corpus(paths, make_config(), str(out), jobs=2, loader=stub_engines)
+    assert summary["files"] == 3 and not summary["failed"]
+    assert json.loads((out / "summary.json").read_text())["files"] == 3
+    for name in ("one", "two", "three"):
+        assert (out / f"{name}.txt").read_text().startswith("раз")
+        assert (out / f"{name}.wav").stat().st_size > 44
+
+
+def test_nested_names_do_not_collide_and_outputs_are_skipped(tmp_path):
+    corpus = tmp_path / "calls"
+    for day in ("day1", "day2"):
+        (corpus / day).mkdir(parents=True)
+        write_call(corpus / day / "call.wav")
+    out = corpus / "out"
+    out.mkdir()
+    write_call(out / "old.wav")  # a reply from an earlier run
+
+    paths = offline.find_wavs([str(corpus)], skip=str(out))
+    assert len(paths) == 2
+    assert offline.output_names(paths) == ["day1/call", "day2/call"]
+    assert offline.output_names(["a.wav", "a.WAV"]) == ["a", "a-2"]
+
+    summary = offline.run_corpus(paths, make_config(), str(out), jobs=1, loader=stub_engines)
+    assert summary["files"] == 2 and not summary["failed"]
+    for day in ("day1", "day2"):
+        assert (out / day / "call.txt").read_text().startswith("раз")
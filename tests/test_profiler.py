@@ -0,0 +1,196 @@
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from server import httpd
+from server.profiler import PROFILER, Profiler, admin_routes, session_track, status_routes
+from server.session import EchoSession
+from server.tts_silero import SileroTTS
+from server.workers import WorkerStats
+
+SAMPLE_RATE = 16_000
+STEP_SEC = 0.05
+
+
+def test_disabled_records_nothing():
+    prof = Profiler(capacity=8)
+    with prof.span("asr", 2):
+        pass
+    prof.add("tts", 0.0, 1.0)
+    assert prof.recorded_spans() == []
+    assert prof.chrome_trace()["traceEvents"] == []
+
+
+def test_ring_overwrites_oldest_and_exports_tracks():
+    prof = Profiler(capacity=4)
+    prof.start(sample_ms=0)
+    base = prof.started
+    for i in range(6):
+        prof.add("tick", base + i, base + i + 0.5, session_track(3))
+    prof.add("ws_send", base + 6, base + 7, session_track(3, send=True))
+
+    def from_thread():
+        with prof.span("resample"):
+            pass
+
+    worker = threading.Thread(target=from_thread, name="infer-0")
+    worker.start()
+    worker.join()
+    prof.stop()
+
+    spans = prof.recorded_spans()
+    assert len(spans) == 4
+    assert [s[1] - base for s in spans if s[0] == "tick"] == [4, 5]
+    assert prof.summary()["tick"]["count"] == 2
+
+    events = prof.chrome_trace()["traceEvents"]
+    tick = next(e for e in events if e["name"] == "tick")
+    assert tick["ph"] == "X" and tick["dur"] == 0.5e6 and tick["ts"] == 4e6
+    names = {e["tid"]: e["args"]["name"] for e in events if e["ph"] == "M"}
+    assert names[6] == "session 3" and names[7] == "session 3 send"
+    assert any(tid < 0 for tid in names)  # the executor thread's own row
+
+
+def test_stack_sampler_collapses_stacks(tmp_path):
+    prof = Profiler()
+    done = threading.Event()
+
+    def busy_worker():
+        while not done.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_worker, name="busy")
+    worker.start()
+    prof.start(sample_ms=1)
+    time.sleep(0.05)
+    prof.stop()
+    done.set()
+    worker.join()
+
+    lines = prof.collapsed().splitlines()
+    assert prof.samples > 0
+    busy = [line for line in lines if line.startswith("busy;")]
+    assert busy and all(line.rsplit(" ", 1)[1].isdigit() for line in busy)
+    assert any("busy_worker (test_profiler.py)" in line for line in busy)
+
+    trace_path, stacks_path = prof.dump(str(tmp_path), "p")
+    assert json.loads(open(trace_path).read())["traceEvents"] == []
+    assert open(stacks_path).read() == prof.collapsed()
+
+
+class EchoAsr:
+    def transcribe_window(self, _audio: np.ndarray, lang: str = "ru") -> str:
+        return "привет "
+
+
+class FakeWs:
+    async def send(self, data) -> None:
+        pass
+
+
+def test_session_stages_are_recorded(tmp_path):
+    cfg = SimpleNamespace(
+        asr_sr=SAMPLE_RATE,
+        window_sec=0.5,
+        step_sec=STEP_SEC,
+        profile_sample_ms=0,
+        profile_spans=1024,
+        profile_dir=str(tmp_path),
+    )
+    routes = admin_routes(cfg)
+    t = np.arange(int(SAMPLE_RATE * STEP_SEC)) / SAMPLE_RATE
+    tone = (0.1 * np.sin(2 * np.pi * 440 * t) * 32767).astype(np.int16).tobytes()
+
+    async def run():
+        session = EchoSession(cfg, EchoAsr(), SileroTTS())
+        task = asyncio.create_task(session.tick(FakeWs()))
+        for _ in range(6):
+            session.push(tone)
+            await asyncio.sleep(STEP_SEC)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return session
+
+    assert asyncio.run(routes["/profile/start"]())["profiling"]
+    try:
+        session = asyncio.run(run())
+    finally:
+        result = asyncio.run(routes["/profile/stop"]())
+    status = status_routes()
+    assert "stages_ms" not in status["/profile"]()
+    assert asyncio.run(status["/profile/stages"]()) == result["stages_ms"]
+    stages = result["stages_ms"]
+    for name in ("ring_push", "vad", "tick", "ring_window", "asr", "stabilizer", "tts", "send"):
+        assert stages[name]["count"] > 0, name
+    assert "ws_send" in stages
+    assert all(os.path.exists(p) for p in result["files"])
+    tracks = {s[3] for s in PROFILER.recorded_spans() if s[0] == "tick"}
+    assert tracks == {session.track}
+
+
+def test_supervisor_toggles_workers():
+    stats = WorkerStats(2)
+    routes = stats.admin_routes()
+    routes["/profile/start"]()
+    assert [stats.slot(i).get("profile") for i in range(2)] == [1, 1]
+    routes["/profile/stop"]()
+    routes["/profile/start"]()
+    assert stats.slot(1).get("profile") == 2
+    routes["/profile/stop"]()
+    assert stats.slot(0).get("profile") == -2
+
+
+async def _request(port: int, method: str, path: str) -> int:
+    for _ in range(50):  # until the server listens
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            break
+        except ConnectionRefusedError:
+            await asyncio.sleep(0.01)
+    writer.write(f"{method} {path} HTTP/1.1\r\n\r\n".encode())
+    await writer.drain()
+    status = int((await reader.readline()).split(b" ")[1])
+    writer.close()
+    return status
+
+
+def test_admin_routes_are_post_only_and_local(monkeypatch):
+    calls = []
+    admin = {"/profile/start": lambda: calls.append(1) or {"profiling": True}}
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    async def run():
+        server = asyncio.create_task(
+            httpd.serve({"/profile": lambda: {}}, port, "127.0.0.1", admin=admin)
+        )
+        try:
+            codes = [
+                await _request(port, "GET", "/profile/start"),
+                await _request(port, "POST", "/profile/start"),
+                await _request(port, "GET", "/profile"),
+            ]
+            monkeypatch.setattr(httpd, "_is_local", lambda peer: False)
+            codes.append(await _request(port, "POST", "/profile/start"))
+        finally:
+            server.cancel()
+        return codes
+
+    assert asyncio.run(run()) == [404, 200, 200, 403]
+    assert calls == [1]
+
+
+def test_loopback_peers():
+    assert httpd._is_local(("127.0.0.1", 1))
+    assert httpd._is_local(("::ffff:127.0.0.1", 1, 0, 0))
+    assert not httpd._is_local(("10.0.0.2", 1))
+    assert not httpd._is_local(None)
@@ -0,0 +1,202 @@
+import asyncio
+import functools
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import websockets
+from websockets.typing import Subprotocol
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from rt_echo.common.protocol import (
+    AUDIO,
+    EOS,
+    FINAL,
+    FIRST,
+    HEADER,
+    PARTIAL,
+    SUBPROTOCOL,
+    SUBPROTOCOL_OPUS,
+    FrameEncoder,
+    ProtocolError,
+    decode,
+    encode,
+    select_subprotocol,
+)
+from server import server
+from server.session import EchoSession
+from server.tts_silero import SileroTTS
+
+SAMPLE_RATE = 16_000
+STEP_SEC = 0.05
+CHUNK = 320
+
+
+def test_frame_roundtrip():
+    msg = encode(AUDIO, memoryview(b"\x01\x02"), seq=2**32 + 5, ts=123_456, flags=FIRST)
+    assert len(msg) == HEADER.size + 2
+    frame = decode(msg)
+    assert (frame.type, frame.flags, frame.seq, frame.ts, frame.payload) == (
+        AUDIO,
+        FIRST,
+        5,
+        123_456,
+        b"\x01\x02",
+    )
+    enc = FrameEncoder()
+    assert [decode(enc.frame(EOS)).seq for _ in range(3)] == [0, 1, 2]
+    assert decode(enc.event(FINAL, 7, text="да", asr_ms=1.5)).json() == {"text": "да", "asr_ms": 1.5}
+    with pytest.raises(ProtocolError):
+        decode(b"\x01\x00")
+    assert select_subprotocol(None, ["x", SUBPROTOCOL]) == SUBPROTOCOL
+    assert select_subprotocol(None, []) is None
+    both = (SUBPROTOCOL_OPUS, SUBPROTOCOL)
+    assert select_subprotocol(None, [SUBPROTOCOL_OPUS, SUBPROTOCOL], both) == SUBPROTOCOL_OPUS
+    assert select_subprotocol(None, [SUBPROTOCOL, SUBPROTOCOL_OPUS], both) == SUBPROTOCOL
+    assert select_subprotocol(None, [SUBPROTOCOL_OPUS, SUBPROTOCOL]) == SUBPROTOCOL
+
+
+def tone_chunks(n):
+    t = np.arange(CHUNK * n) / SAMPLE_RATE
+    pcm = (0.1 * np.sin(2 * np.pi * 440 * t) * 32767).astype(np.int16).tobytes()
+    return [pcm[i : i + 2 * CHUNK] for i in range(0, len(pcm), 2 * CHUNK)]
+
+
+class EchoAsr:
+    def transcribe_window(self, _audio: np.ndarray, lang: str = "ru") -> str:
+        return "привет мир"
+
+
+class FakeWs:
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+
+    async def send(self, data) -> None:
+        self.sent.append(bytes(data))
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        self.closed = True
+
+
+def test_framed_session_echoes_timestamps_and_ends_stream():
+    cfg = SimpleNamespace(asr_sr=SAMPLE_RATE, window_sec=0.5, step_sec=STEP_SEC)
+
+    async def run():
+        session = EchoSession(cfg, EchoAsr(), SileroTTS(), framed=True)
+        ws = FakeWs()
+        task = asyncio.create_task(session.tick(ws))
+        for i, chunk in enumerate(tone_chunks(10)):
+            session.push(chunk, capture_ts=1000 + i)
+            await asyncio.sleep(0.005)
+        session.request_flush(end=True)
+        await asyncio.wait_for(task, 2.0)  # ends by itself after EOS
+        return ws
+
+    ws = asyncio.run(run())
+    assert ws.closed
+    frames = [decode(m) for m in ws.sent]
+    assert [f.seq for f in frames] == list(range(len(frames)))
+    assert frames[-1].type == EOS
+    assert any(f.type == PARTIAL for f in frames)
+    finals = [f for f in frames if f.type == FINAL]
+    # The never-stable tail is spoken on flush, echoing the newest frame.
+    assert "".join(f.json()["text"] for f in finals) == "привет мир"
+    assert finals[-1].ts == 1009
+    for final in finals:
+        reply = frames[frames.index(final) + 1]
+        assert reply.type == AUDIO and reply.flags & FIRST and reply.ts == final.ts
+    assert sum(f.type == AUDIO and f.flags & FIRST for f in frames) == len(finals)
+
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    monkeypatch.setattr(server, "asr_engine", EchoAsr())
+    monkeypatch.setattr(server, "tts_engine", SileroTTS())
+    monkeypatch.setattr(server.cfg, "step_sec", STEP_SEC)
+    monkeypatch.setattr(server.cfg, "window_sec", 0.5)
+    monkeypatch.setattr(server.cfg, "trace_dir", "")
+    return server
+
+
+async def _serve():
+    return await websockets.serve(
+        server.ws_handler,
+        "127.0.0.1",
+        0,
+        select_subprotocol=functools.partial(
+            select_subprotocol, supported=server.server_subprotocols(server.cfg)
+        ),
+    )
+
+
+def test_opus_falls_back_to_pcm_frames(stub_server, monkeypatch):
+    monkeypatch.setattr(server, "opus_available", lambda: False)
+    assert server.server_subprotocols(server.cfg) == (SUBPROTOCOL,)
+    monkeypatch.setattr(server, "opus_available", lambda: True)
+    monkeypatch.setattr(server.cfg, "opus", False)
+    assert server.server_subprotocols(server.cfg) == (SUBPROTOCOL,)
+    monkeypatch.setattr(server.cfg, "opus", True)
+    assert server.server_subprotocols(server.cfg) == (SUBPROTOCOL_OPUS, SUBPROTOCOL)
+    monkeypatch.setattr(server, "opus_available", lambda: False)
+
+    async def run():
+        srv = await _serve()
+        port = srv.sockets[0].getsockname()[1]
+        async with websockets.connect(
+            f"ws://127.0.0.1:{port}",
+            subprotocols=[Subprotocol(SUBPROTOCOL_OPUS), Subprotocol(SUBPROTOCOL)],
+        ) as ws:
+            chosen = ws.subprotocol
+        srv.close()
+        await srv.wait_closed()
+        return chosen
+
+    assert asyncio.run(run()) == SUBPROTOCOL
+
+
+def test_raw_client_empty_frame_ends_stream(stub_server):
+    async def run():
+        srv = await _serve()
+        port = srv.sockets[0].getsockname()[1]
+        received = 0
+        async with websockets.connect(f"ws://127.0.0.1:{port}") as ws:
+            assert ws.subprotocol is None
+            for chunk in tone_chunks(10):
+                await ws.send(chunk)
+            await ws.send(b"")
+            async for message in ws:  # ends when the server closes
+                received += len(message)
+        srv.close()
+        await srv.wait_closed()
+        return received
+
+    assert asyncio.run(asyncio.wait_for(run(), 5.0)) > 0
+
+
+def test_framed_client_gets_events_and_eos(stub_server):
+    async def run():
+        srv = await _serve()
+        port = srv.sockets[0].getsockname()[1]
+        enc = FrameEncoder()
+        frames = []
+        async with websockets.connect(
+            f"ws://127.0.0.1:{port}", subprotocols=[Subprotocol(SUBPROTOCOL)]
+        ) as ws:
+            assert ws.subprotocol == SUBPROTOCOL
+            for i, chunk in enumerate(tone_chunks(10)):
+                await ws.send(enc.audio(chunk, 500 + i))
+            await ws.send(enc.frame(EOS))
+            async for message in ws:
+                frames.append(decode(message))
+        srv.close()
+        await srv.wait_closed()
+        return frames
+
+    frames = asyncio.run(asyncio.wait_for(run(), 5.0))
+    assert frames[-1].type == EOS
+    assert any(f.type == FINAL for f in frames)
+    first = next(f for f in frames if f.type == AUDIO)
+    assert first.flags & FIRST and 500 <= first.ts <= 509
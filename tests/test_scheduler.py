@@ -0,0 +1,54 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from server.scheduler import TickScheduler
+
+
+def test_step_adapts_to_latency_and_load():
+    sched = TickScheduler(0.1, 0.5, alpha=1.0, headroom=2.0)
+    assert sched.record(0.01) == 0.1
+    assert sched.record(0.2) == 0.4
+    assert sched.record(0.2, load=3.0) == 0.5
+    assert sched.record(0.02, load=0.5) == 0.1
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_deadlines_do_not_drift_and_missed_are_counted():
+    clock = FakeClock()
+    sched = TickScheduler(0.02, clock=clock)
+
+    async def scenario():
+        sched.wake()  # start the schedule without sleeping
+        assert await sched.wait()
+        for _ in range(5):
+            clock.now = sched.deadline + 0.005  # every tick starts a bit late
+            assert not await sched.wait()
+        assert sched.deadline == pytest.approx(0.02 * 6)
+        assert sched.missed == 0
+        clock.now = sched.deadline + 0.07  # work spanning several deadlines
+        await sched.wait()
+        assert sched.deadline == pytest.approx(clock.now + 0.02)
+
+    asyncio.run(scenario())
+    assert sched.missed == 3
+
+
+def test_wake_returns_immediately():
+    async def scenario():
+        sched = TickScheduler(10.0)
+        asyncio.get_running_loop().call_later(0.01, sched.wake)
+        woken = await asyncio.wait_for(sched.wait(), 5.0)
+        return woken, sched.woken
+
+    assert asyncio.run(scenario()) == (True, 1)
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from server.session import EchoSession
+
+SAMPLE_RATE = 16_000
+
+
+class ScriptedAsr:
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = []
+
+    def transcribe_words(self, audio: np.ndarray, prompt: str = ""):
+        self.calls.append((len(audio), prompt))
+        return self.replies.pop(0)
+
+
+class FakeWs:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, data) -> None:
+        self.sent.append(data)
+
+
+def make_session(asr, max_buffer_sec=5.0):
+    cfg = SimpleNamespace(
+        asr_sr=SAMPLE_RATE,
+        window_sec=2.0,
+        step_sec=0.5,
+        vad_gate=False,
+        asr_streaming=True,
+        asr_max_buffer_sec=max_buffer_sec,
+    )
+    return EchoSession(cfg, asr, tts=None)
+
+
+def test_committed_words_drop_audio_and_become_prompt():
+    asr = ScriptedAsr(
+        [
+            [(" one", 0.3), (" two", 0.6), (" thr", 0.9)],
+            [(" one", 0.3), (" two", 0.6), (" three", 0.95)],
+            [(" three", 0.35), (" four", 0.7)],
+        ]
+    )
+    session = make_session(asr)
+    session.push(bytes(SAMPLE_RATE * 2))
+
+    def recognize():
+        return asyncio.run(session._recognize(session.ring.window_f32(len(session.ring))))
+
+    assert recognize() == ""
+    assert recognize() == " one two"
+    # Audio up to the end of "two" is gone; the rest is decoded next time.
+    assert len(session.ring) == int(0.4 * SAMPLE_RATE)
+    session.push(bytes(int(0.4 * SAMPLE_RATE) * 2))
+    # The rest of the previous hypothesis still counts towards agreement.
+    assert recognize() == " three"
+    assert asr.calls[-1] == (int(0.8 * SAMPLE_RATE), " one two")
+    assert session.committed_text == " one two three"
+
+
+def test_full_buffer_forces_commit():
+    asr = ScriptedAsr([[(" a", 0.4), (" b", 0.9)]])
+    session = make_session(asr, max_buffer_sec=1.0)
+    session.push(bytes(SAMPLE_RATE * 2))
+    delta = asyncio.run(session._recognize(session.ring.window_f32(len(session.ring))))
+    assert delta == " a b"
+    assert len(session.ring) == int(0.1 * SAMPLE_RATE)
+    assert not session.stabilizer.history
+
+
+def test_long_silence_does_not_fill_buffer():
+    cfg = SimpleNamespace(
+        asr_sr=SAMPLE_RATE,
+        window_sec=2.0,
+        step_sec=0.1,
+        step_max_sec=0.4,
+        asr_streaming=True,
+        asr_max_buffer_sec=5.0,
+    )
+    asr = ScriptedAsr([])
+    session = EchoSession(cfg, asr, tts=None)
+    # Slow inference stretches the step to its maximum.
+    assert session.scheduler.record(1.0) == 0.4
+
+    async def run():
+        for _ in range(40):  # 16 s of silence, more than the buffer holds
+            session.push(bytes(int(session.scheduler.step * SAMPLE_RATE) * 2))
+            assert await session.run_tick(FakeWs()) == ""
+            assert len(session.ring) == 0
+
+    asyncio.run(run())
+    assert session.asr_skipped == 40 and not asr.calls
@@ -41,3 +41,61 @@ def test_multiple_drifts():
     stab.get_delta("foo baz qux ")
     assert stab.get_delta("foo baz qux ") == "qux "
     assert stab.stable_prefix == "foo baz qux "
+
+
+def test_finalize_flushes_unstable_tail():
+    stab = Stabilizer(n_history=2)
+    assert stab.get_delta("foo bar") == "foo "
+    assert stab.finalize() == "bar"
+    assert stab.stable_prefix == ""
+    assert not stab.history
+    assert stab.finalize() == ""
+
+
+def _legacy_delta(history, prev_stable, delimiters=" .,!?"):
+    prefix = history[0]
+    for h in history[1:]:
+        while not h.startswith(prefix):
+            prefix = prefix[:-1]
+    idx = max(prefix.rfind(d) for d in delimiters)
+    stable = prefix[: idx + 1] if idx >= 0 else ""
+    delta = stable[len(prev_stable):] if stable.startswith(prev_stable) else ""
+    return stable, delta
+
+
+def test_matches_character_prefix_reference():
+    import random
+
+    rng = random.Random(0)
+    words = ["a", "ab", "abc", "b", "ba", "c", ",", "."]
+    stab = Stabilizer(n_history=3)
+    history = []
+    stable = ""
+    for _ in range(300):
+        hyp = " ".join(rng.choice(words) for _ in range(rng.randint(0, 6)))
+        if rng.random() < 0.5:
+            hyp += rng.choice([" ", "", "."])
+        history = (history + [hyp])[-3:]
+        stable, expected = _legacy_delta(history, stable)
+        assert stab.get_delta(hyp) == expected
+        assert stab.stable_prefix == stable
+
+
+def test_local_agreement_commits_and_never_retracts():
+    stab = Stabilizer(n_history=2, policy="local_agreement")
+    assert stab.get_delta("one two thr") == ""
+    assert stab.get_delta("one two three ") == "one two "
+    # Revising committed words does not retract them.
+    assert stab.get_delta("won too three four ") == "three "
+    assert stab.stable_prefix == "one two three "
+    assert stab.get_delta("one two three four five") == "four "
+    assert stab.finalize() == "five"
+
+
+def test_token_api_and_rebase():
+    stab = Stabilizer(n_history=2, policy="local_agreement")
+    stab.get_delta_tokens(["hello ", "big "])
+    assert stab.get_delta_tokens(["hello ", "big ", "world "]) == "hello big "
+    stab.rebase()
+    assert stab.stable_prefix == ""
+    assert stab.get_delta_tokens(["world ", "again "]) == "world "
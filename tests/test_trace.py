@@ -0,0 +1,84 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from replay_trace import replay
+from server import trace
+from server.session import EchoSession
+from server.trace import AUDIO, DELTA, HYP, TICK, TraceRecorder, read_trace
+from server.tts_silero import SileroTTS
+
+SAMPLE_RATE = 16_000
+STEP_SEC = 0.05
+
+
+def test_roundtrip_and_truncated_tail(tmp_path):
+    path = tmp_path / "s.rttrace"
+    rec = TraceRecorder(str(path), SimpleNamespace(asr_sr=SAMPLE_RATE, window_sec=1.0), 64)
+    rec.audio(b"\x01\x00" * 100)  # over flush_bytes: goes to the writer now
+    rec.text(HYP, "привет")
+    rec.tts(640)
+    rec.close()
+    trace.sync()
+
+    header, records = read_trace(str(path))
+    assert header["config"] == {"asr_sr": SAMPLE_RATE, "window_sec": 1.0}
+    records = list(records)
+    assert [r.kind for r in records] == [AUDIO, HYP, trace.TTS]
+    assert records[1].payload.decode() == "привет"
+    assert records[0].t <= records[1].t <= records[2].t
+
+    path.write_bytes(path.read_bytes()[:-2])
+    assert [r.kind for r in read_trace(str(path))[1]] == [AUDIO, HYP]
+
+
+class GrowingAsr:
+    """Hypothesis grows by one word per call, the last word changes."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe_window(self, _audio: np.ndarray, lang: str = "ru") -> str:
+        self.calls += 1
+        words = ["раз", "два", "три", "четыре", "пять", "шесть"][: self.calls]
+        return " ".join(words) + (" " if self.calls % 2 else "")
+
+
+class FakeWs:
+    async def send(self, data) -> None:
+        pass
+
+
+def test_stub_replay_reproduces_session(tmp_path):
+    cfg = SimpleNamespace(asr_sr=SAMPLE_RATE, window_sec=0.5, step_sec=STEP_SEC)
+    t = np.arange(int(SAMPLE_RATE * STEP_SEC)) / SAMPLE_RATE
+    tone = (0.1 * np.sin(2 * np.pi * 440 * t) * 32767).astype(np.int16).tobytes()
+    silence = bytes(len(tone))
+    path = tmp_path / "s.rttrace"
+
+    async def record():
+        session = EchoSession(cfg, GrowingAsr(), SileroTTS(), recorder=TraceRecorder(str(path), cfg))
+        task = asyncio.create_task(session.tick(FakeWs()))
+        await asyncio.sleep(STEP_SEC / 2)
+        for chunk in [tone] * 6 + [silence] * 8:
+            session.push(chunk)
+            await asyncio.sleep(STEP_SEC)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(record())
+    trace.sync()
+    header, records = read_trace(str(path))
+    records = list(records)
+    assert sum(r.kind == DELTA for r in records) >= 2
+
+    report = asyncio.run(replay(header, records))
+    assert report["ticks"]["replayed"] == sum(r.kind == TICK for r in records)
+    assert report["asr_calls"] == sum(r.kind == HYP for r in records)
+    assert report["deltas"]["same_text"]
+    assert report["tts_bytes"]["replayed"] == report["tts_bytes"]["recorded"] > 0
+    assert report["bytes_sent"] == report["tts_bytes"]["replayed"]
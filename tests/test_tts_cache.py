@@ -0,0 +1,100 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from server.tts import ensure_pcm16_16k
+from server.tts_cache import DiskAudioCache, LruCache
+from server.tts_piper import PiperTTS
+
+
+class CountingSession:
+    def __init__(self):
+        self.runs = 0
+
+    def run(self, *_args, **_kwargs):
+        self.runs += 1
+        return [np.linspace(-0.5, 0.5, 8, dtype=np.float32)]
+
+
+def make_tts(monkeypatch, tmp_path, **kwargs):
+    model_path = tmp_path / "model.onnx"
+    model_path.write_bytes(b"")
+    speaker_json = tmp_path / "speaker.json"
+    speaker_json.write_text("{}")
+    session = CountingSession()
+    calls = []
+
+    def phonemize(text, _speaker):
+        calls.append(text)
+        return np.array([ord(c) for c in text], dtype=np.int64)
+
+    monkeypatch.setattr(
+        "server.tts_piper.ort", SimpleNamespace(InferenceSession=lambda path: session)
+    )
+    monkeypatch.setattr("server.tts_piper.piper_phonemize", phonemize)
+    return PiperTTS(str(model_path), str(speaker_json), **kwargs), session, calls
+
+
+def test_lru_evicts_by_bytes():
+    cache = LruCache(10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"
+    cache.put("c", b"1234")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234"
+    assert cache.nbytes == 8
+    assert cache.evictions == 1
+    cache.put("huge", b"x" * 11)
+    assert cache.get("huge") is None
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_disk_cache_roundtrip(tmp_path):
+    cache = DiskAudioCache(tmp_path)
+    key = DiskAudioCache.key_for(b"voice", b"phonemes")
+    assert cache.get(key) is None
+    cache.put(key, b"\x01\x02\x03\x04")
+    hit = DiskAudioCache(tmp_path).get(key)
+    assert type(hit) is bytes and hit == b"\x01\x02\x03\x04"
+
+
+def test_piper_caches_phonemes_and_audio(monkeypatch, tmp_path):
+    tts, session, calls = make_tts(monkeypatch, tmp_path)
+    first = tts.synthesize_pcm16("привет")
+    second = tts.synthesize_pcm16("привет")
+    assert first == second == ensure_pcm16_16k(*tts.synthesize("привет"))
+    assert calls == ["привет"]
+    assert session.runs == 2  # one for synthesize_pcm16, one for synthesize
+    stats = tts.cache_stats()
+    assert stats["audio"]["hits"] == 1
+    assert stats["phonemes"]["hits"] == 2
+
+
+def test_piper_disk_cache_survives_restart(monkeypatch, tmp_path):
+    cache_dir = tmp_path / "cache"
+    tts, session, _ = make_tts(monkeypatch, tmp_path, cache_dir=str(cache_dir))
+    pcm = bytes(tts.synthesize_pcm16("снова"))
+    assert session.runs == 1
+
+    restarted, session2, _ = make_tts(monkeypatch, tmp_path, cache_dir=str(cache_dir))
+    assert bytes(restarted.synthesize_pcm16("снова")) == pcm
+    assert session2.runs == 0
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskAudioCache(tmp_path, max_bytes=10)
+    keys = [DiskAudioCache.key_for(name) for name in (b"a", b"b", b"c")]
+    for i, key in enumerate(keys[:2]):
+        cache.put(key, b"1234")
+        os.utime(cache._path(key), (i + 1, i + 1))
+    assert cache.get(keys[0]) == b"1234"  # now the most recently used
+    cache.put(keys[2], b"1234")
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == cache.get(keys[2]) == b"1234"
+    assert (cache.nbytes, cache.evictions) == (8, 1)
+    # The size of a warm directory is counted on start.
+    assert DiskAudioCache(tmp_path, max_bytes=10).nbytes == 8
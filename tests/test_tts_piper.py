@@ -10,6 +10,8 @@ from rt_echo.common.audio import float32_to_pcm16, resample
 from server.tts import ensure_pcm16_16k
 from server.tts_piper import PiperTTS
 
+HOP = 4
+
 
 class DummySession:
     def __init__(self, expected_path: str, audio: np.ndarray):
@@ -79,3 +81,132 @@ def test_resample(monkeypatch, tmp_path):
     expected_audio = resample(audio, 8_000, tts.sample_rate)
     expected = float32_to_pcm16(expected_audio)
     assert pcm_bytes == expected
+
+
+class BindingSession:
+    """Session with named inputs and IO binding.
+
+    Every phoneme id decodes to one frame of ``HOP`` samples of ``id / 100``
+    (padding included, as a real model's decoder leaves it); the durations
+    output is 1 per phoneme and 0 for padding.
+    """
+
+    def __init__(self, names=("input", "input_lengths", "scales"), durations=True):
+        self.names = names
+        self.outputs = ["output", "durations"] if durations else ["output"]
+        self.feeds = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name=n) for n in self.names]
+
+    def get_outputs(self):
+        return [SimpleNamespace(name=n) for n in self.outputs]
+
+    def io_binding(self):
+        class Binding:
+            def __init__(self):
+                self.inputs, self.bound, self.out = {}, [], {}
+
+            def bind_cpu_input(self, name, value):
+                self.inputs[name] = value
+
+            def bind_output(self, name):
+                self.bound.append(name)
+
+            def get_outputs(self):
+                return [SimpleNamespace(numpy=lambda n=n: self.out[n]) for n in self.bound]
+
+            def clear_binding_inputs(self):
+                self.inputs = {}
+
+            def clear_binding_outputs(self):
+                self.bound, self.out = [], {}
+
+        return Binding()
+
+    def run_with_iobinding(self, binding):
+        self.feeds.append(dict(binding.inputs))
+        ids = binding.inputs["input"]
+        audio = np.repeat(ids / 100.0, HOP, axis=1).astype(np.float32)
+        binding.out = {
+            "output": audio[:, None, None, :],
+            "durations": (ids > 0).astype(np.float32)[:, None, :],
+        }
+
+
+def test_feeds_lengths_scales_and_batches(monkeypatch, tmp_path):
+    model_path = tmp_path / "model.onnx"
+    model_path.write_bytes(b"")
+    speaker_json = tmp_path / "speaker.json"
+    speaker_json.write_text(
+        '{"inference": {"noise_scale": 0.5, "length_scale": 1.2}, "audio": {"hop_length": 4}}'
+    )
+    sessions = []
+
+    def make_session(path):
+        sessions.append(BindingSession())
+        return sessions[-1]
+
+    monkeypatch.setattr("server.tts_piper.ort", SimpleNamespace(InferenceSession=make_session))
+    monkeypatch.setattr(
+        "server.tts_piper.piper_phonemize",
+        lambda text, speaker: np.arange(1, len(text) + 1, dtype=np.int64),
+    )
+    tts = PiperTTS(str(model_path), str(speaker_json), cache_bytes=0, sessions=2)
+    assert len(sessions) == 2
+
+    audio, _ = tts.synthesize("abc")
+    np.testing.assert_allclose(audio, np.repeat([0.01, 0.02, 0.03], HOP), rtol=1e-6)
+    feeds = sessions[0].feeds[0]
+    assert feeds["input"].shape == (1, 3)
+    assert feeds["input_lengths"].tolist() == [3]
+    np.testing.assert_allclose(feeds["scales"], [0.5, 1.2, 0.8])
+
+    pcm = tts.synthesize_batch(["ab", "abcd", "a"])
+    # One run for all three, the pool hands out the sessions in turn.
+    assert len(sessions[1].feeds) == 1
+    assert sessions[1].feeds[0]["input_lengths"].tolist() == [2, 4, 1]
+    assert [len(p) // 2 for p in pcm] == [2 * HOP, 4 * HOP, HOP]
+    assert pcm[1] == tts.synthesize_pcm16("abcd")
+
+
+def test_batch_without_durations_decodes_one_by_one(monkeypatch, tmp_path):
+    model_path = tmp_path / "model.onnx"
+    model_path.write_bytes(b"")
+    speaker_json = tmp_path / "speaker.json"
+    speaker_json.write_text("{}")
+    session = BindingSession(durations=False)
+    monkeypatch.setattr(
+        "server.tts_piper.ort", SimpleNamespace(InferenceSession=lambda path: session)
+    )
+    # Id 0 decodes to silence, which must not be mistaken for padding.
+    monkeypatch.setattr(
+        "server.tts_piper.piper_phonemize",
+        lambda text, speaker: np.zeros(len(text), dtype=np.int64),
+    )
+    tts = PiperTTS(str(model_path), str(speaker_json), cache_bytes=0, batch_phrases=4)
+    assert not tts.batching
+    pcm = tts.synthesize_batch(["ab", "abcd", "a"])
+    assert [f["input"].shape for f in session.feeds] == [(1, 2), (1, 4), (1, 1)]
+    assert [len(p) // 2 for p in pcm] == [2 * HOP, 4 * HOP, HOP]
+
+
+def test_stream_batches_phrases_after_the_first(monkeypatch, tmp_path):
+    model_path = tmp_path / "model.onnx"
+    model_path.write_bytes(b"")
+    speaker_json = tmp_path / "speaker.json"
+    speaker_json.write_text('{"audio": {"hop_length": 4}}')
+    session = BindingSession(names=("input",))
+    monkeypatch.setattr(
+        "server.tts_piper.ort", SimpleNamespace(InferenceSession=lambda path: session)
+    )
+    monkeypatch.setattr(
+        "server.tts_piper.piper_phonemize",
+        lambda text, speaker: np.full(len(text), 7, dtype=np.int64),
+    )
+    tts = PiperTTS(str(model_path), str(speaker_json), batch_phrases=2)
+    text = "Первая фраза довольно длинная. Вторая фраза тоже длинная. Третья фраза длиннее всех."
+    chunks = list(tts.synthesize_stream(text))
+    assert len(chunks) == 3
+    assert [f["input"].shape[0] for f in session.feeds] == [1, 2]
+    assert set(session.feeds[0]) == {"input"}
@@ -0,0 +1,44 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from server.session import EchoSession
+from server.tts import split_phrases
+from server.tts_silero import SileroTTS
+
+
+class FakeWs:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, data) -> None:
+        self.sent.append(bytes(data))
+
+
+def test_split_phrases_merges_short_fragments():
+    text = "Да. Привет, как у тебя дела сегодня? Всё хорошо, спасибо тебе большое! Ок."
+    assert split_phrases(text) == [
+        "Да. Привет, как у тебя дела сегодня?",
+        "Всё хорошо, спасибо тебе большое! Ок.",
+    ]
+    assert split_phrases("   ") == []
+
+
+def test_stream_yields_one_chunk_per_phrase():
+    tts = SileroTTS()
+    text = "Первая фраза довольно длинная. Вторая фраза тоже длинная."
+    chunks = list(tts.synthesize_stream(text))
+    assert len(chunks) == 2
+    assert all(len(c) % 2 == 0 and c for c in chunks)
+
+
+def test_session_sends_small_frames():
+    cfg = SimpleNamespace(asr_sr=16_000, window_sec=1.0, step_sec=0.1, tts_frame_ms=20)
+    session = EchoSession(cfg, asr=None, tts=SileroTTS())
+    ws = FakeWs()
+    asyncio.run(session._speak(ws, "Первая фраза довольно длинная. Вторая фраза тоже длинная."))
+    assert ws.sent
+    assert all(len(frame) <= 640 for frame in ws.sent)
+    assert sum(len(frame) for frame in ws.sent[:-1]) % 640 == 0
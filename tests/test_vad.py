@@ -0,0 +1,78 @@
+import os
+import sys
+
+import numpy as np
+import webrtcvad
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from server.vad import StreamingVad, active_mask, trim_silence_head_tail
+
+SAMPLE_RATE = 16_000
+FRAME = 320
+
+
+def make_audio() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    t = np.arange(SAMPLE_RATE) / SAMPLE_RATE
+    voiced = 0.3 * np.sin(2 * np.pi * 220 * t) * (1 + 0.5 * np.sin(2 * np.pi * 3 * t))
+    voiced += 0.02 * rng.standard_normal(t.size)
+    silence = np.zeros(SAMPLE_RATE // 2)
+    audio = np.concatenate((silence, voiced, silence))
+    return (audio * 32767).astype(np.int16)
+
+
+def reference_mask(pcm: np.ndarray) -> np.ndarray:
+    vad = webrtcvad.Vad(2)
+    n = pcm.size // FRAME
+    return np.array(
+        [vad.is_speech(pcm[i * FRAME : (i + 1) * FRAME].tobytes(), SAMPLE_RATE) for i in range(n)],
+        dtype=bool,
+    )
+
+
+def test_active_mask_matches_per_frame_loop():
+    pcm = make_audio()
+    assert np.array_equal(active_mask(pcm), reference_mask(pcm))
+
+
+def test_chunked_push_matches_one_shot():
+    pcm = make_audio()
+    vad = StreamingVad(SAMPLE_RATE)
+    pos = 0
+    for size in [100, 333, 1000, 7] * 200:
+        vad.push(pcm[pos : pos + size].tobytes())
+        pos += size
+    vad.push(pcm[pos:])
+    assert vad.frames_total == pcm.size // FRAME
+    assert np.array_equal(vad.mask(), reference_mask(pcm))
+    assert np.array_equal(vad.mask(10, 20), reference_mask(pcm)[10:20])
+
+
+def test_energy_prefilter_skips_silent_frames():
+    pcm = make_audio()
+    vad = StreamingVad(SAMPLE_RATE, energy_floor_dbfs=-60.0)
+    vad.push(pcm)
+    silent_frames = 2 * (SAMPLE_RATE // 2) // FRAME
+    assert vad.frames_prefiltered == silent_frames
+    assert vad.frames_checked == vad.frames_total - silent_frames
+    assert not vad.mask()[:25].any()
+    assert vad.mask().any()
+
+
+def test_speech_since_and_history_limit():
+    pcm = make_audio()
+    vad = StreamingVad(SAMPLE_RATE, history_frames=10)
+    vad.push(pcm)
+    last = int(np.flatnonzero(reference_mask(pcm))[-1])
+    assert vad.speech_since(last)
+    assert not vad.speech_since(last + 1)
+    assert vad.mask().size == 10
+    assert vad.mask(0, 5).size == 0
+
+
+def test_trim_reuses_mask():
+    pcm = make_audio()
+    mask = active_mask(pcm)
+    trimmed = trim_silence_head_tail(pcm, mask=mask)
+    assert np.array_equal(trimmed, trim_silence_head_tail(pcm))
+    assert 0 < trimmed.size < pcm.size
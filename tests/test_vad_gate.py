@@ -0,0 +1,95 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from server.session import EchoSession
+
+SAMPLE_RATE = 16_000
+STEP_SEC = 0.05
+
+
+class CountingAsr:
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe_window(self, _audio: np.ndarray) -> str:
+        self.calls += 1
+        return "привет мир"
+
+
+class RecordingTTS:
+    def __init__(self):
+        self.texts = []
+
+    def synthesize(self, text: str) -> tuple[np.ndarray, int]:
+        self.texts.append(text)
+        return np.zeros(160, dtype=np.float32), SAMPLE_RATE
+
+
+class FakeWs:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, data) -> None:
+        self.sent.append(data)
+
+
+def tone(seconds: float) -> bytes:
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return (0.1 * np.sin(2 * np.pi * 440 * t) * 32767).astype(np.int16).tobytes()
+
+
+def silence(seconds: float) -> bytes:
+    return bytes(int(SAMPLE_RATE * seconds) * 2)
+
+
+def test_silent_ticks_skip_asr_and_flush_tail():
+    cfg = SimpleNamespace(asr_sr=SAMPLE_RATE, window_sec=0.5, step_sec=STEP_SEC)
+    asr, tts, ws = CountingAsr(), RecordingTTS(), FakeWs()
+
+    async def scenario():
+        session = EchoSession(cfg, asr, tts)
+        task = asyncio.create_task(session.tick(ws))
+        # Ticks keep fixed deadlines; push halfway between them so every
+        # tick sees exactly one new chunk.
+        await asyncio.sleep(STEP_SEC / 2)
+        # webrtcvad keeps flagging a few frames after speech ends (hangover),
+        # so the trailing pause spans several ticks.
+        for chunk in [silence(STEP_SEC)] * 2 + [tone(STEP_SEC)] * 2 + [silence(STEP_SEC)] * 6:
+            session.push(chunk)
+            await asyncio.sleep(STEP_SEC)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return session
+
+    session = asyncio.run(scenario())
+    assert asr.calls == session.asr_calls >= 1
+    assert session.asr_skipped >= 2
+    # "мир" never stabilized before the pause and is spoken on end of speech.
+    assert tts.texts == ["привет ", "мир"]
+    assert len(session.ring) == 0
+
+
+def test_end_of_speech_ticks_immediately():
+    cfg = SimpleNamespace(asr_sr=SAMPLE_RATE, window_sec=2.0, step_sec=5.0, vad_end_ms=300)
+    asr, tts, ws = CountingAsr(), RecordingTTS(), FakeWs()
+
+    async def scenario():
+        session = EchoSession(cfg, asr, tts)
+        task = asyncio.create_task(session.tick(ws))
+        await asyncio.sleep(0)
+        session.push(tone(0.3) + silence(0.6))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return session
+
+    session = asyncio.run(scenario())
+    # Well before the 5 s step: transcribed once and flushed whole.
+    assert asr.calls == 1
+    assert tts.texts == ["привет мир"]
+    assert len(session.ring) == 0
@@ -0,0 +1,95 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from server.tts_piper import PiperTTS
+from server.tts_silero import SileroTTS
+from server.warmup import synthetic_speech, warm_up
+
+
+class CountingAsr:
+    def __init__(self):
+        self.calls = []
+
+    def transcribe_window(self, audio, lang="ru"):
+        self.calls.append(("window", len(audio)))
+        return ""
+
+    def transcribe_batch(self, audios, lang="ru"):
+        self.calls.append(("batch", len(audios)))
+        return [""] * len(audios)
+
+    def transcribe_words(self, audio, prompt="", lang="ru"):
+        self.calls.append(("words", len(audio)))
+        return []
+
+
+def test_warm_up_runs_configured_path():
+    timings = {}
+    asr = CountingAsr()
+    cfg = SimpleNamespace(asr_sr=16_000, window_sec=1.0, warmup_runs=2)
+    warm_up(asr, SileroTTS(), cfg, timings)
+    assert asr.calls == [("window", 16_000)] * 2
+    assert set(timings) == {"asr_warmup_1", "asr_warmup_2", "tts_warmup_1", "tts_warmup_2"}
+
+    asr = CountingAsr()
+    warm_up(asr, SileroTTS(), SimpleNamespace(asr_batch_size=4, warmup_runs=1), {})
+    assert asr.calls == [("batch", 4)]
+
+    asr = CountingAsr()
+    warm_up(asr, SileroTTS(), SimpleNamespace(asr_streaming=True, warmup_runs=1), {})
+    assert asr.calls == [("words", 32_000)]
+
+    asr = CountingAsr()
+    warm_up(asr, SileroTTS(), SimpleNamespace(warmup_runs=0), timings)
+    assert asr.calls == []
+
+
+def test_synthetic_speech_is_bounded_float32():
+    audio = synthetic_speech(0.5)
+    assert audio.dtype == np.float32 and audio.size == 8_000
+    assert 0.1 < np.abs(audio).max() <= 0.3 + 1e-6
+
+
+class FakeOrt:
+    __version__ = "1.0"
+    GraphOptimizationLevel = SimpleNamespace(ORT_DISABLE_ALL=0, ORT_ENABLE_ALL=99)
+
+    def __init__(self):
+        self.loaded = []
+
+    class SessionOptions:
+        optimized_model_filepath = ""
+        graph_optimization_level = 99
+
+    def InferenceSession(self, path, sess_options=None):
+        self.loaded.append((path, sess_options.graph_optimization_level))
+        if sess_options.optimized_model_filepath:
+            with open(sess_options.optimized_model_filepath, "wb") as f:
+                f.write(b"optimized")
+        return SimpleNamespace()
+
+
+def test_piper_caches_optimized_graph(monkeypatch, tmp_path):
+    model = tmp_path / "voice.onnx"
+    model.write_bytes(b"model")
+    speaker = tmp_path / "voice.onnx.json"
+    speaker.write_text("{}")
+    cache = tmp_path / "cache"
+    ort = FakeOrt()
+    monkeypatch.setattr("server.tts_piper.ort", ort)
+
+    PiperTTS(str(model), str(speaker), optimized_dir=str(cache))
+    cached = PiperTTS.optimized_path(str(model), str(cache))
+    assert cached.read_bytes() == b"optimized"
+    assert os.listdir(cache) == [cached.name]
+
+    PiperTTS(str(model), str(speaker), optimized_dir=str(cache))
+    assert ort.loaded == [(str(model), 99), (str(cached), 0)]
+
+    # A changed model gets a new cache entry.
+    model.write_bytes(b"model v2")
+    assert PiperTTS.optimized_path(str(model), str(cache)) != cached
@@ -0,0 +1,81 @@
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from server import workers
+from server.workers import WorkerStats, split_cpus
+
+
+def test_split_cpus_into_contiguous_groups():
+    assert split_cpus(range(8), 3) == [[0, 1, 2], [3, 4, 5], [6, 7]]
+    assert split_cpus([2, 3], 3) == [[2], [3], [2]]
+    assert split_cpus([], 2) == [[], []]
+
+
+def test_health_aggregates_live_workers():
+    stats = WorkerStats(3)
+    now = time.time()
+    stats.slot(0).update(pid=100, heartbeat=now, sessions=2, pending=1, rejected=1, ready=1)
+    stats.slot(1).update(pid=101, heartbeat=now, sessions=3, pending=0, rejected=2)
+    # Worker 2 stopped reporting a while ago.
+    stats.slot(2).update(pid=102, heartbeat=now - 60, sessions=7, pending=4)
+
+    health = stats.health()
+    assert health["status"] == "degraded"
+    assert health["workers_alive"] == 2
+    assert health["sessions"] == 5
+    assert health["pending"] == 1
+    assert health["rejected"] == 3
+    assert [w["alive"] for w in health["workers"]] == [True, True, False]
+    assert health["ready"] and health["workers_ready"] == 1
+
+    stats.reset_gauges(0)
+    assert not stats.health()["ready"]
+
+
+class FakeProcess:
+    pid = 1
+
+    def __init__(self, **_kwargs) -> None:
+        self.seen = None
+
+    def start(self) -> None:
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else None
+        self.seen = (os.environ.get("OMP_NUM_THREADS"), os.environ.get("TTS_THREADS"), cpus)
+
+
+def test_spawn_applies_cpu_environment_only_around_start(monkeypatch):
+    monkeypatch.delenv("OMP_NUM_THREADS", raising=False)
+    monkeypatch.delenv("TTS_THREADS", raising=False)
+    cpus = workers.available_cpus()[:1]
+    before = workers.available_cpus()
+    proc = workers._spawn(SimpleNamespace(Process=FakeProcess), 0, cpus, WorkerStats(1))
+    omp, tts, pinned = proc.seen
+    assert omp == tts == "1"
+    assert pinned in (None, cpus)
+    assert "OMP_NUM_THREADS" not in os.environ and "TTS_THREADS" not in os.environ
+    assert workers.available_cpus() == before
+
+
+def test_prefetch_fails_fast_on_unknown_model(monkeypatch):
+    def download_model(model):
+        raise ValueError(f"Invalid model size '{model}'")
+
+    monkeypatch.setattr("faster_whisper.download_model", download_model)
+    monkeypatch.setenv("ASR_MODEL", "smal")
+    with pytest.raises(ValueError):
+        workers.prefetch_asr_model()
+
+
+def test_prefetch_leaves_model_to_workers_when_offline(monkeypatch):
+    def download_model(model):
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr("faster_whisper.download_model", download_model)
+    monkeypatch.setenv("ASR_MODEL", "small")
+    workers.prefetch_asr_model()
+    assert os.environ["ASR_MODEL"] == "small"